@@ -0,0 +1,391 @@
+"""
+Local Deriv and Supabase Stand-ins
+
+Offline servers for load-testing the referee without touching the real
+Deriv API or Supabase:
+
+- A Deriv WebSocket server answering authorize/balance/portfolio/ping/
+  proposal_open_contract/forget, matched by req_id, with configurable
+  latency, jitter and error rate; `ticks` subscriptions get a random-walk
+  tick every TICK_INTERVAL per symbol
+- A minimal PostgREST endpoint serving synthetic user_accounts rows
+  (eq/gte/in filters, offset/limit paging), accepting upserts, filtered
+  updates and RPCs
+
+Both count the requests they serve; GET /__stats returns the counters
+and POST /__reset zeroes them.
+
+Usage:
+    python -m benchmarks.fakes --accounts 1000 --deriv-port 8765 --rest-port 8766
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import websockets
+
+UPDATED_AT = "2024-01-01T00:00:00+00:00"
+
+
+def bench_email(index: int) -> str:
+    return f"bench{index}@bench.local"
+
+
+def bench_token(index: int) -> str:
+    return f"bench-token-{index}"
+
+
+def synthetic_accounts(count: int) -> list:
+    """user_accounts rows for the benchmark, all Deriv, all active."""
+    return [
+        {
+            "id": index,
+            "user_email": bench_email(index),
+            "broker_type": "deriv",
+            "broker_credentials": None,
+            "deriv_api_token": bench_token(index),
+            "deriv_account_id": None,
+            "account_size": 10000,
+            "max_drawdown_limit": 1000,
+            "profit_target": 800,
+            "daily_loss_limit": 500,
+            "account_tier": None,
+            "challenge_status": "active",
+            "is_active": True,
+            "updated_at": UPDATED_AT,
+        }
+        for index in range(1, count + 1)
+    ]
+
+
+class Stats:
+    """Request counters shared by both servers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def inc(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = {}
+
+
+# =============================================================================
+# Deriv WebSocket
+# =============================================================================
+
+class FakeDeriv:
+    """Deriv API v3 subset with deterministic per-token account data."""
+
+    TICK_INTERVAL = 1.0
+    SYMBOL = "R_100"
+    MULTIPLIER = 100
+
+    def __init__(self, stats: Stats, latency: float, jitter: float, error_rate: float, seed: int = 0):
+        self.stats = stats
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.spot = 1000.0
+        self.epoch = int(time.time())
+        self.tick_subscribers: dict[str, tuple] = {}  # subscription id -> (websocket, req_id)
+        self._ticker: asyncio.Task = None
+
+    def _account(self, token: str) -> dict:
+        index = int(token.rsplit("-", 1)[-1]) if token.rsplit("-", 1)[-1].isdigit() else 0
+        # Spread equity around the 10k account size so some accounts breach or pass
+        balance = 9000.0 + (index * 37) % 2000
+        contracts = [
+            {
+                "contract_id": index * 10 + n, "contract_type": "MULTUP", "symbol": self.SYMBOL,
+                "buy_price": 10.0, "bid_price": 10.0 + ((index + n) % 7 - 3),
+            }
+            for n in range(index % 3)
+        ]
+        return {"loginid": f"VRTC{index:07d}", "balance": balance, "contracts": contracts}
+
+    def respond(self, request: dict, session: dict) -> dict:
+        msg_type = next((
+            key for key in ("authorize", "balance", "portfolio", "proposal_open_contract", "ticks", "forget", "ping")
+            if key in request
+        ), None)
+        response = {"echo_req": request, "msg_type": msg_type or "error"}
+        if "req_id" in request:
+            response["req_id"] = request["req_id"]
+
+        if msg_type is None:
+            response["error"] = {"code": "UnrecognisedRequest", "message": "Unrecognised request"}
+        elif self.error_rate and self.random.random() < self.error_rate:
+            response["error"] = {"code": "RateLimit", "message": "Injected failure"}
+        elif msg_type == "ping":
+            response["ping"] = "pong"
+        elif msg_type == "ticks":
+            subscription_id = f"{request['ticks']}-{len(self.tick_subscribers)}-{self.random.getrandbits(32):08x}"
+            session.setdefault("subscriptions", {})[subscription_id] = request.get("req_id")
+            response["tick"] = self._tick(request["ticks"], subscription_id)
+            response["subscription"] = {"id": subscription_id}
+        elif msg_type == "forget":
+            response["forget"] = 1 if session.get("subscriptions", {}).pop(request["forget"], None) else 0
+            self.tick_subscribers.pop(request["forget"], None)
+        elif msg_type == "authorize":
+            account = self._account(request["authorize"])
+            session["account"] = account
+            response["authorize"] = {
+                "loginid": account["loginid"], "is_virtual": 1,
+                "currency": "USD", "balance": account["balance"],
+            }
+        elif "account" not in session:
+            response["error"] = {"code": "AuthorizationRequired", "message": "Please log in."}
+        elif msg_type == "balance":
+            account = session["account"]
+            response["balance"] = {"balance": account["balance"], "currency": "USD", "loginid": account["loginid"]}
+        elif msg_type == "portfolio":
+            response["portfolio"] = {"contracts": session["account"]["contracts"]}
+        elif msg_type == "proposal_open_contract":
+            row = next((c for c in session["account"]["contracts"] if c["contract_id"] == request["contract_id"]), None)
+            response["proposal_open_contract"] = self._open_contract(row) if row else {}
+        return response
+
+    def _tick(self, symbol: str, subscription_id: str) -> dict:
+        return {"symbol": symbol, "quote": round(self.spot, 2), "epoch": self.epoch, "id": subscription_id}
+
+    def _open_contract(self, row: dict) -> dict:
+        # Entry spot chosen so the multiplier's value at the current spot is the row's bid
+        exposure = row["buy_price"] * self.MULTIPLIER
+        entry_spot = self.spot / (1 + (row["bid_price"] - row["buy_price"]) / exposure)
+        return {
+            "contract_id": row["contract_id"], "contract_type": row["contract_type"], "underlying": row["symbol"],
+            "buy_price": row["buy_price"], "bid_price": row["bid_price"], "multiplier": self.MULTIPLIER,
+            "entry_spot": round(entry_spot, 4), "current_spot": round(self.spot, 2), "current_spot_time": self.epoch,
+            "limit_order": {}, "is_sold": 0, "is_expired": 0,
+        }
+
+    async def _tick_loop(self) -> None:
+        """Advance the spot and push it to every ticks subscriber."""
+        while True:
+            await asyncio.sleep(self.TICK_INTERVAL)
+            self.spot *= 1 + self.random.gauss(0, 0.0005)
+            self.epoch += 1
+            for subscription_id, (websocket, req_id) in list(self.tick_subscribers.items()):
+                message = {
+                    "echo_req": {"ticks": self.SYMBOL, "subscribe": 1}, "msg_type": "tick", "req_id": req_id,
+                    "tick": self._tick(self.SYMBOL, subscription_id), "subscription": {"id": subscription_id},
+                }
+                try:
+                    await websocket.send(json.dumps(message))
+                    self.stats.inc("deriv_ticks")
+                except websockets.ConnectionClosed:
+                    self.tick_subscribers.pop(subscription_id, None)
+
+    async def _reply(self, websocket, request: dict, session: dict) -> None:
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        response = self.respond(request, session)
+        self.stats.inc("deriv_requests")
+        if "error" in response:
+            self.stats.inc("deriv_errors")
+        try:
+            await websocket.send(json.dumps(response))
+        except websockets.ConnectionClosed:
+            return
+        if "subscription" in response:
+            self.tick_subscribers[response["subscription"]["id"]] = (websocket, request.get("req_id"))
+            if self._ticker is None or self._ticker.done():
+                self._ticker = asyncio.create_task(self._tick_loop())
+
+    async def handler(self, websocket, path=None) -> None:
+        """One connection; requests are answered concurrently, like the real API."""
+        self.stats.inc("deriv_connections")
+        session = {}
+        tasks = set()
+        try:
+            async for message in websocket:
+                task = asyncio.create_task(self._reply(websocket, json.loads(message), session))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            for subscription_id in session.get("subscriptions", {}):
+                self.tick_subscribers.pop(subscription_id, None)
+
+
+# =============================================================================
+# PostgREST
+# =============================================================================
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    operator, _, value = expression.partition(".")
+    actual = row.get(column)
+    if isinstance(actual, bool):
+        actual, value = str(actual).lower(), value.lower()
+    else:
+        actual = str(actual)
+    if operator == "eq":
+        return actual == value
+    if operator == "gte":
+        return actual >= value
+    if operator == "in":
+        return actual in [item.strip('"') for item in value.strip("()").split(",")]
+    return True
+
+
+class FakePostgREST:
+    """In-memory tables behind the subset of PostgREST the engine uses."""
+
+    RESERVED_PARAMS = {"select", "order", "offset", "limit", "on_conflict", "columns"}
+
+    def __init__(self, stats: Stats, accounts: int):
+        self.stats = stats
+        self.lock = threading.Lock()
+        self.tables = {"user_accounts": synthetic_accounts(accounts)}
+        self.upserts = {}
+
+    def select(self, table: str, params: list) -> list:
+        with self.lock:
+            rows = self.tables.get(table, [])
+        filters = [(column, value) for column, value in params if column not in self.RESERVED_PARAMS]
+        rows = [row for row in rows if all(_matches(row, column, value) for column, value in filters)]
+        query = dict(params)
+        offset = int(query.get("offset", 0))
+        limit = int(query["limit"]) if "limit" in query else None
+        return rows[offset:offset + limit] if limit is not None else rows[offset:]
+
+    def upsert(self, table: str, on_conflict: str, payload) -> None:
+        rows = payload if isinstance(payload, list) else [payload]
+        with self.lock:
+            stored = self.upserts.setdefault(table, {})
+            for row in rows:
+                stored[row.get(on_conflict or "user_email")] = row
+
+    def update(self, table: str, params: list, values: dict) -> None:
+        filters = [(column, value) for column, value in params if column not in self.RESERVED_PARAMS]
+        with self.lock:
+            for row in self.tables.get(table, []):
+                if all(_matches(row, column, value) for column, value in filters):
+                    row.update(values or {})
+
+    def rpc(self, name: str, payload: dict):
+        # daily_pnl_by_user: nobody has traded today
+        if name == "daily_pnl_by_user":
+            return 200, []
+        return 404, {"code": "PGRST202", "message": f"Could not find the function public.{name}"}
+
+
+def make_rest_handler(rest: FakePostgREST, stats: Stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"null") if length else None
+
+        def _route(self):
+            parts = urlsplit(self.path)
+            segments = [segment for segment in parts.path.split("/") if segment]
+            return segments, parse_qsl(parts.query, keep_blank_values=True)
+
+        def do_GET(self):
+            segments, params = self._route()
+            if segments == ["__stats"]:
+                return self._send(200, stats.snapshot())
+            stats.inc("rest_requests")
+            if segments[:2] != ["rest", "v1"] or len(segments) != 3:
+                return self._send(404, {"message": "Not found"})
+            self._send(200, rest.select(segments[2], params))
+
+        def do_POST(self):
+            segments, params = self._route()
+            body = self._body()
+            if segments == ["__reset"]:
+                stats.reset()
+                return self._send(200, {})
+            stats.inc("rest_requests")
+            if segments[:3] == ["rest", "v1", "rpc"] and len(segments) == 4:
+                return self._send(*rest.rpc(segments[3], body or {}))
+            if segments[:2] == ["rest", "v1"] and len(segments) == 3:
+                rest.upsert(segments[2], dict(params).get("on_conflict"), body)
+                return self._send(201, [])
+            self._send(404, {"message": "Not found"})
+
+        def do_PATCH(self):
+            segments, params = self._route()
+            body = self._body()
+            stats.inc("rest_requests")
+            if segments[:2] == ["rest", "v1"] and len(segments) == 3:
+                rest.update(segments[2], params, body)
+            self._send(200, [])
+
+    return Handler
+
+
+def raise_fd_limit() -> None:
+    """One socket per session: lift the soft open-file limit to the hard limit."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def serve(args) -> None:
+    raise_fd_limit()
+    stats = Stats()
+
+    rest = FakePostgREST(stats, args.accounts)
+    http_server = ThreadingHTTPServer((args.host, args.rest_port), make_rest_handler(rest, stats))
+    http_server.daemon_threads = True
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+
+    deriv = FakeDeriv(stats, args.latency_ms / 1000.0, args.jitter_ms / 1000.0, args.error_rate, args.seed)
+    async with websockets.serve(deriv.handler, args.host, args.deriv_port, max_size=None, ping_interval=None):
+        print(f"fake deriv ws://{args.host}:{args.deriv_port} | fake postgrest http://{args.host}:{args.rest_port} | {args.accounts} account(s)", flush=True)
+        await asyncio.Future()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Deriv WebSocket and PostgREST stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--deriv-port", type=int, default=8765)
+    parser.add_argument("--rest-port", type=int, default=8766)
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mean Deriv response latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of Deriv requests answered with an error")
+    parser.add_argument("--seed", type=int, default=0)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
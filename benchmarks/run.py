@@ -0,0 +1,302 @@
+"""
+Referee Load Benchmark
+
+Drives a full evaluation cycle against the local stand-ins in
+benchmarks/fakes.py, so scaling can be measured without real Deriv or
+Supabase traffic.
+
+For each account count, a fresh fake server and a fresh engine process
+are started. The engine runs --cycles cycles; the first one pays for
+connect + authorize, later ones reuse pooled sessions. Per cycle it
+reports:
+
+- wall time of check_all_traders (referee path) or check_all_accounts
+  (adapter path)
+- p50/p99 per-trader latency
+- requests/sec served by the fakes (Deriv + PostgREST)
+- peak RSS of the engine process
+
+Every run is appended to benchmarks/results.jsonl and compared with the
+previous run of the same scenario, so regressions show up over time.
+
+Usage:
+    python -m benchmarks.run                          # 100, 1k, 10k accounts, referee path
+    python -m benchmarks.run --accounts 1000 --path adapters --latency-ms 50 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+from colorama import Fore, Style, init
+
+from benchmarks.fakes import raise_fd_limit
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _http(url: str, method: str = "GET") -> dict:
+    request = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read() or b"{}")
+
+
+# =============================================================================
+# Engine side (runs in its own process)
+# =============================================================================
+
+async def run_cycles(path: str, cycles: int, stats_url: str) -> dict:
+    """Run evaluation cycles in this process and measure them."""
+    from src import dispatcher, referee
+    from src.sessions import close_all_pools
+    from src.valuation import valuation_engine
+
+    latencies: list = []
+    statuses: list = []
+
+    def timed(check):
+        async def wrapper(user, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                status = await check(user, *args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+            return status
+        return wrapper
+
+    if path == "adapters":
+        dispatcher.check_account = timed(dispatcher.check_account)
+        run_cycle = dispatcher.check_all_accounts
+    else:
+        referee.check_single_trader = timed(referee.check_single_trader)
+        run_cycle = referee.check_all_traders
+
+    results = []
+    try:
+        for cycle in range(1, cycles + 1):
+            latencies.clear()
+            statuses.clear()
+            _http(f"{stats_url}/__reset", "POST")
+            started = time.perf_counter()
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                await run_cycle()
+            wall = time.perf_counter() - started
+            served = _http(f"{stats_url}/__stats")
+            requests = served.get("deriv_requests", 0) + served.get("rest_requests", 0)
+            results.append({
+                "cycle": cycle,
+                "wall_s": round(wall, 3),
+                "traders": len(statuses),
+                "errors": sum(1 for status in statuses if status is None),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "req_per_s": round(requests / wall, 1) if wall else 0.0,
+                "deriv_requests": served.get("deriv_requests", 0),
+                "deriv_connections": served.get("deriv_connections", 0),
+                "rest_requests": served.get("rest_requests", 0),
+            })
+    finally:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            await valuation_engine.close()
+            await close_all_pools()
+        referee.equity_store.close()
+
+    return {"cycles": results, "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def worker_main(args) -> None:
+    raise_fd_limit()
+    result = asyncio.run(run_cycles(args.path, args.cycles, args.stats_url))
+    print(json.dumps(result))
+
+
+# =============================================================================
+# Orchestrator
+# =============================================================================
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Fake server exited during startup")
+        try:
+            _http(f"{url}/__stats")
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Fake server did not start")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_scenario(args, accounts: int) -> dict:
+    """Start fresh fakes and a fresh engine process for one account count."""
+    deriv_port, rest_port = _free_port(), _free_port()
+    rest_url = f"http://127.0.0.1:{rest_port}"
+    fakes = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fakes",
+         "--accounts", str(accounts), "--deriv-port", str(deriv_port), "--rest-port", str(rest_port),
+         "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+         "--error-rate", str(args.error_rate)],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL
+    )
+    equity_dir = tempfile.mkdtemp(prefix="bench-equity-")
+    try:
+        _wait_ready(rest_url, fakes)
+        env = dict(
+            os.environ,
+            DERIV_APP_ID="1",
+            DERIV_API_TOKEN="bench",
+            DERIV_ENDPOINT=f"ws://127.0.0.1:{deriv_port}",
+            SUPABASE_URL=rest_url,
+            SUPABASE_SERVICE_KEY="bench",
+            METRICS_PORT="0",
+            ENGINE_SHARDING="false",
+            EQUITY_STORE_DIR=equity_dir,
+        )
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker",
+             "--path", args.path, "--cycles", str(args.cycles), "--stats-url", rest_url],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=args.timeout
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Engine process failed:\n{completed.stderr[-2000:]}")
+        measured = json.loads(completed.stdout.strip().splitlines()[-1])
+    finally:
+        fakes.terminate()
+        fakes.wait(timeout=10)
+        shutil.rmtree(equity_dir, ignore_errors=True)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "host": platform.node(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "path": args.path,
+        "accounts": accounts,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "concurrency": os.getenv("REFEREE_MAX_CONCURRENCY", ""),
+        **measured,
+    }
+
+
+def _scenario_key(result: dict) -> tuple:
+    return (result["path"], result["accounts"], result["latency_ms"], result["jitter_ms"],
+            result["error_rate"], result.get("concurrency", ""))
+
+
+def load_previous(path: str = RESULTS_FILE) -> dict:
+    """Most recent stored result per scenario."""
+    previous = {}
+    if not os.path.exists(path):
+        return previous
+    with open(path) as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                result = json.loads(line)
+                previous[_scenario_key(result)] = result
+    return previous
+
+
+def _delta(current: float, before: float) -> str:
+    if not before:
+        return ""
+    change = (current - before) / before * 100
+    color = Fore.RED if change > 10 else Fore.GREEN if change < -10 else ""
+    return f" {color}({change:+.0f}%){Style.RESET_ALL}"
+
+
+def report(result: dict, previous: dict = None) -> None:
+    print(f"{Style.BRIGHT}[{result['path']}] {result['accounts']} account(s) | latency {result['latency_ms']:g}±{result['jitter_ms']:g}ms | error rate {result['error_rate']:g}{Style.RESET_ALL}")
+    before_cycles = {c["cycle"]: c for c in (previous or {}).get("cycles", [])}
+    for cycle in result["cycles"]:
+        before = before_cycles.get(cycle["cycle"], {})
+        label = "cold" if cycle["cycle"] == 1 else "warm"
+        print(
+            f"  cycle {cycle['cycle']} ({label}): wall {cycle['wall_s']:.2f}s{_delta(cycle['wall_s'], before.get('wall_s'))}"
+            f" | p50 {cycle['p50_ms']:.1f}ms | p99 {cycle['p99_ms']:.1f}ms{_delta(cycle['p99_ms'], before.get('p99_ms'))}"
+            f" | {cycle['req_per_s']:.0f} req/s | errors {cycle['errors']}/{cycle['traders']}"
+        )
+    print(f"  peak RSS {result['peak_rss_mb']:.1f} MB{_delta(result['peak_rss_mb'], (previous or {}).get('peak_rss_mb'))}\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline referee load benchmark")
+    parser.add_argument("--accounts", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--path", choices=("referee", "adapters"), default="referee",
+                        help="referee: check_all_traders; adapters: check_all_accounts via DerivAdapter")
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Per-scenario limit (seconds)")
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--no-save", action="store_true", help="Do not append to the results file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stats-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+
+    init(autoreset=True)
+    previous = load_previous(args.results)
+    for accounts in args.accounts:
+        result = run_scenario(args, accounts)
+        report(result, previous.get(_scenario_key(result)))
+        if not args.no_save:
+            with open(args.results, "a") as handle:
+                handle.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,7 @@
 """Check user statuses."""
-import os
-from dotenv import load_dotenv
-load_dotenv()
 try:
-    from supabase import create_client
-    c = create_client(os.environ['SUPABASE_URL'], os.environ['SUPABASE_SERVICE_KEY'])
+    from src.db import get_supabase
+    c = get_supabase()
     r = c.table('user_accounts').select('user_email, challenge_status, account_size, max_drawdown_limit, profit_target').execute()
     
     print("Current user statuses:")
@@ -16,4 +13,4 @@ try:
         target = user['profit_target']
         print(f"{email}: status={status}, account_size={size}, drawdown={drawdown}, target={target}")
 except Exception as e:
-    print(f"Error: {e}")
\ No newline at end of file
+    print(f"Error: {e}")
@@ -2,25 +2,65 @@ import asyncio
 from datetime import datetime, timezone
 from colorama import Fore, Style, init
 
-from src.referee import check_all_traders
+from src import config
+from src.ctrader_connection import close_ctrader_connections
+from src.db import close_db
+from src.dispatcher import run_family_loops
+from src.http_client import close_http_client
+from src.metrics import start_metrics_server
+from src.mt_ingest import start_ingest_server, stop_ingest_server
+from src.referee import equity_store, supabase
+from src.sessions import close_all_pools
+from src.sharding import start_sharding, stop_sharding
+from src.valuation import valuation_engine
 
 init(autoreset=True)
 
 
 async def main():
+    config.validate()
+
     print(f"{Style.BRIGHT}=== Syntax Engine Live Check (Multi-User) ==={Style.RESET_ALL}")
     print("Press Ctrl+C to exit.\n")
 
-    while True:
+    if start_metrics_server():
+        print(f"{Fore.BLUE}>>> Prometheus metrics on :{config.METRICS_PORT}/metrics{Style.RESET_ALL}\n")
+    if start_ingest_server():
+        print(f"{Fore.BLUE}>>> MT4/MT5 EA ingestion on :{config.MT_INGEST_PORT}/mt-webhook{Style.RESET_ALL}\n")
+
+    try:
+        if config.ENGINE_SHARDING:
+            coordinator = await start_sharding(supabase)
+            print(f"{Fore.BLUE}>>> Sharding enabled as worker {coordinator.worker_id}{Style.RESET_ALL}\n")
+
+        if config.REFEREE_MODE == "stream":
+            from src.streaming import StreamingReferee
+
+            print(f"{Fore.BLUE}>>> Streaming mode: evaluating on every balance/contract update{Style.RESET_ALL}\n")
+            await StreamingReferee().run()
+            return
+
+        if config.REFEREE_MODE == "schedule":
+            from src.scheduler import TraderScheduler
+
+            print(f"{Fore.BLUE}>>> Scheduled mode: check frequency follows distance to breach/target{Style.RESET_ALL}\n")
+            await TraderScheduler().run()
+            return
+
         now = datetime.now(timezone.utc).isoformat()
         print(f"{Fore.CYAN}{'='*50}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}[{now}]{Style.RESET_ALL}")
-        print(f"{Fore.BLUE}>>> Initiating Multi-User Connection Check...{Style.RESET_ALL}\n")
-
-        await check_all_traders()
-
-        print(f"\n{Fore.MAGENTA}Sleeping 30s before next check...{Style.RESET_ALL}\n")
-        await asyncio.sleep(30)
+        print(f"{Fore.BLUE}>>> Polling every broker family on its own loop (every {config.REFEREE_POLL_INTERVAL:.0f}s unless BROKER_POLL_INTERVAL says otherwise){Style.RESET_ALL}\n")
+        await run_family_loops()
+    finally:
+        await stop_sharding()
+        await valuation_engine.close()
+        await close_all_pools()
+        await close_http_client()
+        await close_ctrader_connections()
+        equity_store.close()
+        stop_ingest_server()
+        close_db()
 
 
 if __name__ == "__main__":
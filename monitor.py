@@ -1,20 +1,23 @@
 """Simple web dashboard to monitor trading engine."""
-from flask import Flask, render_template_string
-from supabase import create_client
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from flask import Flask, Response, make_response, render_template_string, request
 from datetime import datetime, timezone
 from src import config
+from src.db import supabase
 
 app = Flask(__name__)
 
-# Initialize Supabase
-supabase = create_client(config.SUPABASE_URL, config.SUPABASE_SERVICE_KEY)
-
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
     <title>Syntax Engine Monitor</title>
-    <meta http-equiv="refresh" content="30">
+    <noscript><meta http-equiv="refresh" content="30"></noscript>
     <style>
         body { font-family: Arial, sans-serif; margin: 20px; }
         .status-active { color: blue; }
@@ -24,15 +27,18 @@ HTML_TEMPLATE = """
         table { border-collapse: collapse; width: 100%; }
         th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
         th { background-color: #f2f2f2; }
+        tr.changed td { background-color: #fff6c2; }
+        td { transition: background-color 1s; }
         .refresh { color: #666; font-size: 12px; }
     </style>
 </head>
-<body>
+<body data-version="{{ version }}">
     <h1>🔥 Syntax Engine Monitor</h1>
-    <p class="refresh">Auto-refreshes every 30 seconds | Last update: {{ timestamp }}</p>
+    <p class="refresh"><span id="live">Auto-refreshes every 30 seconds</span> | Last update: <span id="timestamp">{{ timestamp }}</span></p>
 
     <h2>Trading States</h2>
     <table>
+        <thead>
         <tr>
             <th>User Email</th>
             <th>Balance</th>
@@ -41,8 +47,10 @@ HTML_TEMPLATE = """
             <th>Status</th>
             <th>Last Trade</th>
         </tr>
+        </thead>
+        <tbody id="traders">
         {% for trader in traders %}
-        <tr class="status-{{ trader.status.lower() }}">
+        <tr class="status-{{ trader.status.lower() }}" data-key="{{ trader.user_email }}">
             <td>{{ trader.user_email }}</td>
             <td>${{ "%.2f"|format(trader.balance) }}</td>
             <td>${{ "%.2f"|format(trader.equity) }}</td>
@@ -51,14 +59,14 @@ HTML_TEMPLATE = """
             <td>{{ trader.last_trade_at[:19] if trader.last_trade_at else 'Never' }}</td>
         </tr>
         {% endfor %}
+        </tbody>
     </table>
 
-    {% if not traders %}
-    <p>No trading data available.</p>
-    {% endif %}
+    <p id="no-traders"{% if traders %} hidden{% endif %}>No trading data available.</p>
 
     <h2>User Accounts</h2>
     <table>
+        <thead>
         <tr>
             <th>User Email</th>
             <th>Broker</th>
@@ -67,8 +75,10 @@ HTML_TEMPLATE = """
             <th>Profit Target</th>
             <th>Challenge Status</th>
         </tr>
+        </thead>
+        <tbody id="users">
         {% for user in users %}
-        <tr>
+        <tr data-key="{{ user.user_email }}">
             <td>{{ user.user_email }}</td>
             <td>{{ user.broker_type.upper() }}</td>
             <td>${{ "%.2f"|format(user.account_size) if user.account_size else 'N/A' }}</td>
@@ -77,27 +87,329 @@ HTML_TEMPLATE = """
             <td>{{ user.challenge_status.upper() if user.challenge_status else 'ACTIVE' }}</td>
         </tr>
         {% endfor %}
+        </tbody>
     </table>
+
+    <script>
+    // Live updates: /events pushes only changed rows; patch them in place
+    (function () {
+        if (!window.EventSource) {
+            setTimeout(function () { location.reload(); }, 30000);
+            return;
+        }
+        function money(value) { return "$" + Number(value || 0).toFixed(2); }
+        function optionalMoney(value) { return value ? money(value) : "N/A"; }
+        var columns = {
+            traders: function (t) {
+                return [t.user_email, money(t.balance), money(t.equity), money(t.daily_pnl),
+                        (t.status || "").toUpperCase(), t.last_trade_at ? t.last_trade_at.slice(0, 19) : "Never"];
+            },
+            users: function (u) {
+                return [u.user_email, (u.broker_type || "").toUpperCase(), optionalMoney(u.account_size),
+                        optionalMoney(u.max_drawdown_limit), optionalMoney(u.profit_target),
+                        u.challenge_status ? u.challenge_status.toUpperCase() : "ACTIVE"];
+            }
+        };
+        function buildRow(table, record) {
+            var row = document.createElement("tr");
+            row.dataset.key = record.user_email;
+            if (table === "traders") row.className = "status-" + (record.status || "").toLowerCase();
+            columns[table](record).forEach(function (text) {
+                var cell = document.createElement("td");
+                cell.textContent = text;
+                row.appendChild(cell);
+            });
+            return row;
+        }
+        function findRow(body, key) {
+            for (var i = 0; i < body.rows.length; i++) {
+                if (body.rows[i].dataset.key === key) return body.rows[i];
+            }
+            return null;
+        }
+        function patch(table, change) {
+            var body = document.getElementById(table);
+            (change.remove || []).forEach(function (key) {
+                var row = findRow(body, key);
+                if (row) row.remove();
+            });
+            (change.upsert || []).forEach(function (record) {
+                var row = buildRow(table, record), existing = findRow(body, record.user_email);
+                if (existing) body.replaceChild(row, existing); else body.appendChild(row);
+                row.classList.add("changed");
+                setTimeout(function () { row.classList.remove("changed"); }, 2000);
+            });
+        }
+        function replace(table, records) {
+            var body = document.getElementById(table);
+            body.textContent = "";
+            records.forEach(function (record) { body.appendChild(buildRow(table, record)); });
+        }
+        function finish(message) {
+            document.getElementById("timestamp").textContent = message.timestamp;
+            document.getElementById("no-traders").hidden = document.getElementById("traders").rows.length > 0;
+        }
+        var source = new EventSource("/events?since=" + encodeURIComponent(document.body.dataset.version));
+        source.addEventListener("delta", function (event) {
+            var message = JSON.parse(event.data);
+            Object.keys(columns).forEach(function (table) { if (message[table]) patch(table, message[table]); });
+            finish(message);
+        });
+        source.addEventListener("snapshot", function (event) {
+            var message = JSON.parse(event.data);
+            Object.keys(columns).forEach(function (table) { replace(table, message[table] || []); });
+            finish(message);
+        });
+        source.onopen = function () { document.getElementById("live").textContent = "Live"; };
+        source.onerror = function () { document.getElementById("live").textContent = "Reconnecting..."; };
+    })();
+    </script>
 </body>
 </html>
 """
 
+def fetch_dashboard_data() -> dict:
+    """Load both dashboard tables from Supabase."""
+    # Get trading states
+    trading_response = supabase.table("trading_states").select("*").execute()
+    traders = trading_response.data or []
+
+    # Get user accounts
+    users_response = supabase.table("user_accounts").select("user_email, broker_type, account_size, max_drawdown_limit, profit_target, challenge_status").execute()
+    users = users_response.data or []
+
+    return {"traders": traders, "users": users}
+
+
+# Distinguishes this process's versions from a previous run's after a restart
+EPOCH = f"{int(time.time()):x}"
+
+TABLE_KEY = "user_email"
+
+
+def diff_rows(old_rows: list, new_rows: list, key: str = TABLE_KEY) -> dict:
+    """Rows added or changed, and keys removed, between two fetches of a table."""
+    old = {row.get(key): row for row in old_rows}
+    new = {row.get(key): row for row in new_rows}
+    change = {}
+    upsert = [row for row_key, row in new.items() if old.get(row_key) != row]
+    remove = [row_key for row_key in old if row_key not in new]
+    if upsert:
+        change["upsert"] = upsert
+    if remove:
+        change["remove"] = remove
+    return change
+
+
+class DashboardSnapshot:
+    """One fetch of the dashboard data, with its validators and rendered page."""
+
+    def __init__(self, data: dict, fetched_at: float, version: int, previous: "DashboardSnapshot" = None):
+        self.data = data
+        self.fetched_at = fetched_at
+        self.etag = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        # Last-Modified and the version only move when the content actually changed
+        if previous is not None and previous.etag == self.etag:
+            self.version = previous.version
+            self.last_modified = previous.last_modified
+            self.html = previous.html
+        else:
+            self.version = version
+            self.last_modified = datetime.fromtimestamp(fetched_at, timezone.utc).replace(microsecond=0)
+            self.html = None
+
+    @property
+    def version_id(self) -> str:
+        return f"{EPOCH}-{self.version}"
+
+    @property
+    def timestamp(self) -> str:
+        return self.last_modified.strftime('%Y-%m-%d %H:%M:%S UTC')
+
+    def render(self) -> str:
+        if self.html is None:
+            self.html = render_template_string(HTML_TEMPLATE, timestamp=self.timestamp, version=self.version_id, **self.data)
+        return self.html
+
+
+class DashboardCache:
+    """
+    Shared TTL cache for the dashboard data.
+
+    Fresh snapshots are served as-is. Once the TTL passes, the stale
+    snapshot keeps being served while a single background thread
+    refetches (stale-while-revalidate); only a cold start or a snapshot
+    older than max_stale blocks on Supabase. However many viewers are
+    open, Supabase sees at most one fetch per TTL window.
+
+    Each content change gets a new version and its row-level delta is
+    kept in a short history, so live viewers (/events) receive only the
+    rows that changed. While anyone is watching, a poller refreshes
+    every TTL.
+    """
+
+    def __init__(self, loader, ttl: float = None, max_stale: float = None, history: int = None):
+        self.loader = loader
+        self.ttl = ttl if ttl is not None else config.MONITOR_CACHE_TTL
+        self.max_stale = max_stale if max_stale is not None else config.MONITOR_CACHE_MAX_STALE
+        self.snapshot = None
+        self.changes = deque(maxlen=history or config.MONITOR_DELTA_HISTORY)  # (version, delta)
+        self._lock = threading.Lock()  # held while fetching
+        self._state_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._refreshing = False
+        self._polling = False
+        self._watchers = 0
+
+    def _refresh(self) -> DashboardSnapshot:
+        data = self.loader()
+        previous = self.snapshot
+        version = previous.version + 1 if previous is not None else 1
+        snapshot = DashboardSnapshot(data, time.time(), version, previous)
+        if previous is not None and snapshot.version != previous.version:
+            delta = {table: diff_rows(previous.data.get(table, []), rows) for table, rows in data.items()}
+            delta["timestamp"] = snapshot.timestamp
+            self.changes.append((snapshot.version, delta))
+        self.snapshot = snapshot
+        if previous is None or snapshot.version != previous.version:
+            with self._changed:
+                self._changed.notify_all()
+        return snapshot
+
+    def _refresh_in_background(self) -> None:
+        try:
+            with self._lock:
+                self._refresh()
+        except Exception as e:
+            print(f"⚠ Dashboard refresh failed, serving stale data: {e}")
+        finally:
+            self._refreshing = False
+
+    def get(self) -> DashboardSnapshot:
+        snapshot = self.snapshot
+        now = time.time()
+        if snapshot is not None and now - snapshot.fetched_at < self.ttl:
+            return snapshot
+
+        if snapshot is not None and now - snapshot.fetched_at < self.ttl + self.max_stale:
+            with self._state_lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+            return snapshot
+
+        # Cold start or too stale: fetch now, once for all waiting requests
+        with self._lock:
+            if self.snapshot is not None and time.time() - self.snapshot.fetched_at < self.ttl:
+                return self.snapshot
+            return self._refresh()
+
+    def changes_since(self, version: int):
+        """Deltas after `version`, oldest first; None if the history no longer reaches back that far."""
+        current = self.snapshot.version if self.snapshot is not None else 0
+        if version == current:
+            return []
+        pending = [(v, delta) for v, delta in list(self.changes) if v > version]
+        if version > current or not pending or pending[0][0] != version + 1:
+            return None
+        return pending
+
+    def wait_for_change(self, version: int, timeout: float) -> bool:
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: self.snapshot is not None and self.snapshot.version != version, timeout
+            )
+
+    def _poll(self) -> None:
+        while True:
+            time.sleep(self.ttl)
+            with self._state_lock:
+                if not self._watchers:
+                    self._polling = False
+                    return
+            try:
+                with self._lock:
+                    self._refresh()
+            except Exception as e:
+                print(f"⚠ Dashboard refresh failed: {e}")
+
+    @contextmanager
+    def watch(self):
+        """Keep the data refreshing every TTL while a live viewer is connected."""
+        with self._state_lock:
+            self._watchers += 1
+            start = not self._polling
+            self._polling = True
+        if start:
+            threading.Thread(target=self._poll, daemon=True).start()
+        try:
+            yield self
+        finally:
+            with self._state_lock:
+                self._watchers -= 1
+
+
+dashboard_cache = DashboardCache(fetch_dashboard_data)
+
+
+def _sse(event: str, data: dict, event_id: str = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _parse_version(version_id: str):
+    """Version number from an "<epoch>-<version>" id issued by this process, else None."""
+    epoch, _, version = (version_id or "").partition("-")
+    if epoch != EPOCH or not version.isdigit():
+        return None
+    return int(version)
+
+
 @app.route('/')
 def dashboard():
     try:
-        # Get trading states
-        trading_response = supabase.table("trading_states").select("*").execute()
-        traders = trading_response.data or []
+        snapshot = dashboard_cache.get()
+    except Exception as e:
+        return f"<h1>Error loading dashboard: {e}</h1>"
 
-        # Get user accounts
-        users_response = supabase.table("user_accounts").select("user_email, broker_type, account_size, max_drawdown_limit, profit_target, challenge_status").execute()
-        users = users_response.data or []
+    # Conditional GET: unchanged data answers 304 without a body
+    response = make_response(snapshot.render())
+    response.set_etag(snapshot.etag)
+    response.last_modified = snapshot.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
-        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
 
-        return render_template_string(HTML_TEMPLATE, traders=traders, users=users, timestamp=timestamp)
-    except Exception as e:
-        return f"<h1>Error loading dashboard: {e}</h1>"
+@app.route('/events')
+def events():
+    """Server-Sent Events: changed rows as "delta" events, or a full "snapshot" to resync."""
+    # EventSource sends Last-Event-ID when it reconnects
+    version = _parse_version(request.headers.get("Last-Event-ID") or request.args.get("since"))
+
+    def stream(version):
+        with dashboard_cache.watch():
+            dashboard_cache.get()
+            while True:
+                pending = dashboard_cache.changes_since(version) if version is not None else None
+                if pending is None:
+                    snapshot = dashboard_cache.snapshot
+                    yield _sse("snapshot", {**snapshot.data, "timestamp": snapshot.timestamp}, snapshot.version_id)
+                    version = snapshot.version
+                else:
+                    for pending_version, delta in pending:
+                        yield _sse("delta", delta, f"{EPOCH}-{pending_version}")
+                        version = pending_version
+                if not dashboard_cache.wait_for_change(version, config.MONITOR_SSE_KEEPALIVE):
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+
+    return Response(stream(version), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache", "X-Accel-Buffering": "no"
+    })
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
@@ -1,23 +1,50 @@
 # Broker Adapters Package
+#
+# Adapters are registered by import path and loaded on first use, so
+# importing the package (or one adapter) does not pull in every broker's
+# client library.
+from importlib import import_module
+
 from .base import BrokerAdapter, AccountState
-from .deriv import DerivAdapter
-from .ctrader import CTraderAdapter
-from .mt4mt5 import MT4MT5Adapter
-from .experimental import IQOptionAdapter, PocketOptionAdapter
 
 ADAPTERS = {
-    "deriv": DerivAdapter,
-    "ctrader": CTraderAdapter,
-    "mt4": MT4MT5Adapter,
-    "mt5": MT4MT5Adapter,
-    "iqoption": IQOptionAdapter,
-    "pocket": PocketOptionAdapter,
+    "deriv": "src.adapters.deriv:DerivAdapter",
+    "ctrader": "src.adapters.ctrader:CTraderAdapter",
+    "mt4": "src.adapters.mt4mt5:MT4MT5Adapter",
+    "mt5": "src.adapters.mt4mt5:MT4MT5Adapter",
 }
 
+_loaded: dict[str, type] = {}
+
+
+def register_adapter(broker_type: str, target) -> None:
+    """Register an adapter class, or a "module:Class" path loaded on first use."""
+    ADAPTERS[broker_type.lower()] = target
+    _loaded.pop(broker_type.lower(), None)
+
+
+def _load(target) -> type:
+    if isinstance(target, type):
+        return target
+    module_name, _, class_name = target.partition(":")
+    return getattr(import_module(module_name), class_name)
+
 
 def get_adapter(broker_type: str) -> type:
     """Get the adapter class for a broker type."""
-    adapter_class = ADAPTERS.get(broker_type.lower())
-    if not adapter_class:
-        raise ValueError(f"Unsupported broker type: {broker_type}")
+    broker_type = broker_type.lower()
+    adapter_class = _loaded.get(broker_type)
+    if adapter_class is None:
+        target = ADAPTERS.get(broker_type)
+        if not target:
+            raise ValueError(f"Unsupported broker type: {broker_type}")
+        adapter_class = _loaded[broker_type] = _load(target)
     return adapter_class
+
+
+def __getattr__(name: str):
+    # Keep `from src.adapters import DerivAdapter` working without eager imports
+    for target in ADAPTERS.values():
+        if isinstance(target, str) and target.endswith(f":{name}"):
+            return _load(target)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
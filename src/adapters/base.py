@@ -22,6 +22,7 @@ class AccountState:
     last_trade_at: Optional[datetime]
     account_id: Optional[str] = None
     error: Optional[str] = None
+    open_lots: Optional[float] = None  # open volume in lots, where the broker reports it
     
     @property
     def is_valid(self) -> bool:
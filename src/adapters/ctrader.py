@@ -2,15 +2,16 @@
 cTrader Broker Adapter
 
 Connects to cTrader Open API to fetch account data.
-Requires OAuth authentication and WebSocket/REST calls.
+Requires OAuth authentication; accounts are served over one shared,
+multiplexed Open API connection per application.
 
 Documentation: https://help.ctrader.com/open-api/
 """
 
-from datetime import datetime, timezone
-from typing import Optional
-
 from .base import BrokerAdapter, AccountState
+from src import config
+from src.ctrader_connection import get_ctrader_connection
+from src.metrics import time_stage
 
 
 class CTraderAdapter(BrokerAdapter):
@@ -18,21 +19,32 @@ class CTraderAdapter(BrokerAdapter):
     Adapter for cTrader brokers using cTrader Open API.
     
     Required credentials:
-    - client_id: OAuth client ID
-    - client_secret: OAuth client secret  
     - access_token: User's OAuth access token
-    - account_id: cTrader account ID
+    - account_id: cTrader account ID (ctidTraderAccountId)
+    
+    Optional credentials:
+    - client_id / client_secret: OAuth application (default: CTRADER_CLIENT_ID / CTRADER_CLIENT_SECRET)
+    - host: "live" or "demo" (default: "demo" if live is false, else CTRADER_HOST)
+    
+    All accounts of the same application share one Open API connection
+    (see src/ctrader_connection.py).
     
     Note: You need to register an application at https://openapi.ctrader.com/
     """
     
     def __init__(self, credentials: dict, app_config: dict = None):
         super().__init__(credentials, app_config)
-        self.client_id = credentials.get("client_id")
-        self.client_secret = credentials.get("client_secret")
+        self.client_id = credentials.get("client_id") or config.CTRADER_CLIENT_ID
+        self.client_secret = credentials.get("client_secret") or config.CTRADER_CLIENT_SECRET
         self.access_token = credentials.get("access_token")
         self.ctrader_account_id = credentials.get("account_id")
-        self.ws = None
+        if credentials.get("host"):
+            self.host = credentials["host"]
+        elif credentials.get("live") is False:
+            self.host = "demo"
+        else:
+            self.host = config.CTRADER_HOST
+        self.account = None
     
     @property
     def broker_name(self) -> str:
@@ -40,13 +52,11 @@ class CTraderAdapter(BrokerAdapter):
     
     async def connect(self) -> bool:
         """
-        Connect to cTrader Open API.
+        Attach to the shared cTrader Open API connection.
         
-        TODO: Implement full OAuth flow and WebSocket connection:
-        1. If no access_token, redirect to OAuth
-        2. Connect to WebSocket: wss://live.ctraderapi.com:5035
-        3. Authenticate with ProtoOAApplicationAuthReq
-        4. Authorize account with ProtoOAAccountAuthReq
+        The connection is application-authorized once; this account is
+        authorized on it (ProtoOAAccountAuthReq) on first use and again
+        after a reconnect.
         """
         try:
             if not self.access_token:
@@ -55,30 +65,31 @@ class CTraderAdapter(BrokerAdapter):
             if not self.ctrader_account_id:
                 raise ConnectionError("Missing cTrader account_id.")
             
-            # TODO: Implement WebSocket connection
-            # from websockets import connect
-            # self.ws = await connect("wss://live.ctraderapi.com:5035")
-            # Send ProtoOAApplicationAuthReq
-            # Send ProtoOAAccountAuthReq
+            if not self.client_id or not self.client_secret:
+                raise ConnectionError("Missing cTrader client_id/client_secret.")
+            
+            connection = get_ctrader_connection(self.client_id, self.client_secret, self.host)
+            self.account = connection.account(int(self.ctrader_account_id), self.access_token)
+            await self.account.ensure()
             
             self.connected = True
-            self.account_id = self.ctrader_account_id
+            self.account_id = str(self.ctrader_account_id)
             return True
             
         except Exception as e:
             self.connected = False
-            raise ConnectionError(f"cTrader connection failed: {e}")
+            raise ConnectionError(f"cTrader connection failed: {e}") from e
     
     async def fetch_account_state(self) -> AccountState:
         """
         Fetch account state from cTrader.
         
-        TODO: Implement using cTrader Open API:
-        - ProtoOATraderReq to get account info
-        - ProtoOAReconcileReq to get positions
-        - Calculate equity from balance + positions
+        Balance and positions come from the account's shared state
+        (ProtoOATraderReq / ProtoOAReconcileReq, reloaded after execution
+        events); unrealized P&L is re-requested only after spot moves.
+        Equity = balance + unrealized P&L.
         """
-        if not self.connected:
+        if not self.connected or self.account is None:
             return AccountState(
                 balance=0, equity=0, currency="USD",
                 unrealized_pnl=0, daily_pnl=0, last_trade_at=None,
@@ -86,15 +97,18 @@ class CTraderAdapter(BrokerAdapter):
             )
         
         try:
-            # TODO: Implement real API calls
-            # Send ProtoOATraderReq
-            # Parse response for balance, equity
+            with time_stage("ctrader_snapshot"):
+                balance, unrealized_pnl = await self.account.snapshot()
             
-            # Placeholder - return error until implemented
             return AccountState(
-                balance=0, equity=0, currency="USD",
-                unrealized_pnl=0, daily_pnl=0, last_trade_at=None,
-                error="cTrader adapter not fully implemented yet"
+                balance=balance,
+                equity=balance + unrealized_pnl,
+                currency=self.credentials.get("currency", "USD"),
+                unrealized_pnl=unrealized_pnl,
+                daily_pnl=0,  # Calculated from DB
+                last_trade_at=None,
+                account_id=self.account_id,
+                open_lots=self.account.open_lots
             )
             
         except Exception as e:
@@ -105,14 +119,9 @@ class CTraderAdapter(BrokerAdapter):
             )
     
     async def disconnect(self) -> None:
-        """Disconnect from cTrader."""
-        if self.ws:
-            try:
-                await self.ws.close()
-            except:
-                pass
+        """Release this adapter; the shared connection stays open for other accounts."""
         self.connected = False
-        self.ws = None
+        self.account = None
 
 
 # Helper for OAuth flow (to be called from frontend/API)
@@ -7,11 +7,14 @@ Connects to Deriv API via WebSocket to fetch:
 - Account ID (loginid)
 """
 
+import asyncio
 from datetime import datetime, timezone
-from deriv_api import DerivAPI
 
 from .base import BrokerAdapter, AccountState
 from src import config
+from src.metrics import time_stage
+from src.sessions import get_session_pool
+from src.valuation import valuation_engine
 
 
 class DerivAdapter(BrokerAdapter):
@@ -28,18 +31,18 @@ class DerivAdapter(BrokerAdapter):
         return "Deriv"
     
     async def connect(self) -> bool:
-        """Connect and authorize with Deriv API."""
+        """Acquire a pooled, authorized session for this token."""
         try:
-            self.api = DerivAPI(app_id=self.app_id)
-            auth_response = await self.api.authorize(self.token)
+            session = await get_session_pool(self.app_id).acquire(self.token)
+            self.api = session.api
             
             # Extract account ID
-            self.account_id = auth_response.get("authorize", {}).get("loginid")
+            self.account_id = session.account_id
             self.connected = True
             return True
         except Exception as e:
             self.connected = False
-            raise ConnectionError(f"Deriv auth failed: {e}")
+            raise ConnectionError(f"Deriv auth failed: {e}") from e
     
     async def fetch_account_state(self) -> AccountState:
         """Fetch balance, equity, and open positions from Deriv."""
@@ -51,14 +54,10 @@ class DerivAdapter(BrokerAdapter):
             )
         
         try:
-            # Get balance
-            balance_data = await self.api.balance()
-            balance_info = balance_data.get("balance", {})
-            balance = float(balance_info.get("balance", 0))
-            currency = balance_info.get("currency", "USD")
-            
-            # Get unrealized P&L from open positions
-            unrealized_pnl = await self._get_unrealized_pnl()
+            # Balance and open positions share one round trip on the session
+            (balance, currency), unrealized_pnl = await asyncio.gather(
+                self._get_balance(), self._get_unrealized_pnl()
+            )
             
             # Calculate equity
             equity = balance + unrealized_pnl
@@ -73,21 +72,32 @@ class DerivAdapter(BrokerAdapter):
                 account_id=self.account_id
             )
         except Exception as e:
+            # Force the pooled session to reconnect on the next connect()
+            get_session_pool(self.app_id).invalidate(self.token)
             return AccountState(
                 balance=0, equity=0, currency="USD",
                 unrealized_pnl=0, daily_pnl=0, last_trade_at=None,
                 error=str(e)
             )
     
+    async def _get_balance(self) -> tuple[float, str]:
+        """Get (balance, currency) for the authorized account."""
+        with time_stage("deriv_balance"):
+            balance_data = await self.api.balance()
+        balance_info = balance_data.get("balance", {})
+        return float(balance_info.get("balance", 0)), balance_info.get("currency", "USD")
+    
     async def _get_unrealized_pnl(self) -> float:
-        """Get unrealized P&L from open contracts."""
+        """Get unrealized P&L from open contracts of any type."""
         try:
-            # Try to get open positions
-            portfolio = await self.api.portfolio(
-                contract_type=["CALL", "PUT", "MULTUP", "MULTDOWN", "ASIANU", "ASIAND"]
-            )
+            with time_stage("deriv_portfolio"):
+                portfolio = await self.api.portfolio()
             contracts = portfolio.get("portfolio", {}).get("contracts", [])
             
+            if valuation_engine.enabled:
+                # Valued from the latest tick of each underlying
+                return await valuation_engine.sync_account(self.account_id or self.token, self.api, contracts)
+            
             if not contracts:
                 return 0.0
             
@@ -103,11 +113,6 @@ class DerivAdapter(BrokerAdapter):
             return 0.0
     
     async def disconnect(self) -> None:
-        """Disconnect from Deriv API."""
-        if self.api:
-            try:
-                await self.api.disconnect()
-            except:
-                pass
+        """Release the session back to the pool (the connection stays open)."""
         self.connected = False
         self.api = None
@@ -6,15 +6,21 @@ MetaTrader integration options:
 2. EA/Trade Copier that posts data to your endpoint
 3. Third-party bridge services
 
-This adapter supports option 2: reading from a data endpoint
-that your MT4/MT5 EA posts to.
+This adapter supports option 2, either by reading the latest EA post
+from the engine's own ingestion server (bridge_type "push", see
+src/mt_ingest.py) or by polling a data endpoint your EA posts to
+(bridge_type "webhook").
 """
 
+import hmac
+import time
 from datetime import datetime, timezone
 from typing import Optional
-import httpx
 
 from .base import BrokerAdapter, AccountState
+from src import config
+from src.http_client import batch_fetcher, request as http_request
+from src.mt_ingest import ingest_enabled, ingest_store, key_digest
 
 
 class MT4MT5Adapter(BrokerAdapter):
@@ -28,8 +34,13 @@ class MT4MT5Adapter(BrokerAdapter):
     Required credentials:
     - login: MT4/MT5 account number
     - server: Broker server name
-    - data_endpoint: URL where EA posts data (optional)
-    - api_key: Your bridge service API key (optional)
+    - data_endpoint: URL where EA posts data (optional; without it the
+      engine's ingestion server is used)
+    - batch_endpoint: bridge URL returning many logins per request
+      (optional; concurrent lookups are coalesced into one request)
+    - api_key: Your bridge service API key, or for push the key the EA
+      posts with (optional; binds the login to that key, otherwise a
+      MT_INGEST_API_KEYS entry must list the login)
     
     Alternative: Use a bridge service like:
     - MetaAPI.cloud
@@ -43,7 +54,10 @@ class MT4MT5Adapter(BrokerAdapter):
         self.server = credentials.get("server")
         self.data_endpoint = credentials.get("data_endpoint")
         self.api_key = credentials.get("api_key")
-        self.bridge_type = credentials.get("bridge_type", "webhook")  # webhook, metaapi
+        # Bridges that can return many logins at once (GET ?logins=1,2,3)
+        self.batch_endpoint = credentials.get("batch_endpoint")
+        # push (engine ingestion server), webhook, metaapi
+        self.bridge_type = credentials.get("bridge_type") or ("webhook" if self.data_endpoint or self.batch_endpoint else "push")
     
     @property
     def broker_name(self) -> str:
@@ -57,7 +71,9 @@ class MT4MT5Adapter(BrokerAdapter):
         For MetaAPI: authenticate with API
         """
         try:
-            if self.bridge_type == "metaapi":
+            if self.bridge_type == "push":
+                return self._connect_push()
+            elif self.bridge_type == "metaapi":
                 return await self._connect_metaapi()
             else:
                 return await self._connect_webhook()
@@ -66,24 +82,33 @@ class MT4MT5Adapter(BrokerAdapter):
             self.connected = False
             raise ConnectionError(f"MT4/MT5 connection failed: {e}")
     
+    def _connect_push(self) -> bool:
+        """Push bridge: the EA posts to the engine, so there is nothing to connect to."""
+        if not self.login:
+            raise ConnectionError("No login configured for MT push bridge")
+        if not self.server:
+            raise ConnectionError("No server configured for MT push bridge")
+        if not ingest_enabled():
+            # EA posts only reach the process running the ingestion server
+            raise ConnectionError("MT push bridge needs this engine's ingestion server (MT_INGEST_PORT, unsharded)")
+        if self.api_key:
+            ingest_store.bind(self.server, self.login, self.api_key)
+        self.connected = True
+        self.account_id = str(self.login)
+        return True
+    
     async def _connect_webhook(self) -> bool:
-        """Connect via custom webhook/EA bridge."""
-        if not self.data_endpoint:
-            raise ConnectionError("No data_endpoint configured for MT webhook bridge")
+        """
+        Connect via custom webhook/EA bridge.
         
-        # Verify endpoint is reachable
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                self.data_endpoint,
-                params={"login": self.login},
-                headers={"X-API-Key": self.api_key} if self.api_key else {}
-            )
-            if response.status_code == 200:
-                self.connected = True
-                self.account_id = str(self.login)
-                return True
-            else:
-                raise ConnectionError(f"Webhook endpoint returned {response.status_code}")
+        No probe request: the fetch itself reports an unreachable
+        endpoint, so each account costs one request per cycle.
+        """
+        if not (self.data_endpoint or self.batch_endpoint):
+            raise ConnectionError("No data_endpoint configured for MT webhook bridge")
+        self.connected = True
+        self.account_id = str(self.login)
+        return True
     
     async def _connect_metaapi(self) -> bool:
         """
@@ -98,11 +123,10 @@ class MT4MT5Adapter(BrokerAdapter):
             raise ConnectionError("MetaAPI requires api_key (MetaAPI token)")
         
         # TODO: Implement MetaAPI connection
-        # async with httpx.AsyncClient() as client:
-        #     response = await client.get(
-        #         f"https://mt-client-api-v1.agiliumtrade.agiliumtrade.ai/users/current/accounts/{self.login}",
-        #         headers={"auth-token": self.api_key}
-        #     )
+        # response = await http_request(
+        #     "GET", f"https://mt-client-api-v1.agiliumtrade.agiliumtrade.ai/users/current/accounts/{self.login}",
+        #     headers={"auth-token": self.api_key}
+        # )
         
         self.connected = True
         self.account_id = str(self.login)
@@ -118,7 +142,9 @@ class MT4MT5Adapter(BrokerAdapter):
             )
         
         try:
-            if self.bridge_type == "metaapi":
+            if self.bridge_type == "push":
+                return self._fetch_push()
+            elif self.bridge_type == "metaapi":
                 return await self._fetch_metaapi()
             else:
                 return await self._fetch_webhook()
@@ -130,13 +156,49 @@ class MT4MT5Adapter(BrokerAdapter):
                 error=str(e)
             )
     
+    def _fetch_push(self) -> AccountState:
+        """Read the latest EA post from the in-process ingestion store (no network I/O)."""
+        entry = ingest_store.get(self.server, self.login)
+        error = None
+        if entry is None:
+            error = "No EA update received yet"
+        elif self.api_key and not hmac.compare_digest(entry["key_digest"], key_digest(self.api_key)):
+            error = "EA update was posted with a different API key"
+        elif time.time() - entry["received_at"] > config.MT_INGEST_STALE_AFTER:
+            error = f"No EA update for {time.time() - entry['received_at']:.0f}s"
+        if error:
+            return AccountState(
+                balance=0, equity=0, currency="USD",
+                unrealized_pnl=0, daily_pnl=0, last_trade_at=None,
+                error=error
+            )
+        
+        data = entry["data"]
+        return AccountState(
+            balance=data["balance"],
+            equity=data["equity"],
+            currency=data["currency"],
+            unrealized_pnl=data["equity"] - data["balance"],
+            daily_pnl=data["daily_pnl"],
+            last_trade_at=datetime.fromtimestamp(entry["received_at"], timezone.utc),
+            account_id=str(self.login),
+            open_lots=data.get("open_lots")
+        )
+    
     async def _fetch_webhook(self) -> AccountState:
-        """Fetch from custom webhook endpoint."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                self.data_endpoint,
-                params={"login": self.login},
-                headers={"X-API-Key": self.api_key} if self.api_key else {}
+        """Fetch from custom webhook endpoint on the shared HTTP client."""
+        headers = {"X-API-Key": self.api_key} if self.api_key else {}
+        if self.batch_endpoint:
+            data = await batch_fetcher.fetch(self.batch_endpoint, str(self.login), headers)
+            if data is None:
+                return AccountState(
+                    balance=0, equity=0, currency="USD",
+                    unrealized_pnl=0, daily_pnl=0, last_trade_at=None,
+                    error=f"Bridge returned no data for login {self.login}"
+                )
+        else:
+            response = await http_request(
+                "GET", self.data_endpoint, params={"login": self.login}, headers=headers
             )
             
             if response.status_code != 200:
@@ -147,19 +209,20 @@ class MT4MT5Adapter(BrokerAdapter):
                 )
             
             data = response.json()
-            
-            balance = float(data.get("balance", 0))
-            equity = float(data.get("equity", balance))
-            
-            return AccountState(
-                balance=balance,
-                equity=equity,
-                currency=data.get("currency", "USD"),
-                unrealized_pnl=equity - balance,
-                daily_pnl=float(data.get("daily_pnl", 0)),
-                last_trade_at=datetime.now(timezone.utc),
-                account_id=str(self.login)
-            )
+        
+        balance = float(data.get("balance", 0))
+        equity = float(data.get("equity", balance))
+        
+        return AccountState(
+            balance=balance,
+            equity=equity,
+            currency=data.get("currency", "USD"),
+            unrealized_pnl=equity - balance,
+            daily_pnl=float(data.get("daily_pnl", 0)),
+            last_trade_at=datetime.now(timezone.utc),
+            account_id=str(self.login),
+            open_lots=float(data["open_lots"]) if data.get("open_lots") is not None else None
+        )
     
     async def _fetch_metaapi(self) -> AccountState:
         """Fetch from MetaAPI service."""
@@ -181,6 +244,9 @@ class MT4MT5Adapter(BrokerAdapter):
 EA_TEMPLATE = """
 // MT4/MT5 EA to post account data to webhook
 // Place in Experts folder and attach to any chart
+// WebhookURL: the engine's ingestion server (MT_INGEST_PORT), path /mt-webhook
+// APIKey: the account's api_key, or a MT_INGEST_API_KEYS key that lists this login
+// Add the URL under Tools > Options > Expert Advisors > Allow WebRequest
 
 input string WebhookURL = "https://your-server.com/mt-webhook";
 input string APIKey = "your-api-key";
@@ -191,13 +257,25 @@ int OnInit() {
     return INIT_SUCCEEDED;
 }
 
+double OpenLots() {
+    double lots = 0;
+    for (int i = OrdersTotal() - 1; i >= 0; i--) {
+        if (OrderSelect(i, SELECT_BY_POS, MODE_TRADES) && OrderType() <= OP_SELL)
+            lots += OrderLots();
+    }
+    return lots;
+}
+
 void OnTimer() {
     string data = StringFormat(
-        "{\\"login\\": %d, \\"balance\\": %.2f, \\"equity\\": %.2f, \\"currency\\": \\"%s\\"}",
+        "{\\"server\\": \\"%s\\", \\"login\\": %d, \\"timestamp\\": %d, \\"balance\\": %.2f, \\"equity\\": %.2f, \\"currency\\": \\"%s\\", \\"open_lots\\": %.2f}",
+        AccountServer(),
         AccountNumber(),
+        (int)TimeGMT(),
         AccountBalance(),
         AccountEquity(),
-        AccountCurrency()
+        AccountCurrency(),
+        OpenLots()
     );
     
     char post[];
@@ -1,11 +1,11 @@
 from datetime import datetime, timezone
-from typing import Optional
-import aiohttp
+import httpx
 
-from .base import BaseAdapter, AccountState
+from .base import BrokerAdapter, AccountState
+from src.http_client import request as http_request
 
 
-class MT5Adapter(BaseAdapter):
+class MT5Adapter(BrokerAdapter):
     """
     Adapter for MetaTrader 5 accounts.
     
@@ -24,8 +24,9 @@ class MT5Adapter(BaseAdapter):
     
     broker_type = "mt5"
     
-    def __init__(self):
-        self.session: Optional[aiohttp.ClientSession] = None
+    @property
+    def broker_name(self) -> str:
+        return "MT5"
     
     def validate_credentials(self, credentials: dict) -> tuple[bool, str]:
         """Validate MT5 bridge credentials."""
@@ -35,15 +36,16 @@ class MT5Adapter(BaseAdapter):
             return False, "Missing 'account_id' in broker_credentials"
         return True, ""
     
-    async def connect(self, credentials: dict) -> bool:
-        """Initialize HTTP session for bridge communication."""
-        try:
-            self.session = aiohttp.ClientSession()
-            return True
-        except Exception:
-            return False
+    async def connect(self) -> bool:
+        """Bridge requests go through the engine-wide pooled HTTP client."""
+        valid, error = self.validate_credentials(self.credentials)
+        if not valid:
+            raise ConnectionError(error)
+        self.account_id = str(self.credentials["account_id"])
+        self.connected = True
+        return True
     
-    async def fetch_account_state(self, credentials: dict) -> AccountState:
+    async def fetch_account_state(self) -> AccountState:
         """
         Fetch account state from MT5 bridge.
         
@@ -60,13 +62,11 @@ class MT5Adapter(BaseAdapter):
         }
         """
         try:
+            credentials = self.credentials
             bridge_url = credentials.get("bridge_url")
             account_id = credentials.get("account_id")
             bridge_token = credentials.get("bridge_token", "")
             
-            if self.session is None:
-                self.session = aiohttp.ClientSession()
-            
             headers = {}
             if bridge_token:
                 headers["Authorization"] = f"Bearer {bridge_token}"
@@ -74,36 +74,44 @@ class MT5Adapter(BaseAdapter):
             # Fetch from bridge endpoint
             url = f"{bridge_url.rstrip('/')}/account/{account_id}"
             
-            async with self.session.get(url, headers=headers, timeout=10) as response:
-                if response.status != 200:
-                    return AccountState(
-                        balance=0,
-                        equity=0,
-                        currency="USD",
-                        error=f"Bridge returned status {response.status}"
-                    )
-                
-                data = await response.json()
-                
-                balance = float(data.get("balance", 0))
-                equity = float(data.get("equity", balance))
-                currency = data.get("currency", "USD")
-                unrealized_pnl = float(data.get("profit", 0))
-                
+            response = await http_request("GET", url, headers=headers)
+            
+            if response.status_code != 200:
                 return AccountState(
-                    balance=balance,
-                    equity=equity,
-                    currency=currency,
-                    unrealized_pnl=unrealized_pnl,
-                    account_id=str(account_id),
-                    last_trade_at=datetime.now(timezone.utc)
+                    balance=0,
+                    equity=0,
+                    currency="USD",
+                    unrealized_pnl=0,
+                    daily_pnl=0,
+                    last_trade_at=None,
+                    error=f"Bridge returned status {response.status_code}"
                 )
-                
-        except aiohttp.ClientError as e:
+            
+            data = response.json()
+            
+            balance = float(data.get("balance", 0))
+            equity = float(data.get("equity", balance))
+            currency = data.get("currency", "USD")
+            unrealized_pnl = float(data.get("profit", 0))
+            
+            return AccountState(
+                balance=balance,
+                equity=equity,
+                currency=currency,
+                unrealized_pnl=unrealized_pnl,
+                daily_pnl=0,  # Calculated from DB
+                account_id=str(account_id),
+                last_trade_at=datetime.now(timezone.utc)
+            )
+            
+        except httpx.HTTPError as e:
             return AccountState(
                 balance=0,
                 equity=0,
                 currency="USD",
+                unrealized_pnl=0,
+                daily_pnl=0,
+                last_trade_at=None,
                 error=f"Bridge connection failed: {e}"
             )
         except Exception as e:
@@ -111,11 +119,12 @@ class MT5Adapter(BaseAdapter):
                 balance=0,
                 equity=0,
                 currency="USD",
+                unrealized_pnl=0,
+                daily_pnl=0,
+                last_trade_at=None,
                 error=str(e)
             )
     
     async def disconnect(self) -> None:
-        """Close HTTP session."""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        """Nothing to close; the shared HTTP client stays open for other accounts."""
+        self.connected = False
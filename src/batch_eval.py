@@ -0,0 +1,120 @@
+"""
+Vectorized Challenge Evaluation
+
+Evaluates the whole book in one pass over column arrays instead of
+calling evaluate_challenge once per user dict. Produces exactly the
+same statuses and reason strings as the scalar function, but builds
+reasons only for accounts whose status changed.
+
+evaluate_users selects rules the way referee.evaluate_user does:
+accounts whose tier declares a rule set run its compiled rules, the
+rest share the vectorized static check. The referee uses it to evaluate
+every account moved by one tick (see referee.watch_open_contracts).
+Equivalence is covered by tests/test_batch_eval.py.
+"""
+
+import numpy as np
+
+from src.rules import build_context
+
+TERMINAL_STATUSES = ("breached", "passed")
+
+
+def challenge_columns(users: list, equities) -> dict:
+    """
+    Build the evaluator's column arrays from user records.
+
+    Uses the same float() conversions and defaults as evaluate_challenge,
+    so a missing (None) value raises TypeError just as the scalar path does.
+    """
+    return {
+        "account_size": np.array([float(u.get("account_size", 0)) for u in users], dtype=np.float64),
+        "max_drawdown_limit": np.array([float(u.get("max_drawdown_limit", 0)) for u in users], dtype=np.float64),
+        "profit_target": np.array([float(u.get("profit_target", 0)) for u in users], dtype=np.float64),
+        "equity": np.array([float(equity) for equity in equities], dtype=np.float64),
+        "status": np.array([u.get("challenge_status", "active") for u in users], dtype=object),
+    }
+
+
+def evaluate_challenges(account_size, max_drawdown_limit, profit_target, equity, status):
+    """
+    Evaluate breach/pass for every account at once.
+
+    Args:
+        account_size, max_drawdown_limit, profit_target, equity: float arrays
+        status: object array of current challenge_status values
+
+    Returns:
+        (new_status, changed, reasons) where new_status is an object array,
+        changed is a bool mask of new_status != status, and reasons maps
+        the index of each changed account to its evaluate_challenge reason.
+    """
+    account_size = np.asarray(account_size, dtype=np.float64)
+    max_drawdown_limit = np.asarray(max_drawdown_limit, dtype=np.float64)
+    profit_target = np.asarray(profit_target, dtype=np.float64)
+    equity = np.asarray(equity, dtype=np.float64)
+    status = np.asarray(status, dtype=object)
+
+    breach_threshold = account_size - max_drawdown_limit
+    pass_threshold = account_size + profit_target
+
+    terminal = (status == "breached") | (status == "passed")
+    unset = ~terminal & (account_size == 0)
+    live = ~terminal & ~unset
+    breached = live & (equity < breach_threshold)
+    passed = live & ~breached & (equity >= pass_threshold)
+
+    new_status = np.full(status.shape, "active", dtype=object)
+    new_status[breached] = "breached"
+    new_status[passed] = "passed"
+    new_status[terminal] = status[terminal]
+
+    changed = new_status != status
+
+    reasons = {}
+    for i in np.flatnonzero(changed):
+        reasons[int(i)] = _reason(
+            new_status[i], bool(unset[i]),
+            float(equity[i]), float(breach_threshold[i]), float(pass_threshold[i])
+        )
+    return new_status, changed, reasons
+
+
+def _reason(new_status: str, unset: bool, equity: float, breach_threshold: float, pass_threshold: float) -> str:
+    """Reason string identical to evaluate_challenge's for the same inputs."""
+    if unset:
+        return "No challenge parameters"
+    if new_status == "breached":
+        return f"Equity ${equity:.2f} < Breach Level ${breach_threshold:.2f}"
+    if new_status == "passed":
+        return f"Equity ${equity:.2f} >= Target ${pass_threshold:.2f}"
+    return f"Equity ${equity:.2f} (Breach: ${breach_threshold:.2f}, Target: ${pass_threshold:.2f})"
+
+
+def evaluate_users(users: list, equities, daily_pnls=None, rule_book=None) -> list:
+    """
+    Evaluate user records with the same rule selection as evaluate_user.
+
+    Accounts whose tier has a rule set in rule_book run its compiled
+    rules (with daily_pnls, default 0); the rest go through
+    evaluate_challenges in one pass.
+
+    Returns a list of (new_status, reason) per user. reason is None for
+    statically evaluated accounts whose status did not change.
+    """
+    results = [None] * len(users)
+    static = []
+    for i, user in enumerate(users):
+        rules = rule_book.for_user(user) if rule_book is not None else None
+        if rules is None:
+            static.append(i)
+            continue
+        daily_pnl = daily_pnls[i] if daily_pnls is not None else 0.0
+        results[i] = rules.evaluate(build_context(user, equities[i], daily_pnl), user.get("challenge_status", "active"))
+
+    if static:
+        columns = challenge_columns([users[i] for i in static], [equities[i] for i in static])
+        new_status, _, reasons = evaluate_challenges(**columns)
+        for j, i in enumerate(static):
+            results[i] = (new_status[j], reasons.get(j))
+    return results
@@ -0,0 +1,230 @@
+"""
+Circuit Breakers
+
+Stops spending cycle time and connection slots on accounts (and brokers)
+that keep failing, instead of retrying them every cycle:
+
+- Each account and each broker family has a breaker: closed (checked
+  normally), open (skipped until its backoff expires) or half-open (one
+  probe check allowed; success closes it, failure reopens it with a
+  doubled backoff)
+- Failures are classified: auth (revoked/invalid credentials) opens the
+  account's breaker immediately with a long backoff; network, timeout
+  and rate_limit open it after BREAKER_ACCOUNT_THRESHOLD consecutive
+  failures
+- Network, timeout and rate-limit failures also count toward the
+  broker's breaker, which opens after BREAKER_BROKER_THRESHOLD
+  consecutive failures across its accounts (broker or bridge down)
+
+Backoff is base * 2^(opens - 1), capped at BREAKER_MAX_BACKOFF, with
+jitter so a broker's accounts do not all come back in the same cycle.
+"""
+
+import hashlib
+import random
+import re
+import time
+from typing import Optional, Union
+
+from colorama import Fore, Style
+
+from src import config
+from src.metrics import BREAKER_OPENS, BREAKER_SKIPS
+
+AUTH = "auth"
+RATE_LIMIT = "rate_limit"
+NETWORK = "network"
+TIMEOUT = "timeout"
+OTHER = "other"
+
+# Returned in place of a status for a check an open breaker skipped
+SKIPPED = "skipped"
+
+# Kinds that say something about the broker rather than the account
+BROKER_KINDS = (NETWORK, TIMEOUT, RATE_LIMIT)
+
+# Deriv ResponseError codes and cTrader error codes
+AUTH_CODES = {
+    "InvalidToken", "AuthorizationRequired", "AccountDisabled", "DisabledClient",
+    "CH_ACCESS_TOKEN_INVALID", "CH_CLIENT_AUTH_FAILURE", "CH_CTID_TRADER_ACCOUNT_NOT_FOUND",
+    "ACCESS_TOKEN_INVALID", "OA_AUTH_TOKEN_EXPIRED", "ACCOUNT_NOT_AUTHORIZED",
+}
+RATE_LIMIT_CODES = {"RateLimit", "REQUEST_FREQUENCY_EXCEEDED", "BLOCKED_PAYLOAD_TYPE"}
+
+# Fallbacks for adapter error strings, which carry no code
+AUTH_MARKERS = tuple(code.lower() for code in AUTH_CODES) + (
+    "unauthorized", "forbidden", "invalid api key", "invalid token", "token invalid", "token expired", "oauth",
+)
+RATE_LIMIT_MARKERS = ("rate limit", "too many requests")
+NETWORK_MARKERS = ("connection", "connect", "unreachable", "disconnected")
+# "Bridge returned status 401", "Webhook returned 503"
+HTTP_STATUS = re.compile(r"\breturned (?:status )?(\d{3})\b")
+
+
+def _status_kind(status) -> Optional[str]:
+    if status in (401, 403):
+        return AUTH
+    if status == 429:
+        return RATE_LIMIT
+    if isinstance(status, int) and 500 <= status < 600:
+        return NETWORK
+    return None
+
+
+def _causes(error: BaseException):
+    """The error and what it wraps (adapters re-raise as ConnectionError ... from e)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def classify_failure(error: Union[BaseException, str]) -> str:
+    """auth, rate_limit, network, timeout or other, from an exception or an adapter error string."""
+    message = str(error).lower()
+    if isinstance(error, BaseException):
+        for cause in _causes(error):
+            code = getattr(cause, "code", None)
+            if code in AUTH_CODES:
+                return AUTH
+            if code in RATE_LIMIT_CODES:
+                return RATE_LIMIT
+            kind = _status_kind(getattr(getattr(cause, "response", None), "status_code", None))
+            if kind:
+                return kind
+        if any(isinstance(cause, TimeoutError) for cause in _causes(error)):
+            return TIMEOUT
+
+    match = HTTP_STATUS.search(message)
+    if match and _status_kind(int(match.group(1))):
+        return _status_kind(int(match.group(1)))
+    if any(marker in message for marker in AUTH_MARKERS):
+        return AUTH
+    if any(marker in message for marker in RATE_LIMIT_MARKERS):
+        return RATE_LIMIT
+    if isinstance(error, (ConnectionError, OSError)):
+        return NETWORK
+    if "timeout" in message or "timed out" in message:
+        return TIMEOUT
+    if any(marker in message for marker in NETWORK_MARKERS):
+        return NETWORK
+    return OTHER
+
+
+class CircuitBreaker:
+    """Closed / open / half-open state for one account or broker."""
+
+    def __init__(self, scope: str, threshold: int, fingerprint: str = None):
+        self.scope = scope
+        self.threshold = threshold
+        self.fingerprint = fingerprint
+        self.state = "closed"
+        self.failures = 0
+        self.opens = 0  # consecutive times opened without a success in between
+        self.kind: Optional[str] = None
+        self.open_until = 0.0
+        self.probe_started: Optional[float] = None
+
+    def available(self, now: float) -> bool:
+        if self.state == "closed":
+            return True
+        if now < self.open_until:
+            return False
+        # Half-open: one probe at a time; a probe that never reported back is given up on
+        return self.probe_started is None or now - self.probe_started > config.REFEREE_TRADER_TIMEOUT * 2
+
+    def acquire(self, now: float) -> None:
+        if self.state != "closed":
+            self.state = "half_open"
+            self.probe_started = now
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = self.opens = 0
+        self.kind = None
+        self.probe_started = None
+
+    def record_failure(self, kind: str, now: float, threshold: int = None) -> bool:
+        """Count a failure; returns True if this opened the breaker."""
+        self.failures += 1
+        self.kind = kind
+        self.probe_started = None
+        if self.state == "half_open" or self.failures >= (threshold or self.threshold):
+            self._open(now)
+            return True
+        return False
+
+    def _open(self, now: float) -> None:
+        self.opens += 1
+        self.failures = 0
+        base = config.BREAKER_AUTH_BACKOFF if self.kind == AUTH else config.BREAKER_BASE_BACKOFF
+        backoff = min(config.BREAKER_MAX_BACKOFF, base * 2 ** (self.opens - 1))
+        self.state = "open"
+        self.open_until = now + backoff * random.uniform(1.0, 1.0 + config.BREAKER_JITTER)
+        BREAKER_OPENS.labels(self.scope, self.kind).inc()
+
+    def describe(self, now: float) -> str:
+        if now < self.open_until:
+            return f"{self.kind} failures, retry in {self.open_until - now:.0f}s"
+        return f"{self.kind} failures, probe in flight"
+
+
+class CircuitBreakers:
+    """Per-account and per-broker breakers."""
+
+    def __init__(self):
+        self.accounts: dict[str, CircuitBreaker] = {}
+        self.brokers: dict[str, CircuitBreaker] = {}
+
+    def _account(self, account: str, credentials=None) -> CircuitBreaker:
+        # New credentials (e.g. a re-issued token) start with a closed breaker
+        fingerprint = hashlib.sha1(repr(credentials).encode("utf-8")).hexdigest() if credentials is not None else None
+        breaker = self.accounts.get(account)
+        if breaker is None or (fingerprint is not None and breaker.fingerprint not in (None, fingerprint)):
+            breaker = self.accounts[account] = CircuitBreaker("account", config.BREAKER_ACCOUNT_THRESHOLD, fingerprint)
+        elif fingerprint is not None:
+            breaker.fingerprint = fingerprint
+        return breaker
+
+    def _broker(self, broker: str) -> CircuitBreaker:
+        breaker = self.brokers.get(broker)
+        if breaker is None:
+            breaker = self.brokers[broker] = CircuitBreaker("broker", config.BREAKER_BROKER_THRESHOLD)
+        return breaker
+
+    def allow(self, account: str, broker: str, credentials=None) -> Optional[str]:
+        """None if the account may be checked now, else why it is skipped."""
+        now = time.monotonic()
+        account_breaker, broker_breaker = self._account(account, credentials), self._broker(broker)
+        if not account_breaker.available(now):
+            BREAKER_SKIPS.labels("account").inc()
+            return f"account breaker open ({account_breaker.describe(now)})"
+        if not broker_breaker.available(now):
+            BREAKER_SKIPS.labels("broker").inc()
+            return f"{broker} breaker open ({broker_breaker.describe(now)})"
+        account_breaker.acquire(now)
+        broker_breaker.acquire(now)
+        return None
+
+    def record_success(self, account: str, broker: str) -> None:
+        self._account(account).record_success()
+        self._broker(broker).record_success()
+
+    def record_failure(self, account: str, broker: str, error: Union[BaseException, str]) -> str:
+        """Classify a failed check and count it; returns the failure kind."""
+        now = time.monotonic()
+        kind = classify_failure(error)
+        # Dead credentials will not recover by retrying next cycle
+        self._account(account).record_failure(kind, now, threshold=1 if kind == AUTH else None)
+        broker_breaker = self._broker(broker)
+        if kind in BROKER_KINDS:
+            if broker_breaker.record_failure(kind, now):
+                print(f"{Fore.RED}{Style.BRIGHT}⚠ {broker} breaker opened after repeated {kind} failures{Style.RESET_ALL}")
+        elif broker_breaker.state == "half_open":
+            # The probe reached the broker; the account was the problem
+            broker_breaker.record_success()
+        return kind
+
+
+breakers = CircuitBreakers()
@@ -9,19 +9,178 @@ DERIV_API_TOKEN = os.getenv("DERIV_API_TOKEN")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-if not DERIV_APP_ID:
-    raise ValueError("Missing DERIV_APP_ID in .env. Set DERIV_APP_ID to your Deriv app id.")
-
 try:
     DERIV_APP_ID = int(DERIV_APP_ID)
 except (TypeError, ValueError):
-    raise ValueError("DERIV_APP_ID must be set to an integer in .env.")
+    pass  # reported by validate_deriv()
+
+
+# Required settings are checked when first needed (or by validate() at
+# engine startup), so importing config stays cheap for CLI tools.
+def validate_deriv() -> None:
+    if not DERIV_APP_ID:
+        raise ValueError("Missing DERIV_APP_ID in .env. Set DERIV_APP_ID to your Deriv app id.")
+
+    if not isinstance(DERIV_APP_ID, int):
+        raise ValueError("DERIV_APP_ID must be set to an integer in .env.")
+
+    if not DERIV_API_TOKEN or DERIV_API_TOKEN == "REPLACE_ME":
+        raise ValueError("Missing DERIV_API_TOKEN in .env. Set DERIV_API_TOKEN to a valid Deriv API token.")
+
+
+def validate_supabase() -> None:
+    if not SUPABASE_URL:
+        raise ValueError("Missing SUPABASE_URL in .env. Set SUPABASE_URL to your Supabase project URL.")
+
+    if not SUPABASE_SERVICE_KEY:
+        raise ValueError("Missing SUPABASE_SERVICE_KEY in .env. Set SUPABASE_SERVICE_KEY to your Supabase service role key.")
+
+
+def validate_ingest() -> None:
+    if MT_INGEST_PORT and ENGINE_SHARDING:
+        raise ValueError(
+            "MT_INGEST_PORT cannot be combined with ENGINE_SHARDING: EA posts are only held by the process that "
+            "receives them. Run MT push accounts on a single unsharded engine node, or use bridge_type 'webhook'."
+        )
+
+
+def validate() -> None:
+    """Fail fast on missing engine settings."""
+    validate_deriv()
+    validate_supabase()
+    validate_ingest()
+
+
+# Referee concurrency: max traders evaluated in flight, and per-trader timeout (seconds)
+REFEREE_MAX_CONCURRENCY = int(os.getenv("REFEREE_MAX_CONCURRENCY", "20"))
+REFEREE_TRADER_TIMEOUT = float(os.getenv("REFEREE_TRADER_TIMEOUT", "20"))
+
+# Per broker-family worker pool sizes, e.g. "deriv=20,mt=10,ctrader=5"
+# Families not listed use REFEREE_MAX_CONCURRENCY.
+BROKER_CONCURRENCY = {
+    family.strip(): int(limit)
+    for family, limit in (
+        item.split("=", 1) for item in os.getenv("BROKER_CONCURRENCY", "deriv=20,mt=10,ctrader=5").split(",") if "=" in item
+    )
+}
+
+# Poll mode: seconds between one broker family's cycles, e.g. "deriv=30,mt=60";
+# families not listed use REFEREE_POLL_INTERVAL. Each family runs its own loop.
+REFEREE_POLL_INTERVAL = float(os.getenv("REFEREE_POLL_INTERVAL", "30"))
+BROKER_POLL_INTERVAL = {
+    family.strip(): float(interval)
+    for family, interval in (
+        item.split("=", 1) for item in os.getenv("BROKER_POLL_INTERVAL", "").split(",") if "=" in item
+    )
+}
+BROKER_ROSTER_INTERVAL = float(os.getenv("BROKER_ROSTER_INTERVAL", "30"))  # roster sync / new family discovery
+
+# Deriv WebSocket endpoint; "ws://host:port" targets a local server (e.g. benchmarks/fakes.py)
+DERIV_ENDPOINT = os.getenv("DERIV_ENDPOINT", "ws.derivws.com")
+
+# Deriv session pool: keepalive interval, idle eviction and reconnect backoff (seconds)
+DERIV_SESSION_PING_INTERVAL = float(os.getenv("DERIV_SESSION_PING_INTERVAL", "30"))
+DERIV_SESSION_PING_TIMEOUT = float(os.getenv("DERIV_SESSION_PING_TIMEOUT", "10"))
+DERIV_SESSION_PING_CONCURRENCY = int(os.getenv("DERIV_SESSION_PING_CONCURRENCY", "50"))
+DERIV_SESSION_IDLE_TTL = float(os.getenv("DERIV_SESSION_IDLE_TTL", "600"))
+DERIV_SESSION_MAX_BACKOFF = float(os.getenv("DERIV_SESSION_MAX_BACKOFF", "300"))
+
+# Tick-driven revaluation of open Deriv contracts (see src/valuation.py); seconds
+VALUATION_ENABLED = os.getenv("VALUATION_ENABLED", "true").lower() in ("1", "true", "yes")
+VALUATION_REANCHOR_INTERVAL = float(os.getenv("VALUATION_REANCHOR_INTERVAL", "300"))  # re-read proposal_open_contract
+VALUATION_IDLE_TTL = float(os.getenv("VALUATION_IDLE_TTL", "600"))  # drop accounts not synced for this long
+
+# Circuit breakers for failing accounts and brokers (see src/breakers.py); backoffs in seconds
+BREAKER_ACCOUNT_THRESHOLD = int(os.getenv("BREAKER_ACCOUNT_THRESHOLD", "3"))  # consecutive failures (auth opens at 1)
+BREAKER_BROKER_THRESHOLD = int(os.getenv("BREAKER_BROKER_THRESHOLD", "20"))  # consecutive network/timeout/rate-limit failures
+BREAKER_BASE_BACKOFF = float(os.getenv("BREAKER_BASE_BACKOFF", "30"))
+BREAKER_AUTH_BACKOFF = float(os.getenv("BREAKER_AUTH_BACKOFF", "600"))
+BREAKER_MAX_BACKOFF = float(os.getenv("BREAKER_MAX_BACKOFF", "3600"))
+BREAKER_JITTER = float(os.getenv("BREAKER_JITTER", "0.2"))  # fraction added to each backoff
+
+# cTrader Open API: one shared connection per application (client id/secret)
+CTRADER_CLIENT_ID = os.getenv("CTRADER_CLIENT_ID")
+CTRADER_CLIENT_SECRET = os.getenv("CTRADER_CLIENT_SECRET")
+CTRADER_HOST = os.getenv("CTRADER_HOST", "live")  # "live", "demo" or a ws(s):// URL
+CTRADER_MAX_REQUESTS_PER_SECOND = float(os.getenv("CTRADER_MAX_REQUESTS_PER_SECOND", "45"))  # Open API allows 50
+CTRADER_REQUEST_TIMEOUT = float(os.getenv("CTRADER_REQUEST_TIMEOUT", "15"))
+CTRADER_HEARTBEAT_INTERVAL = float(os.getenv("CTRADER_HEARTBEAT_INTERVAL", "10"))
+CTRADER_MAX_BACKOFF = float(os.getenv("CTRADER_MAX_BACKOFF", "300"))
+
+# Referee mode: "poll" (periodic sweep), "stream" (balance/contract subscriptions)
+# or "schedule" (risk-proximity priority queue)
+REFEREE_MODE = os.getenv("REFEREE_MODE", "poll").lower()
+STREAM_PERSIST_INTERVAL = float(os.getenv("STREAM_PERSIST_INTERVAL", "30"))
+STREAM_ROSTER_INTERVAL = float(os.getenv("STREAM_ROSTER_INTERVAL", "60"))
+STREAM_DAILY_PNL_INTERVAL = float(os.getenv("STREAM_DAILY_PNL_INTERVAL", "30"))
+
+# Max rows per bulk upsert request to Supabase
+SUPABASE_WRITE_BATCH_SIZE = int(os.getenv("SUPABASE_WRITE_BATCH_SIZE", "500"))
+
+# Threads running Supabase calls for the async engine (see src/db.py); they share
+# the client's keep-alive pool, so keep this under its 20 keep-alive connections
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", "8"))
+
+# Rewrite unchanged trading_states rows at most this often (seconds) to refresh updated_at
+STATE_HEARTBEAT_INTERVAL = float(os.getenv("STATE_HEARTBEAT_INTERVAL", "300"))
+
+# Risk-proximity scheduler (REFEREE_MODE=schedule); intervals in seconds
+SCHEDULE_MIN_INTERVAL = float(os.getenv("SCHEDULE_MIN_INTERVAL", "2"))
+SCHEDULE_MAX_INTERVAL = float(os.getenv("SCHEDULE_MAX_INTERVAL", "60"))
+SCHEDULE_IDLE_INTERVAL = float(os.getenv("SCHEDULE_IDLE_INTERVAL", "300"))
+SCHEDULE_RISK_BAND = float(os.getenv("SCHEDULE_RISK_BAND", "0.05"))  # fraction of account size
+SCHEDULE_JITTER = float(os.getenv("SCHEDULE_JITTER", "0.1"))
+SCHEDULE_VOLATILITY_SAMPLES = int(os.getenv("SCHEDULE_VOLATILITY_SAMPLES", "5"))
+SCHEDULE_FLUSH_INTERVAL = float(os.getenv("SCHEDULE_FLUSH_INTERVAL", "5"))
+SCHEDULE_ROSTER_INTERVAL = float(os.getenv("SCHEDULE_ROSTER_INTERVAL", "60"))
+
+# Reload compiled challenge_rules this often (seconds)
+RULES_REFRESH_INTERVAL = float(os.getenv("RULES_REFRESH_INTERVAL", "300"))
+# Reload trading-day counts for min_trading_days rules this often (seconds)
+TRADING_DAYS_REFRESH_INTERVAL = float(os.getenv("TRADING_DAYS_REFRESH_INTERVAL", "300"))
+
+# Full user_accounts reload interval (seconds); other roster syncs are updated_at deltas
+ROSTER_FULL_SYNC_INTERVAL = float(os.getenv("ROSTER_FULL_SYNC_INTERVAL", "3600"))
+
+# Horizontal sharding across engine processes (see src/sharding.py)
+ENGINE_SHARDING = os.getenv("ENGINE_SHARDING", "false").lower() in ("1", "true", "yes")
+ENGINE_SHARD_COUNT = int(os.getenv("ENGINE_SHARD_COUNT", "64"))
+ENGINE_LEASE_TTL = float(os.getenv("ENGINE_LEASE_TTL", "30"))
+ENGINE_HEARTBEAT_INTERVAL = float(os.getenv("ENGINE_HEARTBEAT_INTERVAL", "10"))
+
+# Prometheus /metrics port for the engine (0 disables; see src/metrics.py)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Local equity history (see src/equity_store.py); empty EQUITY_STORE_DIR disables it
+EQUITY_STORE_DIR = os.getenv("EQUITY_STORE_DIR", "data/equity")
+EQUITY_STORE_CAPACITY = int(os.getenv("EQUITY_STORE_CAPACITY", "8640"))  # samples kept per account
+EQUITY_STORE_MAX_OPEN = int(os.getenv("EQUITY_STORE_MAX_OPEN", "1024"))  # files mapped at once
 
-if not DERIV_API_TOKEN or DERIV_API_TOKEN == "REPLACE_ME":
-    raise ValueError("Missing DERIV_API_TOKEN in .env. Set DERIV_API_TOKEN to a valid Deriv API token.")
+# monitor.py dashboard cache: serve cached data for MONITOR_CACHE_TTL seconds, then
+# keep serving it while refreshing in the background for up to MONITOR_CACHE_MAX_STALE more
+MONITOR_CACHE_TTL = float(os.getenv("MONITOR_CACHE_TTL", "15"))
+MONITOR_CACHE_MAX_STALE = float(os.getenv("MONITOR_CACHE_MAX_STALE", "300"))
+MONITOR_DELTA_HISTORY = int(os.getenv("MONITOR_DELTA_HISTORY", "100"))  # row deltas kept for reconnecting viewers
+MONITOR_SSE_KEEPALIVE = float(os.getenv("MONITOR_SSE_KEEPALIVE", "15"))
 
-if not SUPABASE_URL:
-    raise ValueError("Missing SUPABASE_URL in .env. Set SUPABASE_URL to your Supabase project URL.")
+# MT4/MT5 EA push ingestion (see src/mt_ingest.py); 0 disables. Single node only:
+# the latest posts live in this process, so it cannot be used with ENGINE_SHARDING
+MT_INGEST_PORT = int(os.getenv("MT_INGEST_PORT", "0"))
+MT_INGEST_HOST = os.getenv("MT_INGEST_HOST", "0.0.0.0")
+# Shared EA keys, each bound to the logins it may post for: "key1:123|456,key2:789"
+MT_INGEST_API_KEYS = {
+    key.strip(): tuple(login.strip() for login in logins.split("|") if login.strip())
+    for key, logins in (
+        item.split(":", 1) for item in os.getenv("MT_INGEST_API_KEYS", "").split(",") if ":" in item
+    )
+}
+MT_INGEST_STALE_AFTER = float(os.getenv("MT_INGEST_STALE_AFTER", "120"))  # seconds without an EA post
 
-if not SUPABASE_SERVICE_KEY:
-    raise ValueError("Missing SUPABASE_SERVICE_KEY in .env. Set SUPABASE_SERVICE_KEY to your Supabase service role key.")
+# Shared HTTP client for bridge adapters (see src/http_client.py)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_BATCH_WINDOW = float(os.getenv("HTTP_BATCH_WINDOW", "0.01"))  # seconds to gather logins into one batch request
+HTTP_BATCH_MAX_SIZE = int(os.getenv("HTTP_BATCH_MAX_SIZE", "200"))
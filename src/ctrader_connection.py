@@ -0,0 +1,348 @@
+"""
+cTrader Open API Connection
+
+One multiplexed Open API connection per application credential, shared
+by every cTrader account the engine evaluates, instead of an app + account
+handshake per adapter instance:
+
+- The connection is authorized once (ProtoOAApplicationAuthReq); each
+  account is then added with its own ProtoOAAccountAuthReq
+- Per account, balance (ProtoOATraderReq) and open positions
+  (ProtoOAReconcileReq) are loaded once and shared by every caller; they
+  are reloaded only after an execution event or trader update
+- Spot subscriptions for the symbols an account holds mark its
+  unrealized P&L dirty, so ProtoOAGetPositionUnrealizedPnLReq is only
+  sent when prices actually moved
+- Heartbeats keep the connection open; if it drops, the next use
+  reconnects with backoff and re-authorizes accounts lazily
+
+Uses the Open API JSON protocol over WebSocket (port 5036), which carries
+the same ProtoOA messages as the protobuf TCP transport.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from typing import Optional
+
+import websockets
+from colorama import Fore, Style
+
+from src import config
+
+# ProtoOAPayloadType / ProtoPayloadType values
+ERROR_RES = 50
+HEARTBEAT_EVENT = 51
+APPLICATION_AUTH_REQ = 2100
+ACCOUNT_AUTH_REQ = 2102
+TRADER_REQ = 2121
+TRADER_UPDATE_EVENT = 2123
+RECONCILE_REQ = 2124
+EXECUTION_EVENT = 2126
+SUBSCRIBE_SPOTS_REQ = 2127
+UNSUBSCRIBE_SPOTS_REQ = 2129
+SPOT_EVENT = 2131
+OA_ERROR_RES = 2142
+ACCOUNTS_TOKEN_INVALIDATED_EVENT = 2147
+CLIENT_DISCONNECT_EVENT = 2148
+ACCOUNT_DISCONNECT_EVENT = 2164
+GET_POSITION_UNREALIZED_PNL_REQ = 2187
+
+HOSTS = {
+    "live": "wss://live.ctraderapi.com:5036",
+    "demo": "wss://demo.ctraderapi.com:5036",
+}
+
+
+class CTraderError(Exception):
+    """An Open API error response."""
+
+    def __init__(self, payload: dict):
+        self.code = payload.get("errorCode")
+        super().__init__(f"{self.code}: {payload.get('description', 'cTrader error')}")
+
+
+def _money(value, digits: int) -> float:
+    return float(value or 0) / (10 ** digits)
+
+
+class CTraderAccount:
+    """One trading account authorized on a shared connection."""
+
+    def __init__(self, connection: "CTraderConnection", ctid: int, access_token: str):
+        self.connection = connection
+        self.ctid = ctid
+        self.access_token = access_token
+        self.generation = None  # connection generation this account was authorized on
+        self.money_digits = 2
+        self.balance = 0.0
+        self.positions: dict[int, dict] = {}
+        self.symbols: set = set()
+        self.unrealized_pnl = 0.0
+        self.state_stale = True
+        self.pnl_dirty = True
+        self.error: Optional[str] = None
+        self.updated_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh: Optional[asyncio.Task] = None
+
+    @property
+    def open_lots(self) -> Optional[float]:
+        """Open volume in lots, or None if a position does not carry its symbol's lot size."""
+        lots = 0.0
+        for position in self.positions.values():
+            trade = position.get("tradeData", {})
+            if not trade.get("lotSize"):
+                return None
+            lots += float(trade.get("volume", 0)) / float(trade["lotSize"])
+        return lots
+
+    async def ensure(self) -> None:
+        """Authorize on the current connection, re-authorizing after a reconnect."""
+        await self.connection.ensure()
+        if self.generation == self.connection.generation:
+            return
+        async with self._lock:
+            if self.generation == self.connection.generation:
+                return
+            await self.connection.request(ACCOUNT_AUTH_REQ, {
+                "ctidTraderAccountId": self.ctid, "accessToken": self.access_token
+            })
+            self.generation = self.connection.generation
+            self.symbols = set()
+            self.state_stale = self.pnl_dirty = True
+            self.error = None
+
+    async def snapshot(self) -> tuple[float, float]:
+        """Current (balance, unrealized P&L), refreshing only what changed."""
+        # A revoked token stays failed until account() hands over a new one
+        if self.error:
+            raise ConnectionError(self.error)
+        await self.ensure()
+        # Concurrent callers share one refresh
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.ensure_future(self._update())
+        await asyncio.shield(self._refresh)
+        return self.balance, self.unrealized_pnl
+
+    async def _update(self) -> None:
+        if self.state_stale:
+            self.state_stale = False
+            try:
+                trader, reconcile = await asyncio.gather(
+                    self.connection.request(TRADER_REQ, {"ctidTraderAccountId": self.ctid}),
+                    self.connection.request(RECONCILE_REQ, {"ctidTraderAccountId": self.ctid}),
+                )
+            except Exception:
+                self.state_stale = True
+                raise
+            self._apply_trader(trader.get("trader", {}))
+            self.positions = {p["positionId"]: p for p in reconcile.get("position", []) if "positionId" in p}
+            self.pnl_dirty = True
+            await self._sync_spot_subscriptions()
+
+        if not self.positions:
+            self.unrealized_pnl = 0.0
+        elif self.pnl_dirty:
+            self.pnl_dirty = False
+            try:
+                response = await self.connection.request(
+                    GET_POSITION_UNREALIZED_PNL_REQ, {"ctidTraderAccountId": self.ctid}
+                )
+            except Exception:
+                self.pnl_dirty = True
+                raise
+            digits = response.get("moneyDigits", self.money_digits)
+            self.unrealized_pnl = sum(
+                _money(item.get("netUnrealizedPnL"), digits) for item in response.get("positionUnrealizedPnL", [])
+            )
+        self.updated_at = time.time()
+
+    def _apply_trader(self, trader: dict) -> None:
+        self.money_digits = trader.get("moneyDigits", self.money_digits)
+        if "balance" in trader:
+            self.balance = _money(trader["balance"], self.money_digits)
+
+    async def _sync_spot_subscriptions(self) -> None:
+        wanted = {p.get("tradeData", {}).get("symbolId") for p in self.positions.values()} - {None}
+        added, removed = sorted(wanted - self.symbols), sorted(self.symbols - wanted)
+        if removed:
+            await self.connection.request(UNSUBSCRIBE_SPOTS_REQ, {"ctidTraderAccountId": self.ctid, "symbolId": removed})
+        if added:
+            await self.connection.request(SUBSCRIBE_SPOTS_REQ, {"ctidTraderAccountId": self.ctid, "symbolId": added})
+        self.symbols = wanted
+
+    def on_event(self, payload_type: int, payload: dict) -> None:
+        if payload_type == SPOT_EVENT:
+            self.pnl_dirty = True
+        elif payload_type == EXECUTION_EVENT:
+            # Positions opened/closed/changed; a closing deal also moves the balance
+            self.state_stale = True
+        elif payload_type == TRADER_UPDATE_EVENT:
+            self._apply_trader(payload.get("trader", {}))
+            self.pnl_dirty = True
+        elif payload_type == ACCOUNT_DISCONNECT_EVENT:
+            self.generation = None
+        elif payload_type == ACCOUNTS_TOKEN_INVALIDATED_EVENT:
+            self.generation = None
+            self.error = f"cTrader access token invalidated ({payload.get('reason', 'no reason given')})"
+
+
+class CTraderConnection:
+    """A single Open API connection for one application credential."""
+
+    def __init__(self, url: str, client_id: str, client_secret: str):
+        self.url = url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.ws = None
+        self.generation = 0
+        self.accounts: dict[int, CTraderAccount] = {}
+        self.failures = 0
+        self.retry_at = 0.0
+        self._pending: dict[str, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._send_lock = asyncio.Lock()
+        self._last_send = 0.0
+        self._reader: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def _is_open(self) -> bool:
+        return self.ws is not None and self._reader is not None and not self._reader.done()
+
+    async def ensure(self) -> None:
+        """Connect and application-authorize, unless already open."""
+        if self._is_open():
+            return
+        async with self._lock:
+            if self._is_open():
+                return
+            now = time.monotonic()
+            if now < self.retry_at:
+                raise ConnectionError(f"cTrader connection backing off for {self.retry_at - now:.0f}s")
+            await self._close()
+            try:
+                self.ws = await websockets.connect(self.url, max_size=None, ping_interval=None)
+                self.generation += 1
+                self._reader = asyncio.create_task(self._read())
+                await self.request(APPLICATION_AUTH_REQ, {"clientId": self.client_id, "clientSecret": self.client_secret})
+                self._heartbeat = asyncio.create_task(self._heartbeats())
+                self.failures = 0
+                self.retry_at = 0.0
+            except Exception:
+                await self._close()
+                self.failures += 1
+                self.retry_at = time.monotonic() + min(config.CTRADER_MAX_BACKOFF, 2 ** self.failures)
+                raise
+
+    async def _send(self, message: dict) -> None:
+        # Stay under the Open API request rate limit
+        async with self._send_lock:
+            wait = self._last_send + 1.0 / config.CTRADER_MAX_REQUESTS_PER_SECOND - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_send = time.monotonic()
+            await self.ws.send(json.dumps(message))
+
+    async def request(self, payload_type: int, payload: dict) -> dict:
+        """Send a request and wait for the response with the same clientMsgId."""
+        if self.ws is None:
+            raise ConnectionError("cTrader connection is closed")
+        message_id = f"m{next(self._ids)}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._send({"clientMsgId": message_id, "payloadType": payload_type, "payload": payload})
+            return await asyncio.wait_for(future, timeout=config.CTRADER_REQUEST_TIMEOUT)
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def _read(self) -> None:
+        try:
+            async for raw in self.ws:
+                message = json.loads(raw)
+                payload_type = message.get("payloadType")
+                payload = message.get("payload") or {}
+                future = self._pending.get(message.get("clientMsgId"))
+                if future is not None and not future.done():
+                    if payload_type in (ERROR_RES, OA_ERROR_RES):
+                        future.set_exception(CTraderError(payload))
+                    else:
+                        future.set_result(payload)
+                    continue
+                if payload_type == CLIENT_DISCONNECT_EVENT:
+                    print(f"{Fore.YELLOW}[ctrader] ⚠ Server closed the connection: {payload.get('reason', '')}{Style.RESET_ALL}")
+                    break
+                self._dispatch_event(payload_type, payload)
+        except (websockets.ConnectionClosed, OSError) as e:
+            print(f"{Fore.YELLOW}[ctrader] ⚠ Connection lost: {e}{Style.RESET_ALL}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("cTrader connection lost"))
+
+    def _dispatch_event(self, payload_type: int, payload: dict) -> None:
+        if payload_type == ACCOUNTS_TOKEN_INVALIDATED_EVENT:
+            for ctid in payload.get("ctidTraderAccountIds", []):
+                if ctid in self.accounts:
+                    self.accounts[ctid].on_event(payload_type, payload)
+            return
+        account = self.accounts.get(payload.get("ctidTraderAccountId"))
+        if account is not None:
+            account.on_event(payload_type, payload)
+
+    async def _heartbeats(self) -> None:
+        try:
+            while self._is_open():
+                await asyncio.sleep(config.CTRADER_HEARTBEAT_INTERVAL)
+                await self._send({"payloadType": HEARTBEAT_EVENT, "payload": {}})
+        except Exception:
+            pass
+
+    def account(self, ctid: int, access_token: str) -> CTraderAccount:
+        """The shared account handle (created on first use, token kept current)."""
+        account = self.accounts.get(ctid)
+        if account is None:
+            account = self.accounts[ctid] = CTraderAccount(self, ctid, access_token)
+        elif account.access_token != access_token:
+            account.access_token = access_token
+            account.generation = None
+            account.error = None
+        return account
+
+    async def _close(self) -> None:
+        for task in (self._heartbeat, self._reader):
+            if task is not None:
+                task.cancel()
+        self._heartbeat = self._reader = None
+        if self.ws is not None:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+        self.ws = None
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._close()
+
+
+_connections: dict[tuple, CTraderConnection] = {}
+
+
+def get_ctrader_connection(client_id: str, client_secret: str, host: str = "live") -> CTraderConnection:
+    """The shared connection for an application credential on a host (live/demo or a URL)."""
+    url = HOSTS.get(host, host)
+    key = (url, client_id)
+    connection = _connections.get(key)
+    if connection is None:
+        connection = _connections[key] = CTraderConnection(url, client_id, client_secret)
+    return connection
+
+
+async def close_ctrader_connections() -> None:
+    for connection in list(_connections.values()):
+        await connection.close()
+    _connections.clear()
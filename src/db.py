@@ -0,0 +1,80 @@
+"""
+Supabase Client
+
+The engine's shared Supabase client, created on first use rather than at
+import, so modules (and CLI tools) that never query the database do not
+pay for importing supabase or fail on missing settings.
+
+`supabase` is a stand-in that forwards to the real client, so it can be
+handed to long-lived helpers (roster, rule book, write batches) at
+import time.
+
+The client is synchronous. Async code runs its calls through run_db() /
+execute(), which hand them to a bounded thread pool (SUPABASE_MAX_WORKERS)
+so a database round trip never stalls broker WebSocket traffic. All
+workers share the client's keep-alive connection pool.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional
+
+from src import config
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+_client: Optional["Client"] = None
+_client_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_supabase() -> "Client":
+    """The shared client (uses the service-role key for full RLS bypass)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                config.validate_supabase()
+                from supabase import create_client
+                _client = create_client(config.SUPABASE_URL, config.SUPABASE_SERVICE_KEY)
+    return _client
+
+
+class _LazySupabase:
+    def __getattr__(self, name: str):
+        return getattr(get_supabase(), name)
+
+    def __repr__(self) -> str:
+        return f"<lazy Supabase client ({'connected' if _client else 'not created'})>"
+
+
+supabase = _LazySupabase()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.SUPABASE_MAX_WORKERS, thread_name_prefix="supabase")
+    return _executor
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking Supabase call (or a helper making several) on the database pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def execute(query):
+    """Await a PostgREST query builder: `await execute(supabase.table(...).select(...))`."""
+    return await run_db(query.execute)
+
+
+def close_db() -> None:
+    """Wait for in-flight database calls and stop the pool (call on engine shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
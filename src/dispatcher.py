@@ -0,0 +1,269 @@
+"""
+Multi-Broker Referee
+
+Loads every active account, resolves its adapter through the
+src.adapters registry and evaluates it on a worker pool dedicated to
+its broker family. Each family has its own queue, concurrency limit
+(BROKER_CONCURRENCY) and polling loop (BROKER_POLL_INTERVAL), so a slow
+MT4/MT5 bridge or cTrader endpoint cannot hold up Deriv evaluations.
+"""
+
+import asyncio
+import time
+
+from colorama import Fore, Style
+
+from src import config
+from src.adapters import get_adapter
+from src.breakers import AUTH, SKIPPED, breakers
+from src.metrics import CYCLE_DURATION, CYCLE_USERS, FAMILY_CYCLE_DURATION, TRADER_LATENCY, classify_error, count_error
+from src.referee import (
+    auto_initialize_challenge,
+    fetch_active_accounts,
+    fetch_daily_pnl_map,
+    format_summary,
+    get_broker_credentials,
+    get_deriv_token,
+    record_error,
+    record_evaluation,
+    state_tracker,
+    supabase,
+    tally_results,
+    watch_open_contracts,
+)
+from src.sessions import get_session_pool
+from src.writes import WriteBatch
+
+# Broker types that share a worker pool (same adapter / bridge)
+BROKER_FAMILIES = {
+    "mt4": "mt",
+    "mt5": "mt",
+}
+
+
+def broker_family(user: dict) -> str:
+    """Worker-pool family for a user's broker_type."""
+    broker_type = (user.get("broker_type") or "deriv").lower()
+    return BROKER_FAMILIES.get(broker_type, broker_type)
+
+
+async def check_account(user: dict, batch: WriteBatch, daily_pnl_map: dict):
+    """
+    Fetch one account through its broker adapter and evaluate its challenge.
+    Returns the newly computed challenge status, or None on failure.
+    """
+    user_email = user.get("user_email")
+    broker_type = (user.get("broker_type") or "deriv").lower()
+
+    if broker_type == "deriv" and not get_deriv_token(user):
+        print(f"{Fore.RED}[{user_email}] ⚠ No Deriv token found{Style.RESET_ALL}")
+        return None
+
+    try:
+        adapter_class = get_adapter(broker_type)
+    except ValueError as e:
+        print(f"{Fore.RED}[{user_email}] ⚠ {e}{Style.RESET_ALL}")
+        count_error("unsupported_broker")
+        record_error(user_email, batch)
+        return None
+
+    family = broker_family(user)
+    try:
+        async with adapter_class(get_broker_credentials(user)) as adapter:
+            state = await adapter.fetch_account_state()
+    except Exception as e:
+        kind = breakers.record_failure(user_email, family, e)
+        print(f"{Fore.RED}{Style.BRIGHT}[{user_email}] ❌ {broker_type.upper()} FAILED ({kind}): {e}{Style.RESET_ALL}")
+        count_error(classify_error(e))
+        if kind == AUTH and broker_type == "deriv":
+            # Dead credentials: free the pooled connection instead of reconnecting every cycle
+            await get_session_pool().evict(get_deriv_token(user))
+        record_error(user_email, batch)
+        return None
+
+    if not state.is_valid:
+        kind = breakers.record_failure(user_email, family, state.error)
+        print(f"{Fore.RED}{Style.BRIGHT}[{user_email}] ❌ {adapter.broker_name} FAILED ({kind}): {state.error}{Style.RESET_ALL}")
+        count_error("adapter")
+        record_error(user_email, batch)
+        return None
+
+    breakers.record_success(user_email, family)
+
+    if broker_type == "deriv" and state.account_id and state.account_id != user.get("deriv_account_id"):
+        batch.update("user_accounts", {"user_email": user_email, "deriv_account_id": state.account_id})
+        user["deriv_account_id"] = state.account_id
+
+    await auto_initialize_challenge(user, state.balance)
+    user["last_equity"] = state.equity
+
+    # profit_table is authoritative where present; bridges may report their own daily P&L
+    daily_pnl = daily_pnl_map.get(user_email, state.daily_pnl)
+    user["last_balance"] = state.balance
+    user["daily_pnl"] = daily_pnl
+    user["open_lots"] = state.open_lots
+
+    print(f"{Fore.CYAN}[{user_email}] {adapter.broker_name} Balance: ${state.balance:.2f} | Unrealized: ${state.unrealized_pnl:.2f} | Equity: ${state.equity:.2f} | Daily P&L: ${daily_pnl:.2f}{Style.RESET_ALL}")
+
+    if broker_type != "deriv":
+        return record_evaluation(user, state.balance, state.equity, daily_pnl, state.currency, batch)
+
+    # Keyed as DerivAdapter values the account's contracts; modelled breaches/passes are confirmed first
+    token = get_deriv_token(user)
+    new_status = record_evaluation(
+        user, state.balance, state.equity, daily_pnl, state.currency, batch, state.account_id or token, token
+    )
+    if state.account_id:
+        watch_open_contracts(state.account_id, user, token)
+    return new_status
+
+
+def _breaker_skip(user: dict, family: str) -> bool:
+    """Whether an open breaker skips this account; logs the reason."""
+    user_email = user.get("user_email")
+    skip_reason = breakers.allow(user_email, family, get_broker_credentials(user))
+    if skip_reason:
+        print(f"{Fore.MAGENTA}[{user_email}] ⏸ Skipped: {skip_reason}{Style.RESET_ALL}")
+    return bool(skip_reason)
+
+
+async def _check_with_timeout(user: dict, family: str, timeout: float, batch: WriteBatch, daily_pnl_map: dict):
+    """check_account cancelled after timeout seconds; a timeout counts as a failure."""
+    user_email = user.get("user_email")
+    try:
+        with TRADER_LATENCY.labels(family).time():
+            return await asyncio.wait_for(check_account(user, batch, daily_pnl_map), timeout=timeout)
+    except asyncio.TimeoutError as e:
+        print(f"{Fore.RED}{Style.BRIGHT}[{user_email}] ❌ TIMEOUT after {timeout:.0f}s{Style.RESET_ALL}")
+        count_error("timeout")
+        breakers.record_failure(user_email, family, e)
+        record_error(user_email, batch)
+        return None
+
+
+async def check_account_bounded(user: dict, semaphore: asyncio.Semaphore, timeout: float, batch: WriteBatch, daily_pnl_map: dict):
+    """
+    Run check_account under a concurrency limit and per-account timeout.
+    Accounts (or a broker family) whose circuit breaker is open are skipped
+    without taking a slot and return SKIPPED.
+    """
+    family = broker_family(user)
+    if _breaker_skip(user, family):
+        return SKIPPED
+    async with semaphore:
+        return await _check_with_timeout(user, family, timeout, batch, daily_pnl_map)
+
+
+async def _family_worker(family: str, queue: asyncio.Queue, results: dict, batch: WriteBatch, daily_pnl_map: dict, timeout: float):
+    """Drain one broker family's queue."""
+    while True:
+        try:
+            user = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        user_email = user.get("user_email")
+        # Open breakers skip the account without spending a worker on it
+        if _breaker_skip(user, family):
+            results[user_email] = SKIPPED
+            continue
+        results[user_email] = await _check_with_timeout(user, family, timeout, batch, daily_pnl_map)
+
+
+async def check_family(family: str, members: list, daily_pnl_map: dict, timeout: float) -> dict:
+    """
+    Evaluate one broker family's accounts on its own worker pool and flush
+    its writes. Returns {user_email: status, None (failed) or SKIPPED}.
+    """
+    started = time.monotonic()
+    queue = asyncio.Queue()
+    for user in members:
+        queue.put_nowait(user)
+    results: dict = {}
+    batch = WriteBatch(supabase, tracker=state_tracker)
+    limit = config.BROKER_CONCURRENCY.get(family, config.REFEREE_MAX_CONCURRENCY)
+    await asyncio.gather(*(
+        _family_worker(family, queue, results, batch, daily_pnl_map, timeout)
+        for _ in range(max(1, min(limit, len(members))))
+    ))
+
+    write_stats = await batch.flush_async()
+    statuses = list(results.values())
+    tally = tally_results(statuses, family)
+    print(f"{Fore.CYAN}[{family.upper()}] ✔ Flushed {write_stats['written']} row(s) to Supabase ({write_stats['skipped']} unchanged, {write_stats['failed']} failed){Style.RESET_ALL}")
+    print(f"{Fore.GREEN}{Style.BRIGHT}[{family.upper()}] {format_summary(tally, len(statuses))}{Style.RESET_ALL}")
+    FAMILY_CYCLE_DURATION.labels(family).observe(time.monotonic() - started)
+    return results
+
+
+def group_by_family(users: list) -> dict[str, list]:
+    families: dict[str, list] = {}
+    for user in users:
+        families.setdefault(broker_family(user), []).append(user)
+    return families
+
+
+async def check_all_accounts(timeout: float = None):
+    """
+    One pass over every active account, each broker family on its own
+    worker pool. The pass ends when the slowest family finishes; the
+    engine's poll loop uses run_family_loops instead.
+    """
+    timeout = timeout or config.REFEREE_TRADER_TIMEOUT
+    cycle_started = time.monotonic()
+    users = await fetch_active_accounts()
+    CYCLE_USERS.set(len(users))
+
+    if not users:
+        print(f"{Fore.YELLOW}⚠ No active accounts found (is_active=true){Style.RESET_ALL}")
+        return
+
+    families = group_by_family(users)
+    overview = ", ".join(f"{family}: {len(members)}" for family, members in families.items())
+    print(f"{Fore.BLUE}Found {len(users)} active account(s) to evaluate ({overview}){Style.RESET_ALL}\n")
+
+    daily_pnl_map = await fetch_daily_pnl_map([user.get("user_email") for user in users])
+    await asyncio.gather(*(
+        check_family(family, members, daily_pnl_map, timeout) for family, members in families.items()
+    ))
+    CYCLE_DURATION.observe(time.monotonic() - cycle_started)
+
+
+async def _run_family(family: str, timeout: float) -> None:
+    """Poll one family every BROKER_POLL_INTERVAL until it has no active accounts left."""
+    interval = config.BROKER_POLL_INTERVAL.get(family, config.REFEREE_POLL_INTERVAL)
+    while True:
+        # The roster itself is synced by run_family_loops
+        members = group_by_family(await fetch_active_accounts(sync=False)).get(family)
+        if not members:
+            return
+        try:
+            daily_pnl_map = await fetch_daily_pnl_map([user.get("user_email") for user in members])
+            await check_family(family, members, daily_pnl_map, timeout)
+        except Exception as e:
+            count_error(classify_error(e))
+            print(f"{Fore.RED}[{family.upper()}] ⚠ Cycle failed: {e}{Style.RESET_ALL}")
+        await asyncio.sleep(interval)
+
+
+async def run_family_loops(timeout: float = None) -> None:
+    """
+    Poll every broker family on its own loop and cadence, so a slow MT or
+    cTrader bridge never delays the next Deriv cycle. The roster is synced
+    every BROKER_ROSTER_INTERVAL; families that appear get a loop started.
+    """
+    timeout = timeout or config.REFEREE_TRADER_TIMEOUT
+    loops: dict[str, asyncio.Task] = {}
+    try:
+        while True:
+            users = await fetch_active_accounts()
+            CYCLE_USERS.set(len(users))
+            for family, members in group_by_family(users).items():
+                task = loops.get(family)
+                if task is None or task.done():
+                    print(f"{Fore.BLUE}>>> Polling {len(members)} {family} account(s){Style.RESET_ALL}")
+                    loops[family] = asyncio.create_task(_run_family(family, timeout))
+            await asyncio.sleep(config.BROKER_ROSTER_INTERVAL)
+    finally:
+        for task in loops.values():
+            task.cancel()
+        await asyncio.gather(*loops.values(), return_exceptions=True)
@@ -0,0 +1,223 @@
+"""
+Equity Time-Series Store
+
+Local, append-only equity history per account challenge, so drawdown
+rules can be evaluated without querying Supabase:
+
+- One file per series key (the referee uses the user plus the challenge's
+  evaluation_started_at, see referee.equity_key), so a new challenge
+  starts from a fresh high-water mark; reset() drops a series outright
+- Each file is a fixed header plus a ring buffer of
+  (timestamp, equity) float64 pairs, memory-mapped
+- The header carries running aggregates updated in O(1) per sample:
+  high-water mark, day-open and intraday-high equity, and the maximum
+  drawdown since the first sample
+- Files persist across restarts; the ring keeps the most recent
+  `capacity` samples for windowed queries (max_drawdown(since=...))
+- The files are node-local, so the referee also writes the header
+  aggregates to trading_states and merges them back in with seed() when
+  it takes over an account (see referee.seed_equity_history)
+
+Only the most recently used EQUITY_STORE_MAX_OPEN files stay mapped.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from src import config
+
+MAGIC = b"EQTS0001"
+# magic, capacity, count, high_water_mark, first_equity, max_drawdown,
+# day (UTC ordinal), day_open, day_high, last_timestamp, last_equity
+HEADER = struct.Struct("<8sIxxxxQdddqdddd")
+HEADER_SIZE = 128
+SAMPLE_SIZE = 16
+
+
+def _day(timestamp: float) -> int:
+    return datetime.fromtimestamp(timestamp, timezone.utc).toordinal()
+
+
+class EquitySeries:
+    """A single account's memory-mapped equity ring buffer."""
+
+    def __init__(self, path: str, capacity: int):
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE
+        if exists:
+            with open(path, "rb") as handle:
+                magic, stored_capacity = struct.unpack_from("<8sI", handle.read(12))
+            if magic != MAGIC:
+                raise ValueError(f"Not an equity series file: {path}")
+            # The file's own capacity wins, so a config change never corrupts history
+            capacity = stored_capacity
+
+        size = HEADER_SIZE + capacity * SAMPLE_SIZE
+        with open(path, "r+b" if exists else "w+b") as handle:
+            if not exists or os.path.getsize(path) < size:
+                handle.truncate(size)
+            self._mmap = mmap.mmap(handle.fileno(), size)
+
+        self.capacity = capacity
+        self._samples = np.frombuffer(self._mmap, dtype=np.float64, count=capacity * 2, offset=HEADER_SIZE).reshape(capacity, 2)
+        if exists:
+            (_, _, self.count, self.high_water_mark, self.first_equity, self.max_drawdown_value,
+             self.day, self.day_open, self.day_high, self.last_timestamp, self.last_equity) = HEADER.unpack_from(self._mmap, 0)
+        else:
+            self.count = 0
+            self.high_water_mark = self.first_equity = self.max_drawdown_value = 0.0
+            self.day = 0
+            self.day_open = self.day_high = self.last_timestamp = self.last_equity = 0.0
+            self._write_header()
+
+    def _write_header(self) -> None:
+        HEADER.pack_into(
+            self._mmap, 0, MAGIC, self.capacity, self.count, self.high_water_mark, self.first_equity,
+            self.max_drawdown_value, self.day, self.day_open, self.day_high, self.last_timestamp, self.last_equity
+        )
+
+    def append(self, equity: float, timestamp: float) -> None:
+        """Record a sample and update the running aggregates."""
+        if self.count == 0:
+            self.first_equity = equity
+            # A seeded series keeps the peak it was seeded with
+            self.high_water_mark = max(self.high_water_mark, equity) if self.high_water_mark else equity
+        self.high_water_mark = max(self.high_water_mark, equity)
+        self.max_drawdown_value = max(self.max_drawdown_value, self.high_water_mark - equity)
+
+        day = _day(timestamp)
+        if day != self.day:
+            self.day = day
+            self.day_open = self.day_high = equity
+        else:
+            self.day_high = max(self.day_high, equity)
+
+        self._samples[self.count % self.capacity] = (timestamp, equity)
+        self.count += 1
+        self.last_timestamp = timestamp
+        self.last_equity = equity
+        self._write_header()
+
+    def seed(self, high_water_mark: float, day: int, day_open: float, day_high: float) -> None:
+        """Merge aggregates recorded elsewhere; peaks only ever rise and the later day wins."""
+        self.high_water_mark = max(self.high_water_mark, high_water_mark) if self.count else high_water_mark
+        if day > self.day:
+            self.day, self.day_open, self.day_high = day, day_open, day_high
+        elif day == self.day:
+            self.day_high = max(self.day_high, day_high)
+        self._write_header()
+
+    def samples(self, since: float = None) -> tuple:
+        """(timestamps, equities) in chronological order, optionally from `since`."""
+        if self.count <= self.capacity:
+            ordered = self._samples[:self.count]
+        else:
+            # Oldest retained sample sits at the next write position
+            ordered = np.roll(self._samples, -(self.count % self.capacity), axis=0)
+        if since is not None:
+            ordered = ordered[ordered[:, 0] >= since]
+        return ordered[:, 0].copy(), ordered[:, 1].copy()
+
+    def max_drawdown(self, since: float = None) -> float:
+        """Largest peak-to-trough equity drop, since the first sample or since `since`."""
+        if since is None:
+            return self.max_drawdown_value
+        _, equities = self.samples(since)
+        if not len(equities):
+            return 0.0
+        return float(np.max(np.maximum.accumulate(equities) - equities))
+
+    def flush(self) -> None:
+        self._mmap.flush()
+
+    def close(self) -> None:
+        if self._mmap.closed:
+            return
+        # Drop the array view first; mmap.close() fails while buffers are exported
+        self._samples = None
+        self._mmap.flush()
+        self._mmap.close()
+
+
+class EquityStore:
+    """Per-challenge EquitySeries files under one directory."""
+
+    def __init__(self, directory: str = None, capacity: int = None, max_open: int = None):
+        self.directory = directory if directory is not None else config.EQUITY_STORE_DIR
+        self.capacity = capacity or config.EQUITY_STORE_CAPACITY
+        self.max_open = max_open or config.EQUITY_STORE_MAX_OPEN
+        self._open: "OrderedDict[str, EquitySeries]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.directory, f"{digest}.eq")
+
+    def series(self, key: str, create: bool = True) -> Optional[EquitySeries]:
+        """The key's series, mapping it (and unmapping the least recently used) as needed."""
+        series = self._open.get(key)
+        if series is not None:
+            self._open.move_to_end(key)
+            return series
+
+        path = self._path(key)
+        if not create and not os.path.exists(path):
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        series = EquitySeries(path, self.capacity)
+        self._open[key] = series
+        while len(self._open) > self.max_open:
+            _, evicted = self._open.popitem(last=False)
+            evicted.close()
+        return series
+
+    def append(self, key: str, equity: float, timestamp: float = None) -> EquitySeries:
+        series = self.series(key)
+        series.append(float(equity), timestamp if timestamp is not None else time.time())
+        return series
+
+    def seed(self, key: str, high_water_mark: float, day: int, day_open: float, day_high: float) -> EquitySeries:
+        series = self.series(key)
+        series.seed(float(high_water_mark), day, float(day_open), float(day_high))
+        return series
+
+    def reset(self, key: str) -> None:
+        """Drop a series (e.g. its challenge was reset); the next append starts a new one."""
+        series = self._open.pop(key, None)
+        if series is not None:
+            series.close()
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def high_water_mark(self, key: str) -> Optional[float]:
+        series = self.series(key, create=False)
+        return series.high_water_mark if series and series.count else None
+
+    def day_open(self, key: str) -> Optional[float]:
+        series = self.series(key, create=False)
+        return series.day_open if series and series.count else None
+
+    def max_drawdown(self, key: str, since: float = None) -> float:
+        series = self.series(key, create=False)
+        return series.max_drawdown(since) if series else 0.0
+
+    def flush(self) -> None:
+        for series in self._open.values():
+            series.flush()
+
+    def close(self) -> None:
+        for series in self._open.values():
+            series.close()
+        self._open.clear()
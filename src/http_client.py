@@ -0,0 +1,126 @@
+"""
+Shared HTTP Client
+
+One engine-wide pooled httpx.AsyncClient for the HTTP bridge adapters
+(MT4/MT5 webhook and REST bridges), instead of a new client (and new
+TCP/TLS connections) per account per cycle:
+
+- Keep-alive connection pool, HTTP/2 when the h2 package is installed
+- HTTP_MAX_PER_HOST requests in flight per host, so one slow bridge
+  cannot take every pooled connection
+- Default timeouts from HTTP_TIMEOUT / HTTP_CONNECT_TIMEOUT
+
+BatchFetcher coalesces concurrent single-login lookups against the same
+bridge into one batch request, for bridges that support it.
+"""
+
+import asyncio
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src import config
+
+try:
+    import h2  # noqa: F401  (enables http2=True)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+_client: Optional[httpx.AsyncClient] = None
+_host_limits: dict[str, asyncio.Semaphore] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The shared client, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request on the shared client, within the per-host limit."""
+    host = urlsplit(url).netloc
+    limit = _host_limits.get(host)
+    if limit is None:
+        limit = _host_limits[host] = asyncio.Semaphore(config.HTTP_MAX_PER_HOST)
+    async with limit:
+        return await get_http_client().request(method, url, **kwargs)
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_limits.clear()
+
+
+class BatchFetcher:
+    """
+    Coalesces lookups of individual logins into batch requests.
+
+    Lookups for the same (url, headers) that arrive within
+    HTTP_BATCH_WINDOW seconds are sent together as
+    GET url?logins=1,2,3 (at most HTTP_BATCH_MAX_SIZE per request).
+    The bridge answers with a list of account objects carrying "login",
+    or an object keyed by login.
+    """
+
+    def __init__(self, window: float = None, max_size: int = None):
+        self.window = window if window is not None else config.HTTP_BATCH_WINDOW
+        self.max_size = max_size or config.HTTP_BATCH_MAX_SIZE
+        self._pending: dict[tuple, dict] = {}
+
+    async def fetch(self, url: str, login: str, headers: dict = None) -> Optional[dict]:
+        """One login's account data from the batch response (None if the bridge omitted it)."""
+        key = (url, tuple(sorted((headers or {}).items())))
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = {}
+            asyncio.get_running_loop().call_later(self.window, self._dispatch, key)
+        future = batch.get(str(login))
+        if future is None:
+            future = batch[str(login)] = asyncio.get_running_loop().create_future()
+        if len(batch) >= self.max_size:
+            self._dispatch(key)
+        return await asyncio.shield(future)
+
+    def _dispatch(self, key: tuple) -> None:
+        batch = self._pending.get(key)
+        if batch is None or not batch:
+            return
+        del self._pending[key]
+        asyncio.create_task(self._send(key, batch))
+
+    async def _send(self, key: tuple, batch: dict) -> None:
+        url, headers = key
+        try:
+            response = await request("GET", url, params={"logins": ",".join(batch)}, headers=dict(headers))
+            response.raise_for_status()
+            payload = response.json()
+            if isinstance(payload, list):
+                accounts = {str(item.get("login")): item for item in payload if isinstance(item, dict)}
+            else:
+                accounts = {str(login): item for login, item in payload.items()}
+            for login, future in batch.items():
+                if not future.done():
+                    future.set_result(accounts.get(login))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+
+
+batch_fetcher = BatchFetcher()
@@ -0,0 +1,86 @@
+"""
+Engine Metrics
+
+Prometheus metrics for finding where cycle time goes. Exposed over HTTP
+when METRICS_PORT is set (GET /metrics).
+
+- referee_stage_seconds{stage}: deriv_connect, deriv_authorize, deriv_balance,
+  deriv_portfolio, daily_pnl_query, <table>_upsert / <table>_update (Supabase writes)
+- referee_trader_seconds{broker}: end-to-end time per account check
+- referee_cycle_seconds / referee_cycle_users: polling cycle duration and size
+- referee_family_cycle_seconds{broker}: one broker family's polling cycle
+- referee_errors_total{type}: failures by classification
+- referee_check_outcomes_total{broker,outcome}: account checks per cycle
+  that synced, failed (error) or were skipped by an open breaker
+- referee_scheduling_lag_seconds: how late the scheduler dispatched a due check
+- referee_breaker_opens_total{scope,kind} / referee_breaker_skips_total{scope}:
+  circuit breakers opened and checks they skipped (see src/breakers.py)
+- referee_final_status_checks_total{outcome}: tick-modelled breaches/passes
+  re-checked against Deriv before writing (confirmed, rejected, failed)
+"""
+
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from src import config
+
+# Sub-second network stages up to multi-second stalls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_LATENCY = Histogram(
+    "referee_stage_seconds", "Latency of each evaluation stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+TRADER_LATENCY = Histogram(
+    "referee_trader_seconds", "End-to-end latency of one account check", ["broker"], buckets=LATENCY_BUCKETS
+)
+CYCLE_DURATION = Histogram(
+    "referee_cycle_seconds", "Duration of a full polling cycle",
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+)
+FAMILY_CYCLE_DURATION = Histogram(
+    "referee_family_cycle_seconds", "Duration of one broker family's polling cycle", ["broker"],
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+)
+CYCLE_USERS = Gauge("referee_cycle_users", "Accounts evaluated in the last cycle")
+ERRORS = Counter("referee_errors_total", "Evaluation errors by type", ["type"])
+CHECK_OUTCOMES = Counter(
+    "referee_check_outcomes_total", "Account checks by outcome (synced, error, skipped)", ["broker", "outcome"]
+)
+SCHEDULING_LAG = Histogram(
+    "referee_scheduling_lag_seconds", "Delay between a check's due time and its dispatch", buckets=LATENCY_BUCKETS
+)
+BREAKER_OPENS = Counter("referee_breaker_opens_total", "Circuit breakers opened", ["scope", "kind"])
+BREAKER_SKIPS = Counter("referee_breaker_skips_total", "Account checks skipped by an open breaker", ["scope"])
+FINAL_STATUS_CHECKS = Counter(
+    "referee_final_status_checks_total", "Modelled breaches/passes re-checked against Deriv", ["outcome"]
+)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """Observe the duration of a block under referee_stage_seconds{stage}."""
+    with STAGE_LATENCY.labels(stage).time():
+        yield
+
+
+def count_error(error_type: str) -> None:
+    ERRORS.labels(error_type).inc()
+
+
+def classify_error(error: BaseException) -> str:
+    """Coarse error type label for referee_errors_total (the circuit breakers' classification)."""
+    # src.breakers imports this module for its counters
+    from src.breakers import OTHER, classify_failure
+
+    kind = classify_failure(error)
+    return type(error).__name__ if kind == OTHER else kind
+
+
+def start_metrics_server(port: int = None) -> bool:
+    """Serve /metrics on METRICS_PORT. Returns False if metrics are disabled."""
+    port = port or config.METRICS_PORT
+    if not port:
+        return False
+    start_http_server(port)
+    return True
@@ -0,0 +1,211 @@
+"""
+MT4/MT5 EA Ingestion Server
+
+Receives the account snapshots that MT4/MT5 EAs POST (see EA_TEMPLATE in
+src/adapters/mt4mt5.py) and keeps only the latest state per (server, login),
+so the MT adapter reads balances from memory instead of making one
+outbound HTTP request per account per cycle.
+
+- POST /mt-webhook with X-API-Key
+- Body: {"server": "Broker-Live", "login": 123, "timestamp": 1700000000,
+  "balance": ..., "equity": ..., "currency": "USD"}
+  (optional: daily_pnl, open_lots)
+- Keys are bound to logins: an account whose credentials carry an api_key
+  only accepts that key; other logins accept a MT_INGEST_API_KEYS entry
+  that lists them ("key:login|login")
+- Path, key and Content-Length are checked before the body is read
+- Bursts coalesce: a newer post replaces the older, and a post whose EA
+  timestamp is older than the stored one is ignored
+
+Runs on a background thread inside the engine when MT_INGEST_PORT is set.
+The store is per-process, so push accounts must be evaluated by the same
+process that receives their posts: ingestion runs on a single, unsharded
+engine node (config.validate rejects MT_INGEST_PORT with ENGINE_SHARDING)
+and the push bridge refuses to connect where the server is not running.
+"""
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from colorama import Fore, Style
+
+from src import config
+
+INGEST_PATH = "/mt-webhook"
+MAX_BODY_BYTES = 64 * 1024
+
+
+def key_digest(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+
+class LatestStateStore:
+    """Latest EA snapshot per (server, login), plus the key bound to each login."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: dict[tuple, dict] = {}
+        self._owners: dict[tuple, str] = {}  # (server, login) -> digest of the account's own api_key
+        self._grants: dict[str, frozenset] = {}  # digest of a shared key -> logins it may post for
+
+    def grant(self, api_keys: dict) -> None:
+        """Bind shared keys ({api_key: logins}) to the logins they may post for."""
+        with self._lock:
+            self._grants = {key_digest(key): frozenset(str(login) for login in logins) for key, logins in api_keys.items()}
+
+    def bind(self, server: str, login, api_key: str) -> None:
+        """Bind an account's own api_key; no other key may post for it."""
+        with self._lock:
+            self._owners[(str(server), str(login))] = key_digest(api_key)
+
+    def known_key(self, api_key: str) -> bool:
+        digest = key_digest(api_key)
+        with self._lock:
+            return digest in self._grants or digest in self._owners.values()
+
+    def authorized(self, server: str, login: str, api_key: str) -> bool:
+        digest = key_digest(api_key)
+        with self._lock:
+            owner = self._owners.get((server, login))
+            if owner is not None:
+                return hmac.compare_digest(owner, digest)
+            return login in self._grants.get(digest, ())
+
+    def put(self, server: str, login: str, data: dict, api_key: str) -> bool:
+        """Store a snapshot; returns False if it is older than the stored one."""
+        now = time.time()
+        key = (server, login)
+        with self._lock:
+            previous = self._states.get(key)
+            if previous is not None and data["timestamp"] < previous["data"]["timestamp"]:
+                return False
+            self._states[key] = {
+                "data": data,
+                "received_at": now,
+                "key_digest": key_digest(api_key),
+                "updates": (previous["updates"] + 1) if previous else 1,
+            }
+            return True
+
+    def get(self, server: str, login) -> Optional[dict]:
+        with self._lock:
+            return self._states.get((str(server), str(login)))
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+def parse_snapshot(body: bytes) -> dict:
+    """Validate an EA post. Raises ValueError on malformed payloads."""
+    # MQL's StringToCharArray includes the terminating NUL
+    payload = json.loads(body.rstrip(b"\x00").decode("utf-8"))
+    if not isinstance(payload, dict) or payload.get("login") in (None, ""):
+        raise ValueError("login is required")
+    if not payload.get("server"):
+        raise ValueError("server is required")
+    snapshot = {
+        "server": str(payload["server"]),
+        "login": str(payload["login"]),
+        "timestamp": float(payload["timestamp"]),
+        "balance": float(payload["balance"]),
+        "equity": float(payload.get("equity", payload["balance"])),
+        "currency": str(payload.get("currency") or "USD"),
+        "daily_pnl": float(payload.get("daily_pnl") or 0),
+    }
+    if payload.get("open_lots") is not None:
+        snapshot["open_lots"] = float(payload["open_lots"])
+    return snapshot
+
+
+def make_handler(store: LatestStateStore):
+    class IngestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: dict = None) -> None:
+            data = json.dumps(body).encode("utf-8") if body is not None else b""
+            self.send_response(status)
+            if data:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _reject(self, status: int, error: str) -> None:
+            # The body was not read, so the connection cannot be reused
+            self.close_connection = True
+            self._send(status, {"error": error})
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                return self._send(200, {"logins": len(store)})
+            self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path.split("?", 1)[0] != INGEST_PATH:
+                return self._reject(404, "Not found")
+            api_key = self.headers.get("X-API-Key") or ""
+            if not api_key or not store.known_key(api_key):
+                return self._reject(401, "Invalid API key")
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                return self._reject(400, "Invalid Content-Length")
+            if length < 0:
+                return self._reject(400, "Invalid Content-Length")
+            if length > MAX_BODY_BYTES:
+                return self._reject(413, "Payload too large")
+            body = self.rfile.read(length)
+
+            try:
+                snapshot = parse_snapshot(body)
+            except (ValueError, KeyError, TypeError) as e:
+                return self._send(400, {"error": f"Invalid payload: {e}"})
+            if not store.authorized(snapshot["server"], snapshot["login"], api_key):
+                return self._send(403, {"error": "API key is not bound to this login"})
+
+            # Older EA timestamps are dropped; the EA does not need to know
+            store.put(snapshot["server"], snapshot["login"], snapshot, api_key)
+            self._send(204)
+
+    return IngestHandler
+
+
+# Process-wide store read by MT4MT5Adapter
+ingest_store = LatestStateStore()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_ingest_server(port: int = None, host: str = None) -> bool:
+    """Serve EA posts on MT_INGEST_PORT. Returns False if ingestion is disabled."""
+    global _server
+    port = port or config.MT_INGEST_PORT
+    if not port or _server is not None:
+        return _server is not None
+    if not config.MT_INGEST_API_KEYS:
+        print(f"{Fore.YELLOW}⚠ MT_INGEST_API_KEYS is empty; only accounts with their own api_key can post{Style.RESET_ALL}")
+
+    ingest_store.grant(config.MT_INGEST_API_KEYS)
+    _server = ThreadingHTTPServer((host or config.MT_INGEST_HOST, port), make_handler(ingest_store))
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="mt-ingest", daemon=True).start()
+    return True
+
+
+def stop_ingest_server() -> None:
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+def ingest_enabled() -> bool:
+    return _server is not None
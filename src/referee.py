@@ -1,43 +1,92 @@
 import asyncio
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from decimal import Decimal
 import json
+import time
+from typing import Optional
 
 from colorama import Fore, Style
-from deriv_api import DerivAPI
-from supabase import create_client, Client
 
 from src import config
+from src.batch_eval import evaluate_users
+from src.breakers import AUTH, SKIPPED, breakers
+from src.db import execute, run_db, supabase
+from src.metrics import (
+    CHECK_OUTCOMES, CYCLE_DURATION, CYCLE_USERS, FINAL_STATUS_CHECKS, TRADER_LATENCY, classify_error, count_error, time_stage
+)
+from src.equity_store import EquityStore
+from src.roster import AccountRoster
+from src.rules import RuleBook, TradingDayCounter, build_context
+from src.sessions import get_session_pool
+from src.sharding import owns_account
+from src.valuation import valuation_engine
+from src.writes import ChangeTracker, WriteBatch
 
-# Initialize Supabase client (uses service-role key for full RLS bypass)
-supabase: Client = create_client(config.SUPABASE_URL, config.SUPABASE_SERVICE_KEY)
+# Last persisted trading_states per user, so unchanged rows are not rewritten
+state_tracker = ChangeTracker()
 
+# In-memory user_accounts, refreshed by updated_at deltas
+roster = AccountRoster(supabase)
 
-def fetch_deriv_users():
+# Compiled per-tier challenge rules (challenge_rules table)
+rule_book = RuleBook(supabase)
+
+# Trading days per account, loaded while a tier uses min_trading_days
+trading_days = TradingDayCounter(supabase)
+
+# Local equity history: high-water mark and intraday peak for drawdown rules
+equity_store = EquityStore()
+
+# Fields whose change warrants a trading_states write
+TRADING_STATE_FIELDS = ("balance", "equity", "daily_pnl", "currency", "status")
+
+# Equity series keys this worker owned at the last roster sync (see seed_equity_history)
+_equity_owned: set = set()
+
+
+async def sync_reference_data() -> None:
+    """Bring the roster and tier rules up to date without blocking the event loop."""
+    await roster.sync_async()
+    for previous in roster.take_restarted():
+        # Reset challenges must not inherit the previous attempt's high-water mark
+        reset_equity(roster.accounts.get(previous.get("user_email"), previous), previous)
+    await seed_equity_history(roster.active())
+    await run_db(rule_book.refresh)
+    if rule_book.uses("min_trading_days"):
+        await run_db(trading_days.refresh)
+        trading_days.apply(roster.accounts.values())
+
+
+async def fetch_deriv_users():
     """
-    Fetch active Deriv users from user_accounts table.
-    Query: broker_type='deriv' AND is_active=true AND deriv_api_token IS NOT NULL
+    Active Deriv users from the delta-synced roster.
+    Filter: broker_type='deriv' AND is_active=true AND deriv_api_token IS NOT NULL
     """
-    try:
-        response = (
-            supabase.table("user_accounts")
-            .select("*")
-            .eq("broker_type", "deriv")
-            .eq("is_active", True)
-            .not_.is_("deriv_api_token", "null")
-            .execute()
-        )
-        return response.data if response.data else []
-    except Exception as e:
-        print(f"{Fore.RED}⚠ Failed to fetch Deriv users: {e}{Style.RESET_ALL}")
-        return []
+    await sync_reference_data()
+    return [
+        user for user in roster.active("deriv")
+        if user.get("broker_type") == "deriv" and user.get("deriv_api_token") is not None
+        and owns_account(user.get("user_email"))
+    ]
 
 
-def get_daily_pnl(user_email: str) -> float:
+async def fetch_active_accounts(sync: bool = True):
+    """
+    Every active account regardless of broker, from the delta-synced roster.
+    Filter: is_active=true
+    With sync=False the roster is read as last synced.
+    """
+    if sync:
+        await sync_reference_data()
+    return [user for user in roster.active() if owns_account(user.get("user_email"))]
+
+
+async def get_daily_pnl(user_email: str) -> float:
     """Calculate daily P&L from profit_table for today."""
     try:
         today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        response = supabase.table("profit_table").select("profit").eq("user_email", user_email).gte("created_at", today_start.isoformat()).execute()
+        with time_stage("daily_pnl_query"):
+            response = await execute(supabase.table("profit_table").select("profit").eq("user_email", user_email).gte("created_at", today_start.isoformat()))
         
         if response.data:
             total_pnl = sum(float(row.get("profit", 0)) for row in response.data)
@@ -48,6 +97,53 @@ def get_daily_pnl(user_email: str) -> float:
         return 0.0
 
 
+async def fetch_daily_pnl_map(user_emails: list = None) -> dict:
+    """
+    Fetch today's P&L for many users in one call.
+    Uses the daily_pnl_by_user RPC (see supabase_schema.sql), paged so
+    PostgREST's max-rows cap does not truncate it; if it is not installed,
+    falls back to one paged profit_table select summed in Python.
+    Returns {user_email: daily_pnl}.
+    """
+    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    page_size = 1000
+    try:
+        pnl_map = {}
+        offset = 0
+        while True:
+            query = supabase.rpc("daily_pnl_by_user", {"since": today_start.isoformat()})
+            with time_stage("daily_pnl_query"):
+                response = await execute(query.order("user_email").range(offset, offset + page_size - 1))
+            rows = response.data or []
+            for row in rows:
+                pnl_map[row["user_email"]] = float(row.get("daily_pnl") or 0)
+            if len(rows) < page_size:
+                return pnl_map
+            offset += page_size
+    except Exception as e:
+        print(f"{Fore.YELLOW}⚠ daily_pnl_by_user RPC unavailable, using grouped select: {e}{Style.RESET_ALL}")
+
+    pnl_map = {}
+    offset = 0
+    try:
+        while True:
+            query = supabase.table("profit_table").select("user_email, profit").gte("created_at", today_start.isoformat())
+            if user_emails is not None:
+                query = query.in_("user_email", user_emails)
+            with time_stage("daily_pnl_query"):
+                response = await execute(query.order("id").range(offset, offset + page_size - 1))
+            rows = response.data or []
+            for row in rows:
+                email = row.get("user_email")
+                pnl_map[email] = pnl_map.get(email, 0.0) + float(row.get("profit", 0))
+            if len(rows) < page_size:
+                break
+            offset += page_size
+    except Exception as e:
+        print(f"{Fore.YELLOW}⚠ Failed to fetch daily P&L: {e}{Style.RESET_ALL}")
+    return pnl_map
+
+
 def get_deriv_token(user: dict) -> str:
     """
     Extract Deriv API token from user record.
@@ -69,14 +165,47 @@ def get_deriv_token(user: dict) -> str:
     return user.get("deriv_api_token", "")
 
 
-async def get_open_positions_value(api, user_email: str) -> float:
-    """Get unrealized P&L from open positions."""
+def get_broker_credentials(user: dict) -> dict:
+    """
+    Parse broker_credentials (JSONB or JSON string) into a dict.
+    Deriv records also get the legacy deriv_api_token as "token".
+    """
+    credentials = user.get("broker_credentials") or {}
+    if isinstance(credentials, str):
+        try:
+            credentials = json.loads(credentials)
+        except:
+            credentials = {}
+    credentials = dict(credentials)
+    if (user.get("broker_type") or "deriv").lower() == "deriv" and not credentials.get("token"):
+        credentials["token"] = user.get("deriv_api_token", "")
+    return credentials
+
+
+async def get_balance(api) -> tuple[float, str]:
+    """Get (balance, currency) for the authorized account."""
+    with time_stage("deriv_balance"):
+        balance_data = await api.balance()
+    balance_info = balance_data.get("balance") if isinstance(balance_data, dict) else {}
+    return float(balance_info.get("balance", 0)), balance_info.get("currency", "USD")
+
+
+async def get_open_positions(api, user_email: str) -> tuple[float, int]:
+    """
+    Get (unrealized P&L, open position count) from open positions of any
+    contract type. With the valuation engine, contracts are valued from
+    the latest tick of their underlying rather than the portfolio snapshot.
+    """
     try:
-        portfolio = await api.portfolio(contract_type=["CALL", "PUT", "MULTUP", "MULTDOWN"])
+        with time_stage("deriv_portfolio"):
+            portfolio = await api.portfolio()
         positions = portfolio.get("portfolio", {}).get("contracts", [])
-        
+
+        if valuation_engine.enabled:
+            return await valuation_engine.sync_account(user_email, api, positions), len(positions)
+
         if not positions:
-            return 0.0
+            return 0.0, 0
         
         total_unrealized = 0.0
         for pos in positions:
@@ -84,9 +213,23 @@ async def get_open_positions_value(api, user_email: str) -> float:
             current_value = float(pos.get("bid_price", 0))
             total_unrealized += current_value - buy_price
         
-        return total_unrealized
+        return total_unrealized, len(positions)
     except:
-        return 0.0
+        return 0.0, 0
+
+
+async def get_open_positions_value(api, user_email: str) -> float:
+    """Get unrealized P&L from open positions."""
+    unrealized, _ = await get_open_positions(api, user_email)
+    return unrealized
+
+
+def challenge_thresholds(user: dict) -> tuple[float, float]:
+    """Return (breach_threshold, pass_threshold) for a user's challenge."""
+    account_size = float(user.get("account_size", 0))
+    max_drawdown_limit = float(user.get("max_drawdown_limit", 0))
+    profit_target = float(user.get("profit_target", 0))
+    return account_size - max_drawdown_limit, account_size + profit_target
 
 
 def evaluate_challenge(user: dict, equity: float) -> tuple[str, str]:
@@ -95,8 +238,6 @@ def evaluate_challenge(user: dict, equity: float) -> tuple[str, str]:
     Returns (status, reason)
     """
     account_size = float(user.get("account_size", 0))
-    max_drawdown_limit = float(user.get("max_drawdown_limit", 0))
-    profit_target = float(user.get("profit_target", 0))
     current_status = user.get("challenge_status", "active")
     
     # Skip if already breached or passed
@@ -108,8 +249,7 @@ def evaluate_challenge(user: dict, equity: float) -> tuple[str, str]:
         return "active", "No challenge parameters"
     
     # Calculate thresholds
-    breach_threshold = account_size - max_drawdown_limit
-    pass_threshold = account_size + profit_target
+    breach_threshold, pass_threshold = challenge_thresholds(user)
     
     # BREACH CHECK: equity dropped below allowed drawdown
     if equity < breach_threshold:
@@ -123,143 +263,483 @@ def evaluate_challenge(user: dict, equity: float) -> tuple[str, str]:
     return "active", f"Equity ${equity:.2f} (Breach: ${breach_threshold:.2f}, Target: ${pass_threshold:.2f})"
 
 
-async def check_single_trader(user: dict):
-    """Check a single trader's Deriv account and evaluate their challenge."""
+def evaluate_user(user: dict, equity: float, daily_pnl: float = 0.0) -> tuple[str, str]:
+    """
+    Evaluate with the user's tier rule set if one is declared,
+    otherwise with the static evaluate_challenge check.
+    """
+    rules = rule_book.for_user(user)
+    if rules is None:
+        return evaluate_challenge(user, equity)
+    return rules.evaluate(build_context(user, equity, daily_pnl), user.get("challenge_status", "active"))
+
+
+def risk_margin(user: dict, equity: float, daily_pnl: float = 0.0) -> Optional[float]:
+    """
+    Distance in currency from the nearest breach or pass threshold, from
+    the same rules evaluate_user applies. None if no rule has a threshold.
+    """
+    rules = rule_book.for_user(user)
+    if rules is None:
+        breach_threshold, pass_threshold = challenge_thresholds(user)
+        return min(equity - breach_threshold, pass_threshold - equity)
+    return rules.margin(build_context(user, equity, daily_pnl))
+
+
+async def auto_initialize_challenge(user: dict, balance: float) -> None:
+    """Set default challenge parameters from the first observed balance."""
+    user_email = user.get("user_email")
+    account_size = float(user.get("account_size", 0))
+    if account_size == 0 and balance > 0:
+        print(f"{Fore.MAGENTA}[{user_email}] ⚡ Auto-initializing challenge: Size ${balance}{Style.RESET_ALL}")
+        account_size = balance
+        # Set sensible defaults: 10% drawdown, 10% profit target
+        max_drawdown = balance * 0.10
+        profit_target = balance * 0.10
+        
+        try:
+            await execute(supabase.table("user_accounts").update({
+                "account_size": account_size,
+                "max_drawdown_limit": max_drawdown,
+                "profit_target": profit_target
+            }).eq("user_email", user_email))
+            # Update local dictionary so evaluation works immediately
+            user["account_size"] = account_size
+            user["max_drawdown_limit"] = max_drawdown
+            user["profit_target"] = profit_target
+        except Exception as e:
+            print(f"{Fore.RED}⚠ Failed to auto-set parameters: {e}{Style.RESET_ALL}")
+
+
+def equity_key(user: dict) -> str:
+    """Equity series key: the user, plus the challenge's start when known."""
+    started = user.get("evaluation_started_at")
+    return f"{user.get('user_email')}|{started}" if started else user.get("user_email")
+
+
+def reset_equity(user: dict, previous: dict = None) -> None:
+    """Forget the equity history of a reset challenge (its previous row's series and the current one)."""
+    for field in ("high_water_mark", "day_open_equity", "day_high_equity"):
+        user.pop(field, None)
+    if not equity_store.enabled:
+        return
+    try:
+        for key in {equity_key(previous or user), equity_key(user)}:
+            equity_store.reset(key)
+    except OSError as e:
+        print(f"{Fore.YELLOW}[{user.get('user_email')}] ⚠ Failed to reset equity history: {e}{Style.RESET_ALL}")
+
+
+def track_equity(user: dict, equity: float) -> None:
+    """Append an equity sample locally and expose its running aggregates to the rules."""
+    if not equity_store.enabled:
+        return
+    try:
+        series = equity_store.append(equity_key(user), equity)
+    except (OSError, ValueError) as e:
+        print(f"{Fore.YELLOW}[{user.get('user_email')}] ⚠ Failed to record equity sample: {e}{Style.RESET_ALL}")
+        return
+    user["high_water_mark"] = series.high_water_mark
+    user["day_open_equity"] = series.day_open
+    user["day_high_equity"] = series.day_high
+
+
+def equity_state(user: dict) -> dict:
+    """The equity series aggregates as trading_states columns, so another worker can take them over."""
+    if not equity_store.enabled:
+        return {}
+    try:
+        series = equity_store.series(equity_key(user), create=False)
+    except (OSError, ValueError):
+        return {}
+    if series is None or not series.count:
+        return {}
+    return {
+        "equity_series": equity_key(user),
+        "high_water_mark": series.high_water_mark,
+        "day_open_equity": series.day_open,
+        "day_high_equity": series.day_high,
+        "equity_day": date.fromordinal(series.day).isoformat(),
+    }
+
+
+async def seed_equity_history(users: list) -> None:
+    """
+    Merge the persisted equity aggregates into the local store for
+    accounts this worker has just started owning.
+
+    The store is node-local, so after a restart on a new disk or a shard
+    moving between ENGINE_SHARDING workers the local series is missing or
+    stale; the trading_states copy written by the previous owner restores
+    the high-water mark and intraday peak. Only the series key the row was
+    written for is used, so a reset challenge never inherits the old peak.
+    """
+    if not equity_store.enabled:
+        return
+    owned = {equity_key(user): user for user in users if owns_account(user.get("user_email"))}
+    taken_over = {key: user for key, user in owned.items() if key not in _equity_owned}
+    _equity_owned.clear()
+    _equity_owned.update(owned)
+    if not taken_over:
+        return
+
+    by_email = {user.get("user_email"): key for key, user in taken_over.items()}
+    emails = list(by_email)
+    seeded = 0
+    try:
+        for start in range(0, len(emails), config.SUPABASE_WRITE_BATCH_SIZE):
+            query = supabase.table("trading_states").select(
+                "user_email, equity_series, high_water_mark, day_open_equity, day_high_equity, equity_day"
+            ).in_("user_email", emails[start:start + config.SUPABASE_WRITE_BATCH_SIZE])
+            response = await execute(query)
+            for row in response.data or []:
+                key = by_email.get(row.get("user_email"))
+                if key is None or row.get("equity_series") != key or row.get("high_water_mark") is None:
+                    continue
+                equity_store.seed(
+                    key, float(row["high_water_mark"]), date.fromisoformat(row["equity_day"]).toordinal(),
+                    float(row.get("day_open_equity") or 0), float(row.get("day_high_equity") or 0)
+                )
+                seeded += 1
+    except Exception as e:
+        # Retry the remaining accounts on the next sync
+        _equity_owned.difference_update(taken_over)
+        print(f"{Fore.YELLOW}⚠ Failed to seed equity history: {e}{Style.RESET_ALL}")
+    if seeded:
+        print(f"{Fore.BLUE}Seeded equity history for {seeded} account(s) from trading_states{Style.RESET_ALL}")
+
+
+def record_evaluation(user: dict, balance: float, equity: float, daily_pnl: float, currency: str, batch: WriteBatch,
+                      valuation_key: str = None, token: str = None) -> str:
+    """
+    Evaluate the challenge, print the outcome and queue the resulting
+    trading_states / challenge_status rows. Returns the new status.
+
+    With a valuation key and token, a breach/pass reached while the account
+    holds contracts valued by the valuation engine is not written here: it
+    goes to confirm_final_status and the current status is kept until
+    Deriv's own bids confirm it.
+    """
+    user_email = user.get("user_email")
+    track_equity(user, equity)
+    new_status, reason = evaluate_user(user, equity, daily_pnl)
+    current_status = user.get("challenge_status", "active")
+    if (new_status in ["breached", "passed"] and new_status != current_status and valuation_key and token
+            and valuation_engine.has_contracts(valuation_key)):
+        request_confirmation(valuation_key, user, token, new_status)
+        print(f"{Fore.YELLOW}[{user_email}] ⏳ Modelled {new_status.upper()} pending confirmation: {reason}{Style.RESET_ALL}")
+        return current_status
+
+    # Print status with color
+    if new_status == "breached":
+        print(f"{Fore.RED}{Style.BRIGHT}[{user_email}] ❌ BREACHED: {reason}{Style.RESET_ALL}")
+    elif new_status == "passed":
+        print(f"{Fore.GREEN}{Style.BRIGHT}[{user_email}] 🏆 PASSED: {reason}{Style.RESET_ALL}")
+    else:
+        print(f"{Fore.BLUE}[{user_email}] ✅ Active: {reason}{Style.RESET_ALL}")
+
+    # Another worker may have taken this account's shard mid-check
+    if not owns_account(user_email):
+        return new_status
+
+    # Queue trading_states row
+    current_time = datetime.now(timezone.utc).isoformat()
+    batch.upsert("trading_states", {
+        "user_email": user_email,
+        "balance": balance,
+        "equity": equity,
+        "daily_pnl": daily_pnl,
+        "currency": currency,
+        "status": new_status,
+        "last_trade_at": current_time,
+        "updated_at": current_time,
+        **equity_state(user)
+    }, material=TRADING_STATE_FIELDS)
+
+    # Update challenge_status in user_accounts ONLY (preserve locked_at, evaluation_started_at)
+    if new_status != user.get("challenge_status"):
+        batch.update("user_accounts", {"user_email": user_email, "challenge_status": new_status})
+        user["challenge_status"] = new_status
+        if new_status in ["breached", "passed"]:
+            print(f"{Fore.MAGENTA}[{user_email}] 📧 Status → {new_status.upper()}{Style.RESET_ALL}")
+
+    return new_status
+
+
+# Final-status confirmations in flight (by valuation key) and the tasks
+# running them, referenced so they are not garbage-collected mid-write
+_confirming: set = set()
+_background_tasks: set = set()
+
+# Accounts moved by the current tick: key -> (user, token, unrealized P&L)
+_revalued: dict = {}
+
+
+async def fetch_confirmed_equity(key: str, api) -> tuple[float, str, float]:
+    """
+    (balance, currency, equity) read from Deriv, with every open contract
+    re-anchored from proposal_open_contract instead of its local model.
+    Raises if any of it cannot be read.
+    """
+    with time_stage("deriv_portfolio"):
+        portfolio = await api.portfolio()
+    contracts = portfolio.get("portfolio", {}).get("contracts", [])
+    (balance, currency), unrealized_pnl = await asyncio.gather(
+        get_balance(api), valuation_engine.sync_account(key, api, contracts, reanchor=True)
+    )
+    return balance, currency, balance + unrealized_pnl
+
+
+async def confirm_final_status(key: str, user: dict, token: str, candidate: str) -> None:
+    """
+    Re-check a breach/pass computed from tick-modelled contract values
+    against Deriv's own balance and bids, and record it only if those
+    produce the same status. Final statuses are never re-evaluated, so a
+    model error must not be able to write one.
+    """
+    user_email = user.get("user_email")
+    try:
+        session = await get_session_pool().acquire(token)
+        balance, currency, equity = await fetch_confirmed_equity(key, session.api)
+        if user.get("challenge_status") in ["breached", "passed"]:
+            return
+        daily_pnl = user.get("daily_pnl", 0.0)
+        user["last_balance"] = balance
+        user["last_equity"] = equity
+        confirmed, reason = evaluate_user(user, equity, daily_pnl)
+        if confirmed != candidate:
+            FINAL_STATUS_CHECKS.labels("rejected").inc()
+            print(f"{Fore.YELLOW}[{user_email}] ⚠ Modelled {candidate} not confirmed by Deriv: {reason}{Style.RESET_ALL}")
+            return
+        FINAL_STATUS_CHECKS.labels("confirmed").inc()
+        batch = WriteBatch(supabase, tracker=state_tracker)
+        record_evaluation(user, balance, equity, daily_pnl, currency, batch)
+        await batch.flush_async()
+    except Exception as e:
+        # Left to the account's next regular check
+        FINAL_STATUS_CHECKS.labels("failed").inc()
+        print(f"{Fore.YELLOW}[{user_email}] ⚠ Could not confirm modelled {candidate}: {e}{Style.RESET_ALL}")
+    finally:
+        _confirming.discard(key)
+
+
+def watch_open_contracts(key: str, user: dict, token: str) -> None:
+    """
+    Re-evaluate the account on every tick that moves its open contracts,
+    using its latest observed balance and daily P&L. A breach (or pass)
+    is confirmed against Deriv (confirm_final_status) and recorded right
+    away instead of waiting for the account's next check.
+    """
+    if not valuation_engine.enabled:
+        return
+    if user.get("challenge_status") in ["breached", "passed"] or not owns_account(user.get("user_email")):
+        valuation_engine.watch(key, None)
+        return
+
+    def on_revaluation(unrealized_pnl: float) -> None:
+        # Listeners for one tick run back to back; evaluate them together afterwards
+        if not _revalued:
+            asyncio.get_running_loop().call_soon(_evaluate_revalued)
+        _revalued[key] = (user, token, unrealized_pnl)
+
+    valuation_engine.watch(key, on_revaluation)
+
+
+def _evaluate_revalued() -> None:
+    """Evaluate every account the last tick moved in one batch pass; breaches/passes go to confirmation."""
+    entries = [
+        (key, user, token, user["last_balance"] + unrealized_pnl)
+        for key, (user, token, unrealized_pnl) in _revalued.items()
+        if user.get("last_balance") is not None and key not in _confirming
+        and user.get("challenge_status") not in ["breached", "passed"]
+    ]
+    _revalued.clear()
+    if not entries:
+        return
+
+    users = [user for _, user, _, _ in entries]
+    results = evaluate_users(
+        users, [equity for *_, equity in entries], [user.get("daily_pnl", 0.0) for user in users], rule_book
+    )
+    for (key, user, token, equity), (new_status, _) in zip(entries, results):
+        user["last_equity"] = equity
+        if new_status in ["breached", "passed"]:
+            request_confirmation(key, user, token, new_status)
+
+
+def request_confirmation(key: str, user: dict, token: str, candidate: str) -> None:
+    """Start confirm_final_status for an account unless one is already in flight."""
+    if key in _confirming:
+        return
+    _confirming.add(key)
+    task = asyncio.create_task(confirm_final_status(key, user, token, candidate))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def record_error(user_email: str, batch: WriteBatch) -> None:
+    """Queue an error status for a trader in trading_states."""
+    if not owns_account(user_email):
+        return
+    batch.upsert("trading_states", {
+        "user_email": user_email, "status": "error", "updated_at": datetime.now(timezone.utc).isoformat()
+    }, material=("status",))
+
+
+async def check_single_trader(user: dict, batch: WriteBatch = None, daily_pnl_map: dict = None):
+    """
+    Check a single trader's Deriv account and evaluate their challenge.
+    Returns the newly computed challenge status, or None on failure.
+
+    Row writes are queued on batch; without one they are flushed immediately.
+    daily_pnl_map is the per-cycle {user_email: daily_pnl} cache; without it
+    the trader's P&L is queried directly.
+    """
+    if batch is None:
+        batch = WriteBatch(supabase, tracker=state_tracker)
+        try:
+            return await check_single_trader(user, batch, daily_pnl_map)
+        finally:
+            await batch.flush_async()
+
     user_email = user.get("user_email")
     deriv_token = get_deriv_token(user)
     
     if not deriv_token:
         print(f"{Fore.RED}[{user_email}] ⚠ No Deriv token found{Style.RESET_ALL}")
-        return False
+        return None
     
     try:
         token_suffix = deriv_token[-4:]
         print(f"{Fore.YELLOW}[{user_email}] Connecting with token ...{token_suffix}{Style.RESET_ALL}")
 
-        api = DerivAPI(app_id=config.DERIV_APP_ID)
-        auth_response = await api.authorize(deriv_token)
+        # Reuse the pooled, already-authorized session for this token
+        session = await get_session_pool().acquire(deriv_token)
+        api = session.api
         
         # DEBUG: Check account details
-        auth_data = auth_response.get("authorize", {})
-        account_id = auth_data.get("loginid")
-        is_virtual = auth_data.get("is_virtual") == 1
-        account_type = "DEMO" if is_virtual else "REAL"
+        account_id = session.account_id
+        account_type = "DEMO" if session.is_virtual else "REAL"
         
         print(f"{Fore.GREEN}[{user_email}] ✔ Auth Success! ({account_type} Account: {account_id}){Style.RESET_ALL}")
 
         # Extract and update Deriv account ID if changed
-        try:
-            if account_id:
-                supabase.table("user_accounts").update({
-                    "deriv_account_id": account_id
-                }).eq("user_email", user_email).execute()
-        except:
-            pass
+        if account_id and account_id != user.get("deriv_account_id"):
+            batch.update("user_accounts", {"user_email": user_email, "deriv_account_id": account_id})
+            user["deriv_account_id"] = account_id
 
-        # Get balance
-        balance_data = await api.balance()
-        balance_info = balance_data.get("balance") if isinstance(balance_data, dict) else {}
-        balance = float(balance_info.get("balance", 0))
-        currency = balance_info.get("currency", "USD")
-
-        # --- AUTO-DISCOVERY LOGIC ---
-        account_size = float(user.get("account_size", 0))
-        if account_size == 0 and balance > 0:
-            print(f"{Fore.MAGENTA}[{user_email}] ⚡ Auto-initializing challenge: Size ${balance}{Style.RESET_ALL}")
-            account_size = balance
-            # Set sensible defaults: 10% drawdown, 10% profit target
-            max_drawdown = balance * 0.10
-            profit_target = balance * 0.10
-            
-            try:
-                supabase.table("user_accounts").update({
-                    "account_size": account_size,
-                    "max_drawdown_limit": max_drawdown,
-                    "profit_target": profit_target
-                }).eq("user_email", user_email).execute()
-                # Update local dictionary so evaluation works immediately
-                user["account_size"] = account_size
-                user["max_drawdown_limit"] = max_drawdown
-                user["profit_target"] = profit_target
-            except Exception as e:
-                print(f"{Fore.RED}⚠ Failed to auto-set parameters: {e}{Style.RESET_ALL}")
-        # -----------------------------
-
-        # Get unrealized P&L from open positions
-        unrealized_pnl = await get_open_positions_value(api, user_email)
+        # Balance and open positions in flight together on the same connection
+        # (responses are matched by req_id), so this costs one round trip
+        (balance, currency), (unrealized_pnl, open_positions) = await asyncio.gather(
+            get_balance(api), get_open_positions(api, user_email)
+        )
+
+        await auto_initialize_challenge(user, balance)
         
         # Calculate equity = balance + unrealized P&L
         equity = balance + unrealized_pnl
+
+        # Keep the latest observation on the record for the scheduler
+        user["last_equity"] = equity
+        user["open_positions"] = open_positions
         
-        # Get daily P&L from profit_table
-        daily_pnl = get_daily_pnl(user_email)
+        # Get daily P&L from the per-cycle cache, or profit_table
+        if daily_pnl_map is not None:
+            daily_pnl = daily_pnl_map.get(user_email, 0.0)
+        else:
+            daily_pnl = await get_daily_pnl(user_email)
+
+        # Read by the tick watcher between checks
+        user["last_balance"] = balance
+        user["daily_pnl"] = daily_pnl
 
         print(f"{Fore.CYAN}[{user_email}] Balance: ${balance:.2f} | Unrealized: ${unrealized_pnl:.2f} | Equity: ${equity:.2f} | Daily P&L: ${daily_pnl:.2f}{Style.RESET_ALL}")
 
-        # Evaluate challenge status
-        new_status, reason = evaluate_challenge(user, equity)
-        
-        # Print status with color
-        if new_status == "breached":
-            print(f"{Fore.RED}{Style.BRIGHT}[{user_email}] ❌ BREACHED: {reason}{Style.RESET_ALL}")
-        elif new_status == "passed":
-            print(f"{Fore.GREEN}{Style.BRIGHT}[{user_email}] 🏆 PASSED: {reason}{Style.RESET_ALL}")
+        breakers.record_success(user_email, "deriv")
+        new_status = record_evaluation(user, balance, equity, daily_pnl, currency, batch, user_email, deriv_token)
+        watch_open_contracts(user_email, user, deriv_token)
+        return new_status
+
+    except Exception as e:
+        kind = breakers.record_failure(user_email, "deriv", e)
+        print(f"{Fore.RED}{Style.BRIGHT}[{user_email}] ❌ FAILED ({kind}): {e}{Style.RESET_ALL}")
+        count_error(classify_error(e))
+        if kind == AUTH:
+            # Dead credentials: free the connection instead of reconnecting every cycle
+            await get_session_pool().evict(deriv_token)
         else:
-            print(f"{Fore.BLUE}[{user_email}] ✅ Active: {reason}{Style.RESET_ALL}")
+            # Force the pooled session to reconnect next cycle
+            get_session_pool().invalidate(deriv_token)
+        record_error(user_email, batch)
+        return None
 
-        # Persist to trading_states
-        current_time = datetime.now(timezone.utc).isoformat()
-        try:
-            sync_data = {
-                "user_email": user_email,
-                "balance": balance,
-                "equity": equity,
-                "daily_pnl": daily_pnl,
-                "currency": currency,
-                "status": new_status,
-                "last_trade_at": current_time,
-                "updated_at": current_time
-            }
-
-            supabase.table("trading_states").upsert(
-                sync_data,
-                on_conflict="user_email"
-            ).execute()
-            print(f"{Fore.CYAN}[{user_email}] ✔ trading_states updated{Style.RESET_ALL}")
-        except Exception as db_error:
-            print(f"{Fore.YELLOW}[{user_email}] ⚠ trading_states sync failed: {db_error}{Style.RESET_ALL}")
-
-        # Update challenge_status in user_accounts ONLY (preserve locked_at, evaluation_started_at)
-        if new_status != user.get("challenge_status"):
-            try:
-                supabase.table("user_accounts").update({
-                    "challenge_status": new_status
-                }).eq("user_email", user_email).execute()
-                
-                if new_status in ["breached", "passed"]:
-                    print(f"{Fore.MAGENTA}[{user_email}] 📧 Status → {new_status.upper()}{Style.RESET_ALL}")
-            except Exception as e:
-                print(f"{Fore.YELLOW}[{user_email}] ⚠ challenge_status update failed: {e}{Style.RESET_ALL}")
-
-        await api.disconnect()
-        return True
 
-    except Exception as e:
-        print(f"{Fore.RED}{Style.BRIGHT}[{user_email}] ❌ FAILED: {e}{Style.RESET_ALL}")
-        # Mark user as error in trading_states
+async def check_trader_bounded(user: dict, semaphore: asyncio.Semaphore, timeout: float, batch: WriteBatch, daily_pnl_map: dict):
+    """
+    Run check_single_trader under the concurrency limit and per-trader timeout.
+    Accounts (or a broker) whose circuit breaker is open are skipped without
+    taking a slot and return SKIPPED.
+    """
+    user_email = user.get("user_email")
+    skip_reason = breakers.allow(user_email, "deriv", get_deriv_token(user))
+    if skip_reason:
+        print(f"{Fore.MAGENTA}[{user_email}] ⏸ Skipped: {skip_reason}{Style.RESET_ALL}")
+        return SKIPPED
+
+    async with semaphore:
         try:
-            supabase.table("trading_states").upsert(
-                {"user_email": user_email, "status": "error", "updated_at": datetime.now(timezone.utc).isoformat()},
-                on_conflict="user_email"
-            ).execute()
-        except:
-            pass
-        return False
+            with TRADER_LATENCY.labels("deriv").time():
+                return await asyncio.wait_for(check_single_trader(user, batch, daily_pnl_map), timeout=timeout)
+        except asyncio.TimeoutError as e:
+            print(f"{Fore.RED}{Style.BRIGHT}[{user_email}] ❌ TIMEOUT after {timeout:.0f}s{Style.RESET_ALL}")
+            count_error("timeout")
+            breakers.record_failure(user_email, "deriv", e)
+            get_session_pool().invalidate(get_deriv_token(user))
+            record_error(user_email, batch)
+            return None
+
+
+def tally_results(statuses, broker: str) -> dict:
+    """
+    Count one cycle's check results: None is a failed check, SKIPPED one an
+    open breaker never ran. Also counted under referee_check_outcomes_total.
+    """
+    results = {"success": 0, "breached": 0, "passed": 0, "error": 0, "skipped": 0}
+    for new_status in statuses:
+        if new_status is None:
+            results["error"] += 1
+            continue
+        if new_status == SKIPPED:
+            results["skipped"] += 1
+            continue
+        results["success"] += 1
+        if new_status == "breached":
+            results["breached"] += 1
+        elif new_status == "passed":
+            results["passed"] += 1
+    for outcome, key in (("synced", "success"), ("error", "error"), ("skipped", "skipped")):
+        CHECK_OUTCOMES.labels(broker, outcome).inc(results[key])
+    return results
+
 
+def format_summary(results: dict, total: int) -> str:
+    return (
+        f"Summary: {results['success']}/{total} synced | Breached: {results['breached']} | Passed: {results['passed']}"
+        f" | Errors: {results['error']} | Skipped: {results['skipped']}"
+    )
 
-async def check_all_traders():
-    """Fetch all Deriv users and evaluate each one."""
-    users = fetch_deriv_users()
+
+async def check_all_traders(max_concurrency: int = None, timeout: float = None):
+    """
+    Fetch all Deriv users and evaluate them concurrently.
+    At most max_concurrency traders are in flight; each is cancelled after timeout seconds.
+    """
+    max_concurrency = max_concurrency or config.REFEREE_MAX_CONCURRENCY
+    timeout = timeout or config.REFEREE_TRADER_TIMEOUT
+
+    cycle_started = time.monotonic()
+    users = await fetch_deriv_users()
+    CYCLE_USERS.set(len(users))
     
     if not users:
         print(f"{Fore.YELLOW}⚠ No active Deriv users found (broker_type='deriv', is_active=true, token present){Style.RESET_ALL}")
@@ -267,19 +747,21 @@ async def check_all_traders():
     
     print(f"{Fore.BLUE}Found {len(users)} active Deriv user(s) to evaluate{Style.RESET_ALL}\n")
     
-    results = {"success": 0, "breached": 0, "passed": 0, "error": 0}
+    # One daily P&L query for the whole cycle
+    daily_pnl_map = await fetch_daily_pnl_map([user.get("user_email") for user in users])
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    batch = WriteBatch(supabase, tracker=state_tracker)
+    statuses = await asyncio.gather(
+        *(check_trader_bounded(user, semaphore, timeout, batch, daily_pnl_map) for user in users)
+    )
+
+    # Flush all queued rows as bulk upserts
+    write_stats = await batch.flush_async()
+    print(f"{Fore.CYAN}✔ Flushed {write_stats['written']} row(s) to Supabase ({write_stats['skipped']} unchanged, {write_stats['failed']} failed){Style.RESET_ALL}")
     
-    for user in users:
-        success = await check_single_trader(user)
-        if success:
-            results["success"] += 1
-            new_status = user.get("challenge_status", "active")
-            if new_status == "breached":
-                results["breached"] += 1
-            elif new_status == "passed":
-                results["passed"] += 1
-        else:
-            results["error"] += 1
-        print()
+    results = tally_results(statuses, "deriv")
+    print()
     
-    print(f"{Fore.GREEN}{Style.BRIGHT}Summary: {results['success']}/{len(users)} synced | Breached: {results['breached']} | Passed: {results['passed']} | Errors: {results['error']}{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}{Style.BRIGHT}{format_summary(results, len(users))}{Style.RESET_ALL}")
+    CYCLE_DURATION.observe(time.monotonic() - cycle_started)
@@ -0,0 +1,148 @@
+"""
+Account Roster
+
+In-memory copy of user_accounts kept current with delta syncs instead of
+re-selecting every row each cycle:
+
+- First sync (and every ROSTER_FULL_SYNC_INTERVAL) pages through all rows
+- Other syncs fetch only rows with updated_at >= the last watermark
+- broker_credentials JSON is parsed once, when a row is ingested
+- Rows that turn inactive arrive in the delta and are dropped
+- Rows whose challenge_status goes from breached/passed back to active
+  (a reset challenge) are collected for take_restarted()
+
+Delta sync relies on updated_at being bumped on every update; see the
+user_accounts_updated_at trigger in supabase_schema.sql. The periodic
+full sync also catches hard-deleted rows.
+"""
+
+import json
+import time
+from typing import Optional
+
+from colorama import Fore, Style
+
+from src import config
+from src.db import run_db
+
+# Columns the engine needs; avoids shipping unrelated columns every sync
+ROSTER_COLUMNS = (
+    "user_email, broker_type, broker_credentials, deriv_api_token, deriv_account_id, "
+    "account_size, max_drawdown_limit, profit_target, daily_loss_limit, account_tier, "
+    "challenge_status, evaluation_started_at, is_active, updated_at"
+)
+
+PAGE_SIZE = 1000
+
+
+class AccountRoster:
+    """Active user_accounts rows keyed by user_email."""
+
+    def __init__(self, client, columns: str = ROSTER_COLUMNS):
+        self.client = client
+        self.columns = columns
+        self.accounts: dict[str, dict] = {}
+        self.watermark: Optional[str] = None
+        self.last_full_sync = 0.0
+        self.restarted: dict[str, dict] = {}
+
+    def sync(self) -> None:
+        """Bring the roster up to date (full load or delta)."""
+        full = self._full_sync_due()
+        try:
+            rows = self._fetch(since=None if full else self.watermark)
+        except Exception as e:
+            if self._fall_back_columns(e):
+                return self.sync()
+            return
+        self._apply(rows, full)
+
+    async def sync_async(self) -> None:
+        """sync() with the PostgREST pages fetched on the database thread pool."""
+        full = self._full_sync_due()
+        try:
+            rows = await run_db(self._fetch, None if full else self.watermark)
+        except Exception as e:
+            if self._fall_back_columns(e):
+                return await self.sync_async()
+            return
+        # Merged on the event loop, where checks read (and annotate) the same dicts
+        self._apply(rows, full)
+
+    def _full_sync_due(self) -> bool:
+        return self.watermark is None or time.monotonic() - self.last_full_sync >= config.ROSTER_FULL_SYNC_INTERVAL
+
+    def _fall_back_columns(self, e: Exception) -> bool:
+        """Log a failed fetch; True if it should be retried with select("*")."""
+        # 42703 = undefined_column
+        if self.columns != "*" and ("42703" in str(e) or "does not exist" in str(e)):
+            # Older schemas may lack optional columns (account_tier, daily_loss_limit, evaluation_started_at)
+            print(f"{Fore.YELLOW}⚠ Roster column select failed, falling back to *: {e}{Style.RESET_ALL}")
+            self.columns = "*"
+            return True
+        print(f"{Fore.RED}⚠ Failed to sync account roster: {e}{Style.RESET_ALL}")
+        return False
+
+    def _apply(self, rows: list, full: bool) -> None:
+        if full:
+            previous = self.accounts
+            self.accounts = {}
+            for row in rows:
+                self._ingest(row, previous.get(row.get("user_email")))
+            self.last_full_sync = time.monotonic()
+        else:
+            for row in rows:
+                self._ingest(row, self.accounts.get(row.get("user_email")))
+
+    def _fetch(self, since: Optional[str]) -> list:
+        rows = []
+        offset = 0
+        while True:
+            query = self.client.table("user_accounts").select(self.columns)
+            if since is None:
+                query = query.eq("is_active", True)
+            else:
+                # Includes deactivated rows so they can be dropped
+                query = query.gte("updated_at", since)
+            response = query.order("id").range(offset, offset + PAGE_SIZE - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            offset += PAGE_SIZE
+
+    def _ingest(self, row: dict, existing: Optional[dict]) -> None:
+        """Merge a fetched row into the roster, keeping the existing dict (and its runtime fields)."""
+        user_email = row.get("user_email")
+        updated_at = row.get("updated_at")
+        if updated_at and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+
+        if not row.get("is_active"):
+            self.accounts.pop(user_email, None)
+            return
+
+        credentials = row.get("broker_credentials")
+        if isinstance(credentials, str):
+            try:
+                row["broker_credentials"] = json.loads(credentials)
+            except ValueError:
+                row["broker_credentials"] = {}
+
+        if existing is not None:
+            if existing.get("challenge_status") in ["breached", "passed"] and row.get("challenge_status") == "active":
+                self.restarted[user_email] = dict(existing)
+            existing.update(row)
+            row = existing
+        self.accounts[user_email] = row
+
+    def take_restarted(self) -> list:
+        """Rows (as they were before the reset) whose challenge was reset since the last call."""
+        restarted, self.restarted = self.restarted, {}
+        return list(restarted.values())
+
+    def active(self, broker_type: str = None) -> list:
+        """Active accounts, optionally filtered by broker_type."""
+        if broker_type is None:
+            return list(self.accounts.values())
+        return [u for u in self.accounts.values() if (u.get("broker_type") or "deriv") == broker_type]
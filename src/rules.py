@@ -0,0 +1,362 @@
+"""
+Challenge Rule Engine
+
+Each account tier declares its challenge rules as data, stored in the
+challenge_rules table (tier -> JSONB list of rules):
+
+    [
+        {"type": "max_drawdown", "pct": 10},
+        {"type": "daily_loss", "pct": 5},
+        {"type": "trailing_drawdown", "amount": 800},
+        {"type": "intraday_drawdown", "pct": 4},
+        {"type": "max_lots", "lots": 5},
+        {"type": "profit_target", "pct": 8},
+        {"type": "min_trading_days", "days": 5}
+    ]
+
+Limits are given as "amount" (currency) or "pct" (of account_size). If
+neither is given, the user's own column is used (max_drawdown_limit,
+daily_loss_limit, profit_target). Tiers without a declared rule set keep
+using evaluate_challenge.
+
+trailing_drawdown and intraday_drawdown read the high-water mark and
+intraday peak kept by the local equity store (src/equity_store.py).
+min_trading_days reads the distinct days with closed trades in
+profit_table since the evaluation started (TradingDayCounter, loaded
+only while some tier uses the rule). max_lots reads the open volume
+reported by the broker adapter; brokers without lot sizes (Deriv)
+never trip it.
+
+A rule set is compiled once per tier into a tuple of closures with every
+constant bound, so evaluating an account never re-reads the definitions.
+Threshold rules also compile a margin: how far the account is from the
+rule firing, in currency, which the scheduler uses to check accounts near
+a threshold more often.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from colorama import Fore, Style
+
+from src import config
+
+PAGE_SIZE = 1000
+
+
+@dataclass
+class RuleContext:
+    """Per-account inputs for rule evaluation."""
+    equity: float
+    account_size: float
+    daily_pnl: float = 0.0
+    high_water_mark: Optional[float] = None
+    day_high_equity: Optional[float] = None
+    trading_days: int = 0
+    open_lots: Optional[float] = None
+    max_drawdown_limit: float = 0.0
+    daily_loss_limit: float = 0.0
+    profit_target: float = 0.0
+
+
+# A compiled check returns a reason string when it fires, else None
+Check = Callable[[RuleContext], Optional[str]]
+# A compiled margin returns the distance to the rule firing (<= 0 once it has), or None if unknown
+Margin = Callable[[RuleContext], Optional[float]]
+
+
+def _limit(rule: dict, column: str) -> Callable[[RuleContext], float]:
+    """Compile a rule's limit into a function of the context."""
+    if "amount" in rule:
+        amount = float(rule["amount"])
+        return lambda ctx: amount
+    if "pct" in rule:
+        fraction = float(rule["pct"]) / 100.0
+        return lambda ctx: ctx.account_size * fraction
+    return lambda ctx: getattr(ctx, column)
+
+
+def _build_max_drawdown(rule: dict) -> tuple[str, Check, Optional[Margin]]:
+    limit = _limit(rule, "max_drawdown_limit")
+
+    def check(ctx: RuleContext) -> Optional[str]:
+        breach_threshold = ctx.account_size - limit(ctx)
+        if ctx.equity < breach_threshold:
+            return f"Equity ${ctx.equity:.2f} < Breach Level ${breach_threshold:.2f}"
+        return None
+
+    def margin(ctx: RuleContext) -> Optional[float]:
+        return ctx.equity - (ctx.account_size - limit(ctx))
+    return "breach", check, margin
+
+
+def _build_daily_loss(rule: dict) -> tuple[str, Check, Optional[Margin]]:
+    limit = _limit(rule, "daily_loss_limit")
+
+    def check(ctx: RuleContext) -> Optional[str]:
+        max_loss = limit(ctx)
+        if max_loss > 0 and ctx.daily_pnl < -max_loss:
+            return f"Daily P&L ${ctx.daily_pnl:.2f} exceeds daily loss limit ${max_loss:.2f}"
+        return None
+
+    def margin(ctx: RuleContext) -> Optional[float]:
+        max_loss = limit(ctx)
+        return ctx.daily_pnl + max_loss if max_loss > 0 else None
+    return "breach", check, margin
+
+
+def _build_trailing_drawdown(rule: dict) -> tuple[str, Check, Optional[Margin]]:
+    limit = _limit(rule, "max_drawdown_limit")
+
+    def check(ctx: RuleContext) -> Optional[str]:
+        high_water_mark = max(ctx.high_water_mark or ctx.account_size, ctx.account_size)
+        breach_threshold = high_water_mark - limit(ctx)
+        if ctx.equity < breach_threshold:
+            return f"Equity ${ctx.equity:.2f} < Trailing Breach Level ${breach_threshold:.2f} (HWM ${high_water_mark:.2f})"
+        return None
+
+    def margin(ctx: RuleContext) -> Optional[float]:
+        return ctx.equity - (max(ctx.high_water_mark or ctx.account_size, ctx.account_size) - limit(ctx))
+    return "breach", check, margin
+
+
+def _build_intraday_drawdown(rule: dict) -> tuple[str, Check, Optional[Margin]]:
+    limit = _limit(rule, "daily_loss_limit")
+
+    def check(ctx: RuleContext) -> Optional[str]:
+        if ctx.day_high_equity is None:
+            return None
+        max_drop = limit(ctx)
+        breach_threshold = ctx.day_high_equity - max_drop
+        if max_drop > 0 and ctx.equity < breach_threshold:
+            return f"Equity ${ctx.equity:.2f} < Intraday Breach Level ${breach_threshold:.2f} (Day High ${ctx.day_high_equity:.2f})"
+        return None
+
+    def margin(ctx: RuleContext) -> Optional[float]:
+        max_drop = limit(ctx)
+        if ctx.day_high_equity is None or max_drop <= 0:
+            return None
+        return ctx.equity - (ctx.day_high_equity - max_drop)
+    return "breach", check, margin
+
+
+def _build_max_lots(rule: dict) -> tuple[str, Check, Optional[Margin]]:
+    max_lots = float(rule["lots"])
+
+    def check(ctx: RuleContext) -> Optional[str]:
+        if ctx.open_lots is not None and ctx.open_lots > max_lots:
+            return f"Open lots {ctx.open_lots:g} > Max Lots {max_lots:g}"
+        return None
+    return "breach", check, None
+
+
+def _build_profit_target(rule: dict) -> tuple[str, Check, Optional[Margin]]:
+    target = _limit(rule, "profit_target")
+
+    def check(ctx: RuleContext) -> Optional[str]:
+        pass_threshold = ctx.account_size + target(ctx)
+        if ctx.equity >= pass_threshold:
+            return f"Equity ${ctx.equity:.2f} >= Target ${pass_threshold:.2f}"
+        return None
+
+    def margin(ctx: RuleContext) -> Optional[float]:
+        return ctx.account_size + target(ctx) - ctx.equity
+    return "pass", check, margin
+
+
+def _build_min_trading_days(rule: dict) -> tuple[str, Check, Optional[Margin]]:
+    days = int(rule["days"])
+
+    def check(ctx: RuleContext) -> Optional[str]:
+        if ctx.trading_days >= days:
+            return f"{ctx.trading_days} trading day(s) >= {days}"
+        return None
+    return "pass_gate", check, None
+
+
+RULE_BUILDERS = {
+    "max_drawdown": _build_max_drawdown,
+    "daily_loss": _build_daily_loss,
+    "trailing_drawdown": _build_trailing_drawdown,
+    "intraday_drawdown": _build_intraday_drawdown,
+    "max_lots": _build_max_lots,
+    "profit_target": _build_profit_target,
+    "min_trading_days": _build_min_trading_days,
+}
+
+
+class CompiledRules:
+    """A tier's rule set compiled to bound check functions."""
+
+    def __init__(self, breach_checks: tuple, pass_checks: tuple, pass_gates: tuple,
+                 breach_margins: tuple = (), pass_margins: tuple = ()):
+        self.breach_checks = breach_checks
+        self.pass_checks = pass_checks
+        self.pass_gates = pass_gates
+        self.breach_margins = breach_margins
+        self.pass_margins = pass_margins
+
+    def evaluate(self, ctx: RuleContext, current_status: str = "active") -> tuple[str, str]:
+        """Return (status, reason), with the same precedence as evaluate_challenge."""
+        if current_status in ["breached", "passed"]:
+            return current_status, "Already evaluated"
+        if ctx.account_size == 0:
+            return "active", "No challenge parameters"
+
+        for check in self.breach_checks:
+            reason = check(ctx)
+            if reason:
+                return "breached", reason
+
+        for check in self.pass_checks:
+            reason = check(ctx)
+            if reason:
+                # Every gate (e.g. minimum trading days) must also be met
+                if all(gate(ctx) for gate in self.pass_gates):
+                    return "passed", reason
+                break
+
+        return "active", f"Equity ${ctx.equity:.2f} (all {len(self.breach_checks)} breach rule(s) clear)"
+
+    def margin(self, ctx: RuleContext) -> Optional[float]:
+        """Distance to the nearest rule that would end the challenge, or None if no rule has one."""
+        margins = [margin(ctx) for margin in self.breach_margins]
+        # A pass target only counts once every gate is met
+        if all(gate(ctx) for gate in self.pass_gates):
+            margins += [margin(ctx) for margin in self.pass_margins]
+        margins = [margin for margin in margins if margin is not None]
+        return min(margins) if margins else None
+
+
+def compile_rules(definition: list) -> CompiledRules:
+    """Compile a list of rule dicts. Raises ValueError on unknown rule types."""
+    buckets = {"breach": [], "pass": [], "pass_gate": []}
+    margins = {"breach": [], "pass": [], "pass_gate": []}
+    for rule in definition:
+        builder = RULE_BUILDERS.get(rule.get("type"))
+        if not builder:
+            raise ValueError(f"Unsupported rule type: {rule.get('type')}")
+        kind, check, margin = builder(rule)
+        buckets[kind].append(check)
+        if margin is not None:
+            margins[kind].append(margin)
+    return CompiledRules(
+        tuple(buckets["breach"]), tuple(buckets["pass"]), tuple(buckets["pass_gate"]),
+        tuple(margins["breach"]), tuple(margins["pass"]),
+    )
+
+
+def build_context(user: dict, equity: float, daily_pnl: float = 0.0) -> RuleContext:
+    """Build a RuleContext from a user_accounts record plus live values."""
+    return RuleContext(
+        equity=equity,
+        account_size=float(user.get("account_size", 0)),
+        daily_pnl=daily_pnl,
+        high_water_mark=user.get("high_water_mark"),
+        day_high_equity=user.get("day_high_equity"),
+        trading_days=int(user.get("trading_days") or 0),
+        open_lots=user.get("open_lots"),
+        max_drawdown_limit=float(user.get("max_drawdown_limit") or 0),
+        daily_loss_limit=float(user.get("daily_loss_limit") or 0),
+        profit_target=float(user.get("profit_target") or 0),
+    )
+
+
+class RuleBook:
+    """Compiled rule sets per account tier, reloaded from challenge_rules periodically."""
+
+    def __init__(self, client=None):
+        self.client = client
+        self.tiers: dict[str, CompiledRules] = {}
+        self.rule_types: set = set()
+        self.loaded_at = 0.0
+
+    def uses(self, rule_type: str) -> bool:
+        """True if any loaded tier declares a rule of this type."""
+        if not self.loaded_at:
+            self.refresh()
+        return rule_type in self.rule_types
+
+    def load(self, rows: list) -> None:
+        """Compile rows of {"tier": ..., "rules": [...]}; bad rule sets are skipped."""
+        tiers = {}
+        rule_types = set()
+        for row in rows:
+            tier = row.get("tier")
+            try:
+                rules = row.get("rules") or []
+                if isinstance(rules, str):
+                    rules = json.loads(rules)
+                tiers[tier] = compile_rules(rules)
+                rule_types.update(rule.get("type") for rule in rules)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"{Fore.YELLOW}⚠ Invalid rules for tier '{tier}': {e}{Style.RESET_ALL}")
+        self.tiers = tiers
+        self.rule_types = rule_types
+        self.loaded_at = time.monotonic()
+
+    def refresh(self, force: bool = False) -> None:
+        """Reload from Supabase once RULES_REFRESH_INTERVAL has elapsed."""
+        if self.client is None:
+            return
+        if not force and time.monotonic() - self.loaded_at < config.RULES_REFRESH_INTERVAL:
+            return
+        try:
+            response = self.client.table("challenge_rules").select("tier, rules").execute()
+            self.load(response.data or [])
+        except Exception as e:
+            # Keep the previous rule sets; retry after the next interval
+            self.loaded_at = time.monotonic()
+            print(f"{Fore.YELLOW}⚠ Failed to load challenge_rules: {e}{Style.RESET_ALL}")
+
+    def for_user(self, user: dict) -> Optional[CompiledRules]:
+        """
+        Compiled rules for a user's tier, or None if the tier declares none.
+        Loads on first use; periodic reloads happen off the event loop at
+        roster sync (see referee.sync_reference_data).
+        """
+        if not self.loaded_at:
+            self.refresh()
+        return self.tiers.get(user.get("account_tier"))
+
+
+class TradingDayCounter:
+    """Distinct trading days per account, from the trading_days_by_user RPC."""
+
+    def __init__(self, client=None):
+        self.client = client
+        self.days: dict[str, int] = {}
+        self.loaded_at = 0.0
+
+    def refresh(self, force: bool = False) -> None:
+        """Reload once TRADING_DAYS_REFRESH_INTERVAL has elapsed; keeps the previous counts on failure."""
+        if self.client is None:
+            return
+        if not force and time.monotonic() - self.loaded_at < config.TRADING_DAYS_REFRESH_INTERVAL:
+            return
+        self.loaded_at = time.monotonic()
+        days = {}
+        offset = 0
+        try:
+            while True:
+                response = (
+                    self.client.rpc("trading_days_by_user", {})
+                    .order("user_email").range(offset, offset + PAGE_SIZE - 1).execute()
+                )
+                rows = response.data or []
+                for row in rows:
+                    days[row["user_email"]] = int(row.get("trading_days") or 0)
+                if len(rows) < PAGE_SIZE:
+                    break
+                offset += PAGE_SIZE
+        except Exception as e:
+            print(f"{Fore.YELLOW}⚠ Failed to load trading days: {e}{Style.RESET_ALL}")
+            return
+        self.days = days
+
+    def apply(self, users) -> None:
+        """Set trading_days on user records (read by build_context)."""
+        for user in users:
+            user["trading_days"] = self.days.get(user.get("user_email"), 0)
@@ -0,0 +1,233 @@
+"""
+Risk-Proximity Scheduler
+
+Replaces the fixed 30s sweep with a priority queue of per-trader due
+times. Each trader's next check is derived from:
+
+- distance from equity to the nearest breach/pass threshold of the
+  account's tier rules (closer = sooner; see referee.risk_margin)
+- recent equity volatility (estimated time-to-breach)
+- open position count (no positions and flat equity = idle lane)
+
+Every active account is scheduled whatever its broker: checks go through
+the dispatcher's adapters, bounded per broker family like the poll loop
+(BROKER_CONCURRENCY). Breached/passed accounts are not scheduled at all;
+they rejoin the queue if a roster refresh shows them active again. Due times are
+jittered so connections do not burst together.
+"""
+
+import asyncio
+import heapq
+import random
+import time
+from collections import deque
+
+from colorama import Fore, Style
+
+from src import config
+from src.dispatcher import broker_family, check_account_bounded
+from src.metrics import SCHEDULING_LAG
+from src.referee import (
+    fetch_active_accounts,
+    fetch_daily_pnl_map,
+    risk_margin,
+    state_tracker,
+    supabase,
+)
+from src.writes import WriteBatch
+
+TERMINAL_STATUSES = ("breached", "passed")
+
+
+class ScheduledTrader:
+    """Queue entry plus recent equity samples for one trader."""
+
+    def __init__(self, user: dict):
+        self.user = user
+        self.user_email = user.get("user_email")
+        self.samples: deque = deque(maxlen=config.SCHEDULE_VOLATILITY_SAMPLES)  # (monotonic, equity)
+        self.due = 0.0
+        self.generation = 0
+        self.in_flight = False
+
+    def record(self) -> None:
+        equity = self.user.get("last_equity")
+        if equity is not None:
+            self.samples.append((time.monotonic(), float(equity)))
+
+    def volatility(self) -> float:
+        """Mean absolute equity change per second over recent samples."""
+        if len(self.samples) < 2:
+            return 0.0
+        total_move = 0.0
+        for (t0, e0), (t1, e1) in zip(self.samples, list(self.samples)[1:]):
+            total_move += abs(e1 - e0)
+        elapsed = self.samples[-1][0] - self.samples[0][0]
+        return total_move / elapsed if elapsed > 0 else 0.0
+
+    def is_idle(self) -> bool:
+        """No open positions and equity flat across all recent samples."""
+        if self.user.get("open_positions"):
+            return False
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        first = self.samples[0][1]
+        return all(abs(equity - first) < 0.01 for _, equity in self.samples)
+
+
+def next_interval(trader: ScheduledTrader) -> float:
+    """Seconds until a trader's next check, before jitter."""
+    user = trader.user
+    equity = user.get("last_equity")
+    account_size = float(user.get("account_size", 0) or 0)
+
+    if equity is None or account_size == 0:
+        return config.SCHEDULE_MAX_INTERVAL
+    if trader.is_idle():
+        return config.SCHEDULE_IDLE_INTERVAL
+
+    # Same tier rules the evaluation uses; no threshold at all means no urgency
+    margin = risk_margin(user, equity, user.get("daily_pnl") or 0.0)
+    if margin is None:
+        return config.SCHEDULE_MAX_INTERVAL
+    margin = max(0.0, margin)
+
+    # Linear in distance to the nearest threshold, as a fraction of account size
+    closeness = min(1.0, (margin / account_size) / config.SCHEDULE_RISK_BAND)
+    interval = config.SCHEDULE_MIN_INTERVAL + (config.SCHEDULE_MAX_INTERVAL - config.SCHEDULE_MIN_INTERVAL) * closeness
+
+    # Check several times within the estimated time-to-threshold
+    volatility = trader.volatility()
+    if volatility > 0:
+        interval = min(interval, (margin / volatility) / 4)
+
+    return max(config.SCHEDULE_MIN_INTERVAL, interval)
+
+
+class TraderScheduler:
+    """
+    Priority-queue driven referee loop. max_concurrency bounds families
+    that BROKER_CONCURRENCY does not list.
+    """
+
+    def __init__(self, max_concurrency: int = None, timeout: float = None):
+        self.max_concurrency = max_concurrency or config.REFEREE_MAX_CONCURRENCY
+        self.timeout = timeout or config.REFEREE_TRADER_TIMEOUT
+        self.traders: dict[str, ScheduledTrader] = {}
+        self.queue: list = []  # (due, generation, user_email)
+        self.batch = WriteBatch(supabase, tracker=state_tracker)
+        self.daily_pnl_map: dict = {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._tasks: set = set()
+
+    def schedule(self, trader: ScheduledTrader, delay: float) -> None:
+        """Push a trader onto the queue with jitter applied."""
+        jitter = delay * config.SCHEDULE_JITTER
+        trader.due = time.monotonic() + max(0.0, delay + random.uniform(-jitter, jitter))
+        trader.generation += 1
+        heapq.heappush(self.queue, (trader.due, trader.generation, trader.user_email))
+
+    def _semaphore(self, family: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(family)
+        if semaphore is None:
+            limit = config.BROKER_CONCURRENCY.get(family, self.max_concurrency)
+            semaphore = self._semaphores[family] = asyncio.Semaphore(max(1, limit))
+        return semaphore
+
+    async def sync_roster(self) -> None:
+        """Add new active traders, drop removed ones, refresh parameters."""
+        users = await fetch_active_accounts()
+        seen = set()
+        for user in users:
+            user_email = user.get("user_email")
+            seen.add(user_email)
+            trader = self.traders.get(user_email)
+            if trader is None:
+                if user.get("challenge_status") in TERMINAL_STATUSES:
+                    continue
+                trader = ScheduledTrader(user)
+                self.traders[user_email] = trader
+                # Spread first checks across one max interval
+                self.schedule(trader, random.uniform(0, config.SCHEDULE_MAX_INTERVAL))
+                continue
+            if user.get("challenge_status") in TERMINAL_STATUSES:
+                self._drop(user_email)
+                continue
+            # Keep runtime observations, take fresh parameters from the database
+            observed = {k: trader.user[k] for k in ("last_equity", "last_balance", "daily_pnl", "open_positions") if k in trader.user}
+            trader.user = {**user, **observed}
+
+        for user_email in list(self.traders):
+            if user_email not in seen:
+                self._drop(user_email)
+
+        self.daily_pnl_map = await fetch_daily_pnl_map(list(seen))
+
+    def _drop(self, user_email: str) -> None:
+        trader = self.traders.pop(user_email, None)
+        if trader:
+            trader.generation += 1  # invalidates any queued entry
+
+    async def _check(self, trader: ScheduledTrader) -> None:
+        trader.in_flight = True
+        try:
+            await check_account_bounded(
+                trader.user, self._semaphore(broker_family(trader.user)), self.timeout, self.batch, self.daily_pnl_map
+            )
+        finally:
+            trader.in_flight = False
+
+        if trader.user_email not in self.traders:
+            return
+        if trader.user.get("challenge_status") in TERMINAL_STATUSES:
+            self._drop(trader.user_email)
+            return
+        trader.record()
+        self.schedule(trader, next_interval(trader))
+
+    def _dispatch_due(self) -> None:
+        now = time.monotonic()
+        while self.queue and self.queue[0][0] <= now:
+            due, generation, user_email = heapq.heappop(self.queue)
+            trader = self.traders.get(user_email)
+            if trader is None or trader.generation != generation or trader.in_flight:
+                continue
+            SCHEDULING_LAG.observe(now - due)
+            task = asyncio.create_task(self._check(trader))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self) -> None:
+        if not len(self.batch) and not self.batch.skipped:
+            return
+        # In-flight checks keep queuing onto the same batch; flush_async() swaps its pending rows
+        stats = await self.batch.flush_async()
+        print(f"{Fore.CYAN}✔ Flushed {stats['written']} row(s) ({stats['skipped']} unchanged, {stats['failed']} failed){Style.RESET_ALL}")
+
+    async def run(self) -> None:
+        """Main scheduler loop."""
+        last_roster_sync = 0.0
+        last_flush = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                if now - last_roster_sync >= config.SCHEDULE_ROSTER_INTERVAL:
+                    await self.sync_roster()
+                    last_roster_sync = now
+                    print(f"{Fore.BLUE}Scheduling {len(self.traders)} active account(s){Style.RESET_ALL}")
+
+                self._dispatch_due()
+
+                if now - last_flush >= config.SCHEDULE_FLUSH_INTERVAL:
+                    await self._flush()
+                    last_flush = now
+
+                # Sleep until the next due trader, but wake at least every second
+                wait = 1.0
+                if self.queue:
+                    wait = min(wait, max(0.0, self.queue[0][0] - time.monotonic()))
+                await asyncio.sleep(wait)
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            await self._flush()
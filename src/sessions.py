@@ -0,0 +1,214 @@
+"""
+Deriv Session Pool
+
+Keeps one long-lived, authorized DerivAPI connection per token so a
+steady-state referee cycle only pays for data requests, not for a
+WebSocket/TLS handshake and authorize call per trader.
+
+- Sessions are created lazily on first acquire() and stay authorized
+- A background task pings every session (DERIV_SESSION_PING_CONCURRENCY
+  at a time) and evicts idle ones
+- Dropped sessions reconnect with exponential backoff
+"""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Optional
+
+from colorama import Fore, Style
+
+from src import config
+from src.metrics import time_stage
+
+if TYPE_CHECKING:
+    from deriv_api import DerivAPI
+
+
+class DerivSession:
+    """A single authorized Deriv connection for one token."""
+
+    def __init__(self, token: str, app_id: int):
+        self.token = token
+        self.app_id = app_id
+        self.api: Optional["DerivAPI"] = None
+        self.authorize_data: dict = {}
+        self.last_used = time.monotonic()
+        self.healthy = False
+        self.failures = 0
+        self.retry_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def account_id(self) -> Optional[str]:
+        return self.authorize_data.get("loginid")
+
+    @property
+    def is_virtual(self) -> bool:
+        return self.authorize_data.get("is_virtual") == 1
+
+    def _is_open(self) -> bool:
+        """Best-effort check that the underlying WebSocket is still open."""
+        if not self.api or not self.healthy:
+            return False
+        ws = getattr(self.api, "wsconnection", None)
+        if ws is not None and getattr(ws, "closed", False):
+            return False
+        return True
+
+    async def ensure(self) -> "DerivAPI":
+        """
+        Return an authorized DerivAPI, reconnecting if the session dropped.
+
+        Raises ConnectionError while the session is backing off after a failure.
+        """
+        async with self._lock:
+            if self._is_open():
+                return self.api
+
+            now = time.monotonic()
+            if now < self.retry_at:
+                raise ConnectionError(
+                    f"Deriv session ...{self.token[-4:]} backing off for {self.retry_at - now:.0f}s"
+                )
+
+            await self._close_api()
+            try:
+                from deriv_api import DerivAPI  # deferred: only the engine needs it
+                self.api = DerivAPI(endpoint=config.DERIV_ENDPOINT, app_id=self.app_id)
+                with time_stage("deriv_connect"):
+                    await self.api.connected
+                with time_stage("deriv_authorize"):
+                    auth_response = await self.api.authorize(self.token)
+                self.authorize_data = auth_response.get("authorize", {})
+                self.healthy = True
+                self.failures = 0
+                self.retry_at = 0.0
+                return self.api
+            except Exception:
+                await self._close_api()
+                self.failures += 1
+                backoff = min(config.DERIV_SESSION_MAX_BACKOFF, 2 ** self.failures)
+                self.retry_at = time.monotonic() + backoff
+                raise
+
+    async def ping(self) -> bool:
+        """Send a keepalive ping. Marks the session unhealthy on failure."""
+        if not self._is_open():
+            return False
+        try:
+            await asyncio.wait_for(self.api.ping(), timeout=config.DERIV_SESSION_PING_TIMEOUT)
+            return True
+        except Exception:
+            self.healthy = False
+            return False
+
+    def invalidate(self) -> None:
+        """Force a reconnect on the next ensure()."""
+        self.healthy = False
+
+    async def _close_api(self) -> None:
+        if self.api:
+            try:
+                await self.api.disconnect()
+            except:
+                pass
+        self.api = None
+        self.healthy = False
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._close_api()
+
+
+class DerivSessionPool:
+    """Pool of DerivSession objects keyed by API token."""
+
+    def __init__(self, app_id: int):
+        self.app_id = app_id
+        self.sessions: dict[str, DerivSession] = {}
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    async def acquire(self, token: str) -> DerivSession:
+        """Get an authorized session for token, creating or reconnecting as needed."""
+        self._ensure_maintenance()
+        session = self.sessions.get(token)
+        if session is None:
+            session = DerivSession(token, self.app_id)
+            self.sessions[token] = session
+        session.last_used = time.monotonic()
+        await session.ensure()
+        return session
+
+    def invalidate(self, token: str) -> None:
+        """Mark a token's session as broken so it reconnects next time."""
+        session = self.sessions.get(token)
+        if session:
+            session.invalidate()
+
+    async def evict(self, token: str) -> None:
+        """Close and drop a token's session."""
+        session = self.sessions.pop(token, None)
+        if session:
+            await session.close()
+
+    def _ensure_maintenance(self) -> None:
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._maintain())
+
+    async def _maintain(self) -> None:
+        """Ping live sessions, reconnect dropped ones, and evict idle ones."""
+        while True:
+            await asyncio.sleep(config.DERIV_SESSION_PING_INTERVAL)
+            now = time.monotonic()
+            # One slow or dead connection must not hold up the rest of the sweep
+            semaphore = asyncio.Semaphore(config.DERIV_SESSION_PING_CONCURRENCY)
+            await asyncio.gather(*(
+                self._maintain_session(token, session, now, semaphore)
+                for token, session in list(self.sessions.items())
+            ))
+
+    async def _maintain_session(self, token: str, session: DerivSession, now: float, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            if self.sessions.get(token) is not session:
+                return  # evicted or replaced while waiting
+            if now - session.last_used > config.DERIV_SESSION_IDLE_TTL:
+                print(f"{Fore.MAGENTA}[pool] Evicting idle session ...{token[-4:]}{Style.RESET_ALL}")
+                await self.evict(token)
+                return
+            if await session.ping():
+                return
+            if now >= session.retry_at:
+                try:
+                    await session.ensure()
+                    print(f"{Fore.GREEN}[pool] Reconnected session ...{token[-4:]}{Style.RESET_ALL}")
+                except Exception as e:
+                    print(f"{Fore.YELLOW}[pool] ⚠ Reconnect failed for ...{token[-4:]}: {e}{Style.RESET_ALL}")
+
+    async def close_all(self) -> None:
+        """Stop maintenance and close every session."""
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        for token in list(self.sessions):
+            await self.evict(token)
+
+
+_pools: dict[int, DerivSessionPool] = {}
+
+
+def get_session_pool(app_id: int = None) -> DerivSessionPool:
+    """Get the shared session pool for a Deriv app id."""
+    if not app_id:
+        config.validate_deriv()
+        app_id = config.DERIV_APP_ID
+    pool = _pools.get(app_id)
+    if pool is None:
+        pool = DerivSessionPool(app_id)
+        _pools[app_id] = pool
+    return pool
+
+
+async def close_all_pools() -> None:
+    """Close every session pool (call on engine shutdown)."""
+    for pool in list(_pools.values()):
+        await pool.close_all()
@@ -0,0 +1,160 @@
+"""
+Engine Sharding
+
+Lets several engine processes split the active accounts between them,
+so each account is evaluated by exactly one worker.
+
+- Accounts map to one of ENGINE_SHARD_COUNT shards by a stable hash of user_email
+- Workers heartbeat into engine_workers; the live set decides who should own
+  each shard (rendezvous hashing, so a join/leave only moves its share)
+- Ownership is a time-limited lease in engine_shard_leases, claimed with a
+  conditional upsert, so a shard is never held by two workers at once
+- A worker evaluates only shards whose lease it holds; a dead worker's
+  leases expire after ENGINE_LEASE_TTL and are picked up by the survivors
+
+See the engine_* tables and functions in supabase_schema.sql.
+"""
+
+import asyncio
+import hashlib
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+
+from colorama import Fore, Style
+
+from src import config
+from src.db import execute, run_db
+
+
+def shard_of(user_email: str, shard_count: int = None) -> int:
+    """Stable shard number for an account (identical in every process)."""
+    shard_count = shard_count or config.ENGINE_SHARD_COUNT
+    digest = hashlib.md5((user_email or "").encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def _weight(worker_id: str, shard: int) -> int:
+    digest = hashlib.md5(f"{worker_id}:{shard}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _scalar(row):
+    """PostgREST returns SETOF scalars either bare or wrapped in a one-key dict."""
+    if isinstance(row, dict):
+        return next(iter(row.values()))
+    return row
+
+
+class ShardCoordinator:
+    """Heartbeats this worker and keeps its shard leases current."""
+
+    def __init__(self, client, worker_id: str = None):
+        self.client = client
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.shard_count = config.ENGINE_SHARD_COUNT
+        self.live_workers: list = []
+        self.owned: set = set()
+        self.lease_valid_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def preferred_shards(self) -> set:
+        """Shards this worker should own given the current live workers."""
+        workers = self.live_workers or [self.worker_id]
+        return {
+            shard for shard in range(self.shard_count)
+            if max(workers, key=lambda w: _weight(w, shard)) == self.worker_id
+        }
+
+    def tick(self) -> None:
+        """Heartbeat, then claim/renew preferred shards and release the rest."""
+        ttl = int(config.ENGINE_LEASE_TTL)
+        started = time.monotonic()
+        try:
+            response = self.client.rpc("engine_heartbeat", {
+                "p_worker_id": self.worker_id, "p_ttl_seconds": ttl
+            }).execute()
+            live = sorted(_scalar(row) for row in (response.data or []))
+            if self.worker_id not in live:
+                live.append(self.worker_id)
+            if live != self.live_workers:
+                print(f"{Fore.MAGENTA}[shard] {len(live)} live worker(s): {', '.join(live)}{Style.RESET_ALL}")
+            self.live_workers = live
+
+            preferred = self.preferred_shards()
+            to_release = sorted(self.owned - preferred)
+            if to_release:
+                self.client.rpc("release_shards", {
+                    "p_worker_id": self.worker_id, "p_shards": to_release
+                }).execute()
+
+            response = self.client.rpc("claim_shards", {
+                "p_worker_id": self.worker_id, "p_shards": sorted(preferred), "p_ttl_seconds": ttl
+            }).execute()
+            owned = {int(_scalar(row)) for row in (response.data or [])}
+            if owned != self.owned:
+                print(f"{Fore.MAGENTA}[shard] Owning {len(owned)}/{self.shard_count} shard(s) ({len(preferred)} preferred){Style.RESET_ALL}")
+            self.owned = owned
+            # Leases were granted no earlier than `started`; keep a safety margin
+            self.lease_valid_until = started + ttl - config.ENGINE_HEARTBEAT_INTERVAL
+        except Exception as e:
+            print(f"{Fore.YELLOW}[shard] ⚠ Lease refresh failed: {e}{Style.RESET_ALL}")
+
+    def owns(self, user_email: str) -> bool:
+        """True if this worker currently holds the lease for the account's shard."""
+        if time.monotonic() >= self.lease_valid_until:
+            return False
+        return shard_of(user_email, self.shard_count) in self.owned
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(config.ENGINE_HEARTBEAT_INTERVAL)
+            await run_db(self.tick)
+
+    async def start(self) -> None:
+        """Take the first leases, then keep them fresh in the background."""
+        await run_db(self.tick)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Release leases and deregister so survivors take over immediately."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        try:
+            if self.owned:
+                await execute(self.client.rpc("release_shards", {
+                    "p_worker_id": self.worker_id, "p_shards": sorted(self.owned)
+                }))
+            await execute(self.client.table("engine_workers").delete().eq("worker_id", self.worker_id))
+        except Exception as e:
+            print(f"{Fore.YELLOW}[shard] ⚠ Failed to release leases: {e}{Style.RESET_ALL}")
+        self.owned = set()
+        self.lease_valid_until = 0.0
+
+
+_coordinator: Optional[ShardCoordinator] = None
+
+
+async def start_sharding(client) -> ShardCoordinator:
+    """Enable sharding for this process."""
+    global _coordinator
+    _coordinator = ShardCoordinator(client)
+    await _coordinator.start()
+    return _coordinator
+
+
+async def stop_sharding() -> None:
+    global _coordinator
+    if _coordinator:
+        await _coordinator.stop()
+        _coordinator = None
+
+
+def owns_account(user_email: str) -> bool:
+    """True if this process should evaluate the account (always, when sharding is off)."""
+    if _coordinator is None:
+        return True
+    return _coordinator.owns(user_email)
@@ -0,0 +1,367 @@
+"""
+Streaming Referee
+
+Event-driven alternative to the 30s polling loop. For every active
+Deriv account we hold a balance subscription (subscribe=1) on the pooled
+session, which pushes every balance change.
+
+Open contracts are valued by the shared valuation engine from one ticks
+stream per underlying symbol, so accounts holding contracts on the same
+symbol are all re-evaluated on the tick that moves them. The contract
+list is re-read from portfolio whenever the balance moves (a buy or sell)
+and every VALUATION_REANCHOR_INTERVAL. With VALUATION_ENABLED off, each
+account subscribes to proposal_open_contract for bid updates instead.
+
+Equity is kept in memory and the challenge rules run on every update,
+so breaches are detected as soon as Deriv reports them. Trading state
+is queued on one shared WriteBatch and written once per loop; status
+changes are queued immediately and equity updates are throttled.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from colorama import Fore, Style
+
+from src import config
+from src.metrics import FINAL_STATUS_CHECKS
+from src.referee import (
+    TRADING_STATE_FIELDS,
+    equity_state,
+    evaluate_user,
+    fetch_confirmed_equity,
+    fetch_daily_pnl_map,
+    fetch_deriv_users,
+    get_deriv_token,
+    state_tracker,
+    supabase,
+    track_equity,
+)
+from src.sessions import get_session_pool
+from src.sharding import owns_account
+from src.valuation import valuation_engine
+from src.writes import WriteBatch
+
+
+class AccountStream:
+    """Live balance/open-contract state for one trader."""
+
+    def __init__(self, user: dict, token: str, batch: WriteBatch):
+        self.user = user
+        self.batch = batch  # shared by every stream, flushed by StreamingReferee.flush
+        self.user_email = user.get("user_email")
+        self.token = token
+        self.api = None
+        self.balance: Optional[float] = None
+        self.currency = "USD"
+        self.contracts: dict = {}  # contract_id -> bid_price - buy_price (without the valuation engine)
+        self.unrealized = 0.0  # from the valuation engine
+        self.last_contract_sync = 0.0
+        self.status = user.get("challenge_status", "active")
+        self.daily_pnl = 0.0  # refreshed in bulk by StreamingReferee.refresh_daily_pnl
+        self.broken = True  # until start() has both subscriptions up
+        self.dirty = False
+        self.last_persisted = 0.0
+        self._balance_sub = None
+        self._contracts_sub = None
+        self._confirming = False
+        self._tasks: set = set()
+
+    @property
+    def equity(self) -> float:
+        if valuation_engine.enabled:
+            return (self.balance or 0.0) + self.unrealized
+        return (self.balance or 0.0) + sum(self.contracts.values())
+
+    async def start(self) -> None:
+        """Acquire the pooled session and open both subscriptions."""
+        # Stays broken if any step raises, so restart_broken retries it
+        self.broken = True
+        session = await get_session_pool().acquire(self.token)
+        self.api = session.api
+
+        source = await self.api.subscribe({"balance": 1, "subscribe": 1})
+        self._balance_sub = source.subscribe(self._on_balance, self._on_error)
+        await self._sync_contracts()
+        self.broken = False
+        print(f"{Fore.GREEN}[{self.user_email}] ✔ Streaming balance + open contracts{Style.RESET_ALL}")
+
+    async def _sync_contracts(self) -> None:
+        """Re-read open contracts so newly bought and sold ones are picked up."""
+        self.last_contract_sync = time.monotonic()
+        if not valuation_engine.enabled:
+            await self._subscribe_contracts()
+            return
+        portfolio = await self.api.portfolio()
+        contracts = portfolio.get("portfolio", {}).get("contracts", [])
+        self.unrealized = await valuation_engine.sync_account(self.user_email, self.api, contracts)
+        valuation_engine.watch(self.user_email, self._on_revaluation)
+        self._evaluate()
+
+    def _on_revaluation(self, unrealized: float) -> None:
+        self.unrealized = unrealized
+        self._evaluate()
+
+    async def _subscribe_contracts(self) -> None:
+        """(Re)subscribe to all open contracts so newly bought ones are included."""
+        if self._contracts_sub:
+            self._contracts_sub.dispose()
+        source = await self.api.subscribe({"proposal_open_contract": 1, "subscribe": 1})
+        self._contracts_sub = source.subscribe(self._on_contract, self._on_error)
+
+    def stop(self) -> None:
+        for sub in (self._balance_sub, self._contracts_sub):
+            if sub:
+                try:
+                    sub.dispose()
+                except:
+                    pass
+        self._balance_sub = None
+        self._contracts_sub = None
+        valuation_engine.release(self.user_email)
+
+    def _on_balance(self, message: dict) -> None:
+        info = message.get("balance", {})
+        balance = float(info.get("balance", 0))
+        changed = self.balance is not None and balance != self.balance
+        self.balance = balance
+        self.currency = info.get("currency", self.currency)
+        # A buy or sell always moves the balance; refresh the open contracts
+        if changed:
+            self._spawn(self.resync_contracts())
+        self._evaluate()
+
+    def _on_contract(self, message: dict) -> None:
+        contract = message.get("proposal_open_contract") or {}
+        contract_id = contract.get("contract_id")
+        if not contract_id:
+            return
+        if contract.get("is_sold"):
+            self.contracts.pop(contract_id, None)
+        else:
+            buy_price = float(contract.get("buy_price", 0))
+            bid_price = float(contract.get("bid_price", 0))
+            self.contracts[contract_id] = bid_price - buy_price
+        self._evaluate()
+
+    def _on_error(self, error) -> None:
+        print(f"{Fore.YELLOW}[{self.user_email}] ⚠ Stream error: {error}{Style.RESET_ALL}")
+        self.broken = True
+        get_session_pool().invalidate(self.token)
+
+    async def resync_contracts(self) -> None:
+        try:
+            await self._sync_contracts()
+        except Exception as e:
+            self._on_error(e)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _evaluate(self) -> None:
+        """Re-run challenge rules against in-memory equity."""
+        if self.balance is None:
+            return
+        self.dirty = True
+        track_equity(self.user, self.equity)
+        new_status, reason = evaluate_user(self.user, self.equity, self.daily_pnl)
+        if new_status == self.status:
+            return
+
+        if new_status in ["breached", "passed"] and valuation_engine.has_contracts(self.user_email):
+            # Equity includes tick-modelled contract values; Deriv confirms before it is final
+            if not self._confirming:
+                self._confirming = True
+                self._spawn(self._confirm(new_status))
+            return
+        self._set_status(new_status, reason)
+
+    async def _confirm(self, candidate: str) -> None:
+        """Re-read balance and contract bids from Deriv and apply candidate only if they produce it too."""
+        try:
+            self.balance, self.currency, equity = await fetch_confirmed_equity(self.user_email, self.api)
+            self.unrealized = equity - self.balance
+            new_status, reason = evaluate_user(self.user, self.equity, self.daily_pnl)
+            if new_status != candidate:
+                FINAL_STATUS_CHECKS.labels("rejected").inc()
+                print(f"{Fore.YELLOW}[{self.user_email}] ⚠ Modelled {candidate} not confirmed by Deriv: {reason}{Style.RESET_ALL}")
+                return
+            FINAL_STATUS_CHECKS.labels("confirmed").inc()
+            self._set_status(new_status, reason)
+        except Exception as e:
+            FINAL_STATUS_CHECKS.labels("failed").inc()
+            print(f"{Fore.YELLOW}[{self.user_email}] ⚠ Could not confirm modelled {candidate}: {e}{Style.RESET_ALL}")
+        finally:
+            self._confirming = False
+
+    def _set_status(self, new_status: str, reason: str) -> None:
+        if new_status == "breached":
+            print(f"{Fore.RED}{Style.BRIGHT}[{self.user_email}] ❌ BREACHED: {reason}{Style.RESET_ALL}")
+        elif new_status == "passed":
+            print(f"{Fore.GREEN}{Style.BRIGHT}[{self.user_email}] 🏆 PASSED: {reason}{Style.RESET_ALL}")
+        self.status = new_status
+        self.persist(status_changed=True)
+
+    def persist(self, status_changed: bool = False) -> None:
+        """Queue trading_states (and challenge_status on a status change) on the shared batch."""
+        if not owns_account(self.user_email):
+            return
+        self.dirty = False
+        self.last_persisted = time.monotonic()
+        current_time = datetime.now(timezone.utc).isoformat()
+        self.batch.upsert("trading_states", {
+            "user_email": self.user_email,
+            "balance": self.balance or 0.0,
+            "equity": self.equity,
+            "daily_pnl": self.daily_pnl,
+            "currency": self.currency,
+            "status": self.status,
+            "last_trade_at": current_time,
+            "updated_at": current_time,
+            **equity_state(self.user)
+        }, material=TRADING_STATE_FIELDS)
+
+        if status_changed:
+            self.batch.update("user_accounts", {"user_email": self.user_email, "challenge_status": self.status})
+            self.user["challenge_status"] = self.status
+            print(f"{Fore.MAGENTA}[{self.user_email}] 📧 Status → {self.status.upper()}{Style.RESET_ALL}")
+
+
+class StreamingReferee:
+    """Keeps one AccountStream per active trader in sync with user_accounts."""
+
+    def __init__(self):
+        self.streams: dict[str, AccountStream] = {}
+        self.daily_pnl: dict = {}
+        self.batch = WriteBatch(supabase, tracker=state_tracker)
+
+    async def sync_roster(self) -> None:
+        """Start streams for new traders, stop streams for removed or finished ones."""
+        users = await fetch_deriv_users()
+        wanted = {}
+        for user in users:
+            if user.get("challenge_status") in ["breached", "passed"]:
+                continue
+            token = get_deriv_token(user)
+            if token:
+                wanted[user.get("user_email")] = (user, token)
+        self.daily_pnl = await fetch_daily_pnl_map(list(wanted))
+
+        for user_email in list(self.streams):
+            stream = self.streams[user_email]
+            entry = wanted.get(user_email)
+            if entry is None or entry[1] != stream.token or stream.status in ["breached", "passed"]:
+                stream.stop()
+                del self.streams[user_email]
+
+        start = []
+        for user_email, (user, token) in wanted.items():
+            stream = self.streams.get(user_email)
+            if stream is not None:
+                # Pick up parameter changes (account_size, limits) without resubscribing
+                stream.user.update(user)
+                stream.user["challenge_status"] = stream.status
+                continue
+            stream = AccountStream(user, token, self.batch)
+            stream.daily_pnl = self.daily_pnl.get(user_email, 0.0)
+            start.append(stream)
+        if not start:
+            return
+
+        semaphore = asyncio.Semaphore(config.REFEREE_MAX_CONCURRENCY)
+
+        async def _start(stream: AccountStream) -> None:
+            async with semaphore:
+                try:
+                    await stream.start()
+                    self.streams[stream.user_email] = stream
+                except Exception as e:
+                    stream.stop()
+                    print(f"{Fore.RED}[{stream.user_email}] ❌ Stream start failed: {e}{Style.RESET_ALL}")
+
+        await asyncio.gather(*(_start(stream) for stream in start))
+
+    async def refresh_daily_pnl(self) -> None:
+        """Re-read today's P&L for every stream in one query and re-evaluate changed ones."""
+        if not self.streams:
+            return
+        self.daily_pnl = await fetch_daily_pnl_map(list(self.streams))
+        for user_email, stream in list(self.streams.items()):
+            daily_pnl = self.daily_pnl.get(user_email, 0.0)
+            if daily_pnl != stream.daily_pnl:
+                stream.daily_pnl = daily_pnl
+                stream._evaluate()
+
+    async def restart_broken(self) -> None:
+        """Resubscribe streams whose subscription errored or whose session reconnected."""
+        pool = get_session_pool()
+        now = time.monotonic()
+        restart = []
+        for stream in list(self.streams.values()):
+            session = pool.sessions.get(stream.token)
+            if not stream.broken and session is not None and session.api is stream.api:
+                # Streamed sessions are in use even without request traffic
+                session.last_used = now
+                continue
+            if session is not None and now < session.retry_at:
+                continue
+            restart.append(stream)
+        if not restart:
+            return
+
+        semaphore = asyncio.Semaphore(config.REFEREE_MAX_CONCURRENCY)
+
+        async def _restart(stream: AccountStream) -> None:
+            async with semaphore:
+                stream.stop()
+                try:
+                    await stream.start()
+                except Exception as e:
+                    print(f"{Fore.YELLOW}[{stream.user_email}] ⚠ Stream restart failed: {e}{Style.RESET_ALL}")
+
+        await asyncio.gather(*(_restart(stream) for stream in restart))
+
+    async def resync_contracts(self) -> None:
+        """Re-read open contracts periodically so stale valuations are re-anchored."""
+        if not valuation_engine.enabled:
+            return
+        now = time.monotonic()
+        for stream in list(self.streams.values()):
+            if not stream.broken and now - stream.last_contract_sync >= config.VALUATION_REANCHOR_INTERVAL:
+                await stream.resync_contracts()
+
+    async def flush(self) -> None:
+        """Queue throttled equity updates for streams that changed, then write everything queued in one batch."""
+        now = time.monotonic()
+        for stream in list(self.streams.values()):
+            if stream.dirty and now - stream.last_persisted >= config.STREAM_PERSIST_INTERVAL:
+                stream.persist()
+        if len(self.batch):
+            await self.batch.flush_async()
+
+    async def run(self) -> None:
+        """Main streaming loop."""
+        last_roster_sync = 0.0
+        last_pnl_refresh = 0.0
+        try:
+            while True:
+                now = time.monotonic()
+                if now - last_roster_sync >= config.STREAM_ROSTER_INTERVAL:
+                    await self.sync_roster()
+                    last_roster_sync = last_pnl_refresh = now
+                    print(f"{Fore.BLUE}Streaming {len(self.streams)} active Deriv account(s){Style.RESET_ALL}")
+                elif now - last_pnl_refresh >= config.STREAM_DAILY_PNL_INTERVAL:
+                    await self.refresh_daily_pnl()
+                    last_pnl_refresh = now
+                await self.restart_broken()
+                await self.resync_contracts()
+                await self.flush()
+                await asyncio.sleep(1)
+        finally:
+            for stream in self.streams.values():
+                stream.stop()
+            self.streams.clear()
@@ -0,0 +1,445 @@
+"""
+Open Contract Valuation
+
+Keeps unrealized P&L of open Deriv contracts current between portfolio
+calls by revaluing them locally on every tick of their underlying:
+
+- Each contract is anchored once from proposal_open_contract (entry
+  spot, barriers, multiplier, limits, current bid) and re-anchored every
+  VALUATION_REANCHOR_INTERVAL to correct model drift
+- One `ticks` subscription per underlying symbol, on a single
+  unauthenticated connection, shared by every account holding contracts
+  on it
+- Multipliers, rise/fall (digital) options and accumulators are revalued
+  from the tick; other contract types keep their anchored bid until the
+  next re-anchor
+- Accounts can be watched: the listener gets the account's new
+  unrealized P&L after each tick that moved it, so a breach is seen on
+  the tick that caused it rather than at the next poll
+"""
+
+import asyncio
+import math
+import time
+from typing import Callable, Optional
+
+from colorama import Fore, Style
+
+from src import config
+from src.metrics import time_stage
+
+YEAR_SECONDS = 365 * 24 * 3600
+
+# Deriv volatility indices have a fixed annualized volatility; used when a
+# digital option's implied volatility cannot be fitted from its anchor bid
+SYNTHETIC_VOLATILITY = {
+    "R_10": 0.10, "R_25": 0.25, "R_50": 0.50, "R_75": 0.75, "R_100": 1.00,
+    "1HZ10V": 0.10, "1HZ25V": 0.25, "1HZ50V": 0.50, "1HZ75V": 0.75, "1HZ100V": 1.00,
+    "1HZ150V": 1.50, "1HZ250V": 2.50,
+}
+DEFAULT_VOLATILITY = 0.10
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normal_cdf(x: float) -> float:
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+class ContractValuation:
+    """A contract held at its anchored bid (types without a local model)."""
+
+    def __init__(self, contract: dict, anchored_at: float):
+        self.contract_id = int(contract["contract_id"])
+        self.contract_type = contract.get("contract_type", "")
+        self.symbol = contract.get("underlying") or contract.get("symbol")
+        self.buy_price = float(contract.get("buy_price") or 0)
+        self.bid = float(contract.get("bid_price", self.buy_price) or 0)
+        self.anchor_spot = _float(contract.get("current_spot"))
+        self.anchor_epoch = _float(contract.get("current_spot_time")) or 0.0
+        self.anchored_at = anchored_at
+        self.closed = bool(contract.get("is_sold") or contract.get("is_expired"))
+
+    @property
+    def pnl(self) -> float:
+        return self.bid - self.buy_price
+
+    def revalue(self, spot: float, epoch: float) -> bool:
+        """Reprice from a tick; returns True if the bid changed."""
+        return False
+
+
+class MultiplierValuation(ContractValuation):
+    """MULTUP/MULTDOWN: stake * multiplier * relative move, within stop-out and limit orders."""
+
+    def __init__(self, contract: dict, anchored_at: float):
+        super().__init__(contract, anchored_at)
+        self.direction = 1 if self.contract_type == "MULTUP" else -1
+        self.entry_spot = _float(contract.get("entry_spot")) or _float(contract.get("entry_tick"))
+        self.exposure = self.buy_price * float(contract["multiplier"])
+        limits = contract.get("limit_order") or {}
+        self.take_profit = _float((limits.get("take_profit") or {}).get("order_amount"))
+        self.stop_loss = _float((limits.get("stop_loss") or {}).get("order_amount"))
+        # Commission (and anything else between the raw move and the quoted bid)
+        self.offset = self.bid - self._raw_value(self.anchor_spot)
+
+    def _raw_value(self, spot: float) -> float:
+        return self.buy_price + self.direction * self.exposure * (spot / self.entry_spot - 1.0)
+
+    def revalue(self, spot: float, epoch: float) -> bool:
+        if self.closed:
+            return False
+        bid = self._raw_value(spot) + self.offset
+        profit = bid - self.buy_price
+        if self.take_profit is not None and profit >= self.take_profit:
+            bid, self.closed = self.buy_price + self.take_profit, True
+        elif self.stop_loss is not None and profit <= -abs(self.stop_loss):
+            bid, self.closed = self.buy_price - abs(self.stop_loss), True
+        elif bid <= 0:
+            bid, self.closed = 0.0, True  # stopped out
+        changed = bid != self.bid
+        self.bid = bid
+        return changed
+
+
+class DigitalOptionValuation(ContractValuation):
+    """
+    CALL/PUT (rise/fall, higher/lower): payout * P(finishing beyond the
+    barrier), with the volatility fitted to the anchor bid and the
+    remaining spread kept as a scale factor.
+    """
+
+    def __init__(self, contract: dict, anchored_at: float):
+        super().__init__(contract, anchored_at)
+        self.direction = 1 if self.contract_type in ("CALL", "CALLE") else -1
+        self.payout = float(contract["payout"])
+        self.barrier = float(contract["barrier"])
+        self.expiry = float(contract["date_expiry"])
+        anchor_probability = self.bid / self.payout
+        self.volatility = self._fit_volatility(anchor_probability)
+        model_probability = self._probability(self.anchor_spot, self.anchor_epoch)
+        self.scale = anchor_probability / model_probability if model_probability > 0.01 else 1.0
+
+    def _probability(self, spot: float, epoch: float, volatility: float = None) -> float:
+        volatility = volatility or self.volatility
+        remaining = max(0.0, self.expiry - epoch) / YEAR_SECONDS
+        if remaining <= 0:
+            return 1.0 if self.direction * (spot - self.barrier) > 0 else 0.0
+        spread = volatility * math.sqrt(remaining)
+        d2 = (math.log(spot / self.barrier) - spread * spread / 2) / spread
+        return _normal_cdf(self.direction * d2)
+
+    def _fit_volatility(self, target: float) -> float:
+        """Best fit on a log grid (the price is not monotonic in volatility below the barrier)."""
+        fallback = SYNTHETIC_VOLATILITY.get(self.symbol, DEFAULT_VOLATILITY)
+        if not 0.0 < target < 1.0 or self.anchor_spot is None:
+            return fallback
+        best, best_error = fallback, abs(self._probability(self.anchor_spot, self.anchor_epoch, fallback) - target)
+        for step in range(81):
+            volatility = 0.01 * 10 ** (step / 40)  # 1% .. 1000%
+            error = abs(self._probability(self.anchor_spot, self.anchor_epoch, volatility) - target)
+            if error < best_error:
+                best, best_error = volatility, error
+        return best
+
+    def revalue(self, spot: float, epoch: float) -> bool:
+        if self.closed:
+            return False
+        if epoch >= self.expiry:
+            # Settled: the full payout or nothing, without the pre-expiry spread
+            bid, self.closed = self.payout * self._probability(spot, epoch), True
+        else:
+            bid = self.payout * min(1.0, self._probability(spot, epoch) * self.scale)
+        changed = bid != self.bid
+        self.bid = bid
+        return changed
+
+
+class AccumulatorValuation(ContractValuation):
+    """ACCU: grows by growth_rate per tick inside the barrier range, knocked out outside it."""
+
+    def __init__(self, contract: dict, anchored_at: float):
+        super().__init__(contract, anchored_at)
+        self.growth_rate = float(contract["growth_rate"])
+        self.range = (float(contract["high_barrier"]) - self.anchor_spot) / self.anchor_spot
+        self.previous_spot = self.anchor_spot
+        limits = contract.get("limit_order") or {}
+        self.take_profit = _float((limits.get("take_profit") or {}).get("order_amount"))
+
+    def revalue(self, spot: float, epoch: float) -> bool:
+        if self.closed:
+            return False
+        low, high = self.previous_spot * (1 - self.range), self.previous_spot * (1 + self.range)
+        self.previous_spot = spot
+        if not low < spot < high:
+            self.bid, self.closed = 0.0, True
+            return True
+        self.bid *= 1 + self.growth_rate
+        if self.take_profit is not None and self.bid - self.buy_price >= self.take_profit:
+            self.closed = True
+        return True
+
+
+MODELS = {
+    "MULTUP": MultiplierValuation,
+    "MULTDOWN": MultiplierValuation,
+    "CALL": DigitalOptionValuation,
+    "PUT": DigitalOptionValuation,
+    "CALLE": DigitalOptionValuation,
+    "PUTE": DigitalOptionValuation,
+    "ACCU": AccumulatorValuation,
+}
+
+
+def build_valuation(contract: dict, anchored_at: float = None) -> ContractValuation:
+    """The local model for a proposal_open_contract snapshot (anchored bid if none fits)."""
+    anchored_at = anchored_at if anchored_at is not None else time.monotonic()
+    model = MODELS.get(contract.get("contract_type"))
+    if model is not None and _float(contract.get("current_spot")):
+        try:
+            return model(contract, anchored_at)
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            pass
+    return ContractValuation(contract, anchored_at)
+
+
+class AccountBook:
+    """The contracts one account holds."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.contract_ids: set = set()
+        self.listener: Optional[Callable[[float], None]] = None
+        self.last_synced = time.monotonic()
+
+
+class ValuationEngine:
+    """Anchored contract models per account, revalued from shared tick streams."""
+
+    def __init__(self):
+        self.contracts: dict[int, ContractValuation] = {}
+        self.owners: dict[int, str] = {}  # contract_id -> account key
+        self.by_symbol: dict[str, set] = {}
+        self.books: dict[str, AccountBook] = {}
+        self.spots: dict[str, tuple[float, float]] = {}  # symbol -> (quote, epoch)
+        self.api = None
+        self._subscriptions: dict[str, object] = {}
+        self._subscribing: dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+        self._last_sweep = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return config.VALUATION_ENABLED
+
+    def unrealized(self, key: str) -> float:
+        book = self.books.get(key)
+        if book is None:
+            return 0.0
+        return sum(self.contracts[cid].pnl for cid in book.contract_ids if cid in self.contracts)
+
+    def has_contracts(self, key: str) -> bool:
+        book = self.books.get(key)
+        return book is not None and bool(book.contract_ids)
+
+    async def sync_account(self, key: str, api, contracts: list, reanchor: bool = False) -> float:
+        """
+        Reconcile an account's open contracts (portfolio rows) with what is
+        tracked, anchoring new or stale ones through the account's own
+        authorized api. Returns the account's unrealized P&L.
+
+        With reanchor, every contract is re-read from proposal_open_contract
+        and any failure is raised, so the result is Deriv's own valuation
+        rather than the local models'.
+        """
+        now = time.monotonic()
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = AccountBook(key)
+        book.last_synced = now
+
+        open_ids = {int(row["contract_id"]) for row in contracts if row.get("contract_id")}
+        for contract_id in book.contract_ids - open_ids:
+            self._untrack(contract_id)
+        book.contract_ids = open_ids
+
+        due = [
+            row for row in contracts if row.get("contract_id") and (
+                reanchor
+                or int(row["contract_id"]) not in self.contracts
+                or now - self.contracts[int(row["contract_id"])].anchored_at >= config.VALUATION_REANCHOR_INTERVAL
+            )
+        ]
+        if due:
+            anchors = await asyncio.gather(*(self._anchor(api, row) for row in due), return_exceptions=True)
+            for row, anchor in zip(due, anchors):
+                if isinstance(anchor, BaseException):
+                    if reanchor:
+                        raise anchor
+                    current = self.contracts.get(int(row["contract_id"]))
+                    if current is not None:
+                        # Keep the existing model; retry the anchor next sync
+                        self.owners[current.contract_id] = key
+                        continue
+                    # Without a snapshot, keep what the portfolio row says
+                    anchor = build_valuation(row, now)
+                self._track(anchor, key)
+        unrealized = self.unrealized(key)
+
+        # Contracts without a local model do not need ticks
+        await self._ensure_ticks({
+            self.contracts[cid].symbol for cid in open_ids
+            if cid in self.contracts and type(self.contracts[cid]) is not ContractValuation
+        })
+        self._sweep_idle(now)
+        return unrealized
+
+    def watch(self, key: str, listener: Optional[Callable[[float], None]]) -> None:
+        """Call listener(unrealized_pnl) whenever a tick moves the account's contracts."""
+        book = self.books.get(key)
+        if book is not None:
+            book.listener = listener
+
+    def release(self, key: str) -> None:
+        """Stop tracking an account's contracts."""
+        book = self.books.pop(key, None)
+        if book is not None:
+            for contract_id in book.contract_ids:
+                self._untrack(contract_id)
+
+    async def _anchor(self, api, row: dict) -> ContractValuation:
+        with time_stage("deriv_contract_anchor"):
+            response = await api.proposal_open_contract({"contract_id": int(row["contract_id"])})
+        contract = response.get("proposal_open_contract") or {}
+        if not contract.get("contract_id"):
+            raise ValueError("empty proposal_open_contract")
+        return build_valuation(contract)
+
+    def _track(self, valuation: ContractValuation, key: str) -> None:
+        self.contracts[valuation.contract_id] = valuation
+        self.owners[valuation.contract_id] = key
+        if valuation.symbol:
+            self.by_symbol.setdefault(valuation.symbol, set()).add(valuation.contract_id)
+
+    def _untrack(self, contract_id: int) -> None:
+        valuation = self.contracts.pop(contract_id, None)
+        self.owners.pop(contract_id, None)
+        if valuation is None or not valuation.symbol:
+            return
+        holders = self.by_symbol.get(valuation.symbol)
+        if holders is not None:
+            holders.discard(contract_id)
+            if not holders:
+                del self.by_symbol[valuation.symbol]
+                self._unsubscribe(valuation.symbol)
+
+    def _sweep_idle(self, now: float) -> None:
+        """Drop accounts nobody has synced for VALUATION_IDLE_TTL (removed or no longer checked)."""
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for key, book in list(self.books.items()):
+            if now - book.last_synced > config.VALUATION_IDLE_TTL:
+                self.release(key)
+
+    # -- tick streams ---------------------------------------------------------
+
+    def _api_open(self) -> bool:
+        if self.api is None:
+            return False
+        ws = getattr(self.api, "wsconnection", None)
+        return not (ws is not None and getattr(ws, "closed", False))
+
+    async def _tick_api(self):
+        """The shared unauthenticated connection carrying every tick stream."""
+        async with self._lock:
+            if not self._api_open():
+                from deriv_api import DerivAPI
+
+                self._subscriptions.clear()
+                self.api = DerivAPI(endpoint=config.DERIV_ENDPOINT, app_id=config.DERIV_APP_ID)
+                await self.api.connected
+            return self.api
+
+    async def _ensure_ticks(self, symbols: set) -> None:
+        missing = [symbol for symbol in symbols if symbol and symbol not in self._subscriptions]
+        if not missing:
+            return
+        tasks = []
+        for symbol in missing:
+            task = self._subscribing.get(symbol)
+            if task is None:
+                task = self._subscribing[symbol] = asyncio.create_task(self._subscribe(symbol))
+            tasks.append(task)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _subscribe(self, symbol: str) -> None:
+        try:
+            api = await self._tick_api()
+            source = await api.subscribe({"ticks": symbol})
+            if symbol in self.by_symbol:
+                self._subscriptions[symbol] = source.subscribe(
+                    lambda message: self._on_tick(symbol, message),
+                    lambda error: self._on_tick_error(symbol, error),
+                )
+        except Exception as e:
+            print(f"{Fore.YELLOW}[valuation] ⚠ Tick subscription for {symbol} failed: {e}{Style.RESET_ALL}")
+        finally:
+            self._subscribing.pop(symbol, None)
+
+    def _unsubscribe(self, symbol: str) -> None:
+        self.spots.pop(symbol, None)
+        subscription = self._subscriptions.pop(symbol, None)
+        if subscription is not None:
+            try:
+                subscription.dispose()
+            except Exception:
+                pass
+
+    def _on_tick_error(self, symbol: str, error) -> None:
+        print(f"{Fore.YELLOW}[valuation] ⚠ Tick stream for {symbol} failed: {error}{Style.RESET_ALL}")
+        # Resubscribed on the next sync of an account holding the symbol
+        self._subscriptions.pop(symbol, None)
+
+    def _on_tick(self, symbol: str, message: dict) -> None:
+        tick = message.get("tick") or {}
+        spot, epoch = _float(tick.get("quote")), _float(tick.get("epoch"))
+        if spot is None or epoch is None:
+            return
+        self.spots[symbol] = (spot, epoch)
+
+        moved = set()
+        for contract_id in self.by_symbol.get(symbol, ()):
+            valuation = self.contracts.get(contract_id)
+            # Ticks at or before the anchor are already in its bid
+            if valuation is not None and epoch > valuation.anchor_epoch and valuation.revalue(spot, epoch):
+                moved.add(self.owners.get(contract_id))
+
+        for key in moved:
+            book = self.books.get(key)
+            if book is None or book.listener is None:
+                continue
+            try:
+                book.listener(self.unrealized(key))
+            except Exception as e:
+                print(f"{Fore.YELLOW}[valuation] ⚠ Listener for {key} failed: {e}{Style.RESET_ALL}")
+
+    async def close(self) -> None:
+        for symbol in list(self._subscriptions):
+            self._unsubscribe(symbol)
+        for task in list(self._subscribing.values()):
+            task.cancel()
+        if self.api is not None:
+            try:
+                await self.api.disconnect()
+            except Exception:
+                pass
+        self.api = None
+
+
+valuation_engine = ValuationEngine()
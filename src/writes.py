@@ -0,0 +1,213 @@
+"""
+Batched Supabase Writes
+
+Collects per-trader rows during a referee cycle and flushes them as bulk
+array upserts, one request per table (and column shape) per chunk, instead
+of one PostgREST round trip per row.
+
+Rows for the same conflict key are merged. Changes to rows that must
+already exist (deriv_account_id and challenge_status on user_accounts) are
+queued as updates instead, so a deleted account is never re-created; they
+are sent as one PATCH ... WHERE key IN (...) per distinct set of values.
+
+A ChangeTracker remembers what was last persisted per row so unchanged
+rows are skipped, apart from a periodic heartbeat that refreshes updated_at.
+"""
+
+import asyncio
+import time
+
+from colorama import Fore, Style
+
+from src import config
+from src.db import run_db
+from src.metrics import time_stage
+
+
+class ChangeTracker:
+    """Digest of the last persisted material fields per (table, key)."""
+
+    def __init__(self, heartbeat: float = None):
+        self.heartbeat = heartbeat if heartbeat is not None else config.STATE_HEARTBEAT_INTERVAL
+        self.last: dict[tuple[str, str], tuple[int, float]] = {}
+
+    @staticmethod
+    def digest(row: dict, fields: tuple) -> int:
+        """Hash the material fields, rounding floats to cents."""
+        values = []
+        for field in fields:
+            value = row.get(field)
+            if isinstance(value, float):
+                value = round(value, 2)
+            values.append(value)
+        return hash(tuple(values))
+
+    def is_stale(self, table: str, key: str, digest: int) -> bool:
+        """True if the row changed or its heartbeat is due."""
+        last = self.last.get((table, key))
+        if last is None:
+            return True
+        last_digest, written_at = last
+        return last_digest != digest or time.monotonic() - written_at >= self.heartbeat
+
+    def record(self, table: str, key: str, digest: int) -> None:
+        self.last[(table, key)] = (digest, time.monotonic())
+
+    def forget(self, table: str, key: str) -> None:
+        self.last.pop((table, key), None)
+
+
+class WriteBatch:
+    """Pending upserts grouped by table and conflict key, and pending updates by table and key column."""
+
+    def __init__(self, client, batch_size: int = None, tracker: ChangeTracker = None):
+        self.client = client
+        self.batch_size = batch_size or config.SUPABASE_WRITE_BATCH_SIZE
+        self.tracker = tracker
+        self.pending: dict[tuple[str, str], dict] = {}
+        self.updates: dict[tuple[str, str], dict] = {}
+        self.digests: dict[tuple[str, str], int] = {}
+        self.skipped = 0
+
+    def upsert(self, table: str, row: dict, on_conflict: str = "user_email", material: tuple = None) -> None:
+        """
+        Queue a row; later rows for the same key are merged over earlier ones.
+
+        With a tracker and material fields, the row is skipped when those
+        fields match what was last persisted and no heartbeat is due.
+        """
+        key = row[on_conflict]
+        if self.tracker is not None and material:
+            digest = self.tracker.digest(row, material)
+            if not self.tracker.is_stale(table, key, digest):
+                self.skipped += 1
+                return
+            self.digests[(table, key)] = digest
+        else:
+            # An untracked write invalidates whatever the tracker last saw
+            self.digests.pop((table, key), None)
+            if self.tracker is not None:
+                self.tracker.forget(table, key)
+
+        rows = self.pending.setdefault((table, on_conflict), {})
+        if key in rows:
+            rows[key].update(row)
+        else:
+            rows[key] = dict(row)
+
+    def update(self, table: str, row: dict, key: str = "user_email") -> None:
+        """Queue an update of existing rows (never inserts); later values for the same key are merged."""
+        values = self.updates.setdefault((table, key), {}).setdefault(row[key], {})
+        values.update((column, value) for column, value in row.items() if column != key)
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self.pending.values()) + sum(len(rows) for rows in self.updates.values())
+
+    def flush(self) -> dict:
+        """
+        Write all pending rows as bulk upserts, then the pending updates.
+
+        PostgREST fills keys missing from a bulk payload with NULL, so rows
+        are grouped by their column set before chunking. If a chunk fails,
+        only that chunk falls back to per-row upserts. Updates are grouped
+        by their values, with the same per-row fallback.
+
+        Returns {"written": n, "failed": n, "skipped": n}.
+        """
+        return self._write(*self._take())
+
+    async def flush_async(self) -> dict:
+        """
+        flush() with the writes on the database thread pool; rows queued
+        meanwhile go to the next flush. Update groups (one per distinct set
+        of values, e.g. first-seen deriv_account_ids) are sent side by side.
+        """
+        pending, updates, digests, skipped = self._take()
+        stats = await run_db(self._write, pending, {}, digests, skipped)
+        results = await asyncio.gather(*(run_db(self._write_update, *group) for group in self._update_groups(updates)))
+        for written, failed in results:
+            stats["written"] += written
+            stats["failed"] += failed
+        return stats
+
+    def _take(self) -> tuple:
+        pending, self.pending = self.pending, {}
+        updates, self.updates = self.updates, {}
+        digests, self.digests = self.digests, {}
+        skipped, self.skipped = self.skipped, 0
+        return pending, updates, digests, skipped
+
+    def _write(self, pending: dict, updates: dict, digests: dict, skipped: int) -> dict:
+        stats = {"written": 0, "failed": 0, "skipped": skipped}
+        for (table, on_conflict), rows in pending.items():
+            shapes: dict[tuple, list] = {}
+            for row in rows.values():
+                shapes.setdefault(tuple(sorted(row)), []).append(row)
+
+            for shape_rows in shapes.values():
+                for start in range(0, len(shape_rows), self.batch_size):
+                    chunk = shape_rows[start:start + self.batch_size]
+                    try:
+                        with time_stage(f"{table}_upsert"):
+                            self.client.table(table).upsert(chunk, on_conflict=on_conflict).execute()
+                        stats["written"] += len(chunk)
+                        for row in chunk:
+                            self._record(digests, table, row[on_conflict])
+                    except Exception as e:
+                        print(f"{Fore.YELLOW}⚠ Bulk upsert of {len(chunk)} {table} row(s) failed, retrying per row: {e}{Style.RESET_ALL}")
+                        self._write_rows(digests, table, on_conflict, chunk, stats)
+
+        for group in self._update_groups(updates):
+            written, failed = self._write_update(*group)
+            stats["written"] += written
+            stats["failed"] += failed
+
+        return stats
+
+    def _write_rows(self, digests: dict, table: str, on_conflict: str, rows: list, stats: dict) -> None:
+        for row in rows:
+            try:
+                with time_stage(f"{table}_upsert"):
+                    self.client.table(table).upsert(row, on_conflict=on_conflict).execute()
+                stats["written"] += 1
+                self._record(digests, table, row[on_conflict])
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"{Fore.YELLOW}[{row.get(on_conflict)}] ⚠ {table} sync failed: {e}{Style.RESET_ALL}")
+
+    def _update_groups(self, updates: dict) -> list:
+        """(table, key column, values, keys) per distinct set of values, chunked by batch size."""
+        groups = []
+        for (table, key), rows in updates.items():
+            by_values: dict[tuple, list] = {}
+            for key_value, values in rows.items():
+                by_values.setdefault(tuple(sorted(values.items())), []).append(key_value)
+            for values, keys in by_values.items():
+                for start in range(0, len(keys), self.batch_size):
+                    groups.append((table, key, dict(values), keys[start:start + self.batch_size]))
+        return groups
+
+    def _write_update(self, table: str, key: str, values: dict, keys: list) -> tuple:
+        """One PATCH for all keys; per-row fallback if it fails. Returns (written, failed)."""
+        try:
+            with time_stage(f"{table}_update"):
+                self.client.table(table).update(values).in_(key, keys).execute()
+            return len(keys), 0
+        except Exception as e:
+            print(f"{Fore.YELLOW}⚠ Bulk update of {len(keys)} {table} row(s) failed, retrying per row: {e}{Style.RESET_ALL}")
+
+        written = failed = 0
+        for key_value in keys:
+            try:
+                with time_stage(f"{table}_update"):
+                    self.client.table(table).update(values).eq(key, key_value).execute()
+                written += 1
+            except Exception as e:
+                failed += 1
+                print(f"{Fore.YELLOW}[{key_value}] ⚠ {table} update failed: {e}{Style.RESET_ALL}")
+        return written, failed
+
+    def _record(self, digests: dict, table: str, key: str) -> None:
+        digest = digests.get((table, key))
+        if self.tracker is not None and digest is not None:
+            self.tracker.record(table, key, digest)
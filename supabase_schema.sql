@@ -17,6 +17,8 @@ CREATE TABLE IF NOT EXISTS user_accounts (
     account_size NUMERIC(18, 2) DEFAULT 0,        -- Starting capital (e.g., 10000)
     max_drawdown_limit NUMERIC(18, 2) DEFAULT 0,  -- Max loss allowed (e.g., 1000 = 10%)
     profit_target NUMERIC(18, 2) DEFAULT 0,       -- Target profit (e.g., 800 = 8%)
+    daily_loss_limit NUMERIC(18, 2) DEFAULT 0,    -- Max loss per UTC day (0 = none)
+    account_tier TEXT DEFAULT 'standard',         -- challenge_rules.tier
     challenge_status TEXT DEFAULT 'active',       -- active, breached, passed
     
     -- Evaluation Timestamps (preserved by engine)
@@ -30,11 +32,33 @@ CREATE TABLE IF NOT EXISTS user_accounts (
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Columns the engine reads, for tables created before they were added
+ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS daily_loss_limit NUMERIC(18, 2) DEFAULT 0;
+ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS account_tier TEXT DEFAULT 'standard';
+ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS evaluation_started_at TIMESTAMPTZ;
+
 CREATE INDEX IF NOT EXISTS idx_user_accounts_email ON user_accounts(user_email);
 CREATE INDEX IF NOT EXISTS idx_user_accounts_broker_type ON user_accounts(broker_type);
 CREATE INDEX IF NOT EXISTS idx_user_accounts_is_active ON user_accounts(is_active);
 CREATE INDEX IF NOT EXISTS idx_user_accounts_deriv_id ON user_accounts(deriv_account_id);
 CREATE INDEX IF NOT EXISTS idx_user_accounts_challenge_status ON user_accounts(challenge_status);
+CREATE INDEX IF NOT EXISTS idx_user_accounts_updated_at ON user_accounts(updated_at);
+
+-- Keep updated_at current on every update (the engine's roster syncs deltas by it)
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS user_accounts_updated_at ON user_accounts;
+CREATE TRIGGER user_accounts_updated_at
+    BEFORE UPDATE ON user_accounts
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
 
 -- ============================================
 -- TRADING STATES TABLE - Live trading data per user
@@ -52,6 +76,14 @@ CREATE TABLE IF NOT EXISTS trading_states (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Equity series aggregates (see src/equity_store.py), so a worker taking
+-- over an account under ENGINE_SHARDING keeps its high-water mark
+ALTER TABLE trading_states ADD COLUMN IF NOT EXISTS equity_series TEXT;
+ALTER TABLE trading_states ADD COLUMN IF NOT EXISTS high_water_mark NUMERIC(18, 8);
+ALTER TABLE trading_states ADD COLUMN IF NOT EXISTS day_open_equity NUMERIC(18, 8);
+ALTER TABLE trading_states ADD COLUMN IF NOT EXISTS day_high_equity NUMERIC(18, 8);
+ALTER TABLE trading_states ADD COLUMN IF NOT EXISTS equity_day DATE;
+
 CREATE INDEX IF NOT EXISTS idx_trading_states_user_email ON trading_states(user_email);
 CREATE INDEX IF NOT EXISTS idx_trading_states_status ON trading_states(status);
 
@@ -71,6 +103,110 @@ CREATE TABLE IF NOT EXISTS profit_table (
 
 CREATE INDEX IF NOT EXISTS idx_profit_table_user_email ON profit_table(user_email);
 CREATE INDEX IF NOT EXISTS idx_profit_table_created_at ON profit_table(created_at);
+CREATE INDEX IF NOT EXISTS idx_profit_table_created_at_email ON profit_table(created_at, user_email) INCLUDE (profit);
+
+-- Today's P&L for every user in one call (used by the engine once per cycle)
+CREATE OR REPLACE FUNCTION daily_pnl_by_user(since TIMESTAMPTZ)
+RETURNS TABLE (user_email TEXT, daily_pnl NUMERIC)
+LANGUAGE sql STABLE
+AS $$
+    SELECT p.user_email, SUM(p.profit) AS daily_pnl
+    FROM profit_table p
+    WHERE p.created_at >= since
+    GROUP BY p.user_email;
+$$;
+
+-- Distinct UTC days with closed trades per active account since its
+-- evaluation started (min_trading_days rules)
+CREATE OR REPLACE FUNCTION trading_days_by_user()
+RETURNS TABLE (user_email TEXT, trading_days BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT p.user_email, COUNT(DISTINCT (p.created_at AT TIME ZONE 'UTC')::date) AS trading_days
+    FROM profit_table p
+    JOIN user_accounts a ON a.user_email = p.user_email
+    WHERE a.is_active AND p.created_at >= COALESCE(a.evaluation_started_at, a.created_at)
+    GROUP BY p.user_email;
+$$;
+
+-- ============================================
+-- CHALLENGE RULES TABLE - Declarative rule set per account tier
+-- ============================================
+-- rules is a JSON array, e.g.
+-- [{"type": "max_drawdown", "pct": 10}, {"type": "daily_loss", "pct": 5},
+--  {"type": "trailing_drawdown", "amount": 800}, {"type": "max_lots", "lots": 5},
+--  {"type": "profit_target", "pct": 8}, {"type": "min_trading_days", "days": 5}]
+-- Tiers without a row use the static drawdown/target columns on user_accounts.
+CREATE TABLE IF NOT EXISTS challenge_rules (
+    tier TEXT PRIMARY KEY,                        -- matches user_accounts.account_tier
+    rules JSONB NOT NULL DEFAULT '[]'::jsonb,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- ============================================
+-- ENGINE SHARDING - Worker heartbeats and shard leases
+-- ============================================
+-- Each engine process heartbeats into engine_workers and holds time-limited
+-- leases on the shards (hash(user_email) % shard count) it evaluates.
+CREATE TABLE IF NOT EXISTS engine_workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat_at TIMESTAMPTZ DEFAULT NOW(),
+    started_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS engine_shard_leases (
+    shard INT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    lease_until TIMESTAMPTZ NOT NULL
+);
+
+-- Record a heartbeat and return the live workers
+CREATE OR REPLACE FUNCTION engine_heartbeat(p_worker_id TEXT, p_ttl_seconds INT)
+RETURNS SETOF TEXT
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO engine_workers (worker_id, heartbeat_at) VALUES (p_worker_id, NOW())
+    ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = NOW();
+
+    DELETE FROM engine_workers WHERE heartbeat_at < NOW() - make_interval(secs => p_ttl_seconds * 10);
+
+    RETURN QUERY
+        SELECT w.worker_id FROM engine_workers w
+        WHERE w.heartbeat_at >= NOW() - make_interval(secs => p_ttl_seconds)
+        ORDER BY w.worker_id;
+END;
+$$;
+
+-- Claim or renew leases; only free, expired or already-owned shards are granted
+CREATE OR REPLACE FUNCTION claim_shards(p_worker_id TEXT, p_shards INT[], p_ttl_seconds INT)
+RETURNS SETOF INT
+LANGUAGE sql
+AS $$
+    INSERT INTO engine_shard_leases AS l (shard, worker_id, lease_until)
+    SELECT s, p_worker_id, NOW() + make_interval(secs => p_ttl_seconds) FROM unnest(p_shards) AS s
+    ON CONFLICT (shard) DO UPDATE
+        SET worker_id = EXCLUDED.worker_id, lease_until = EXCLUDED.lease_until
+        WHERE l.worker_id = EXCLUDED.worker_id OR l.lease_until < NOW()
+    RETURNING shard;
+$$;
+
+-- Give up leases so another worker can claim them immediately
+CREATE OR REPLACE FUNCTION release_shards(p_worker_id TEXT, p_shards INT[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE engine_shard_leases SET lease_until = NOW() - INTERVAL '1 second'
+    WHERE worker_id = p_worker_id AND shard = ANY(p_shards);
+$$;
+
+-- Only the engine (service role) may heartbeat or move leases
+REVOKE EXECUTE ON FUNCTION engine_heartbeat(TEXT, INT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION claim_shards(TEXT, INT[], INT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION release_shards(TEXT, INT[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION engine_heartbeat(TEXT, INT) TO service_role;
+GRANT EXECUTE ON FUNCTION claim_shards(TEXT, INT[], INT) TO service_role;
+GRANT EXECUTE ON FUNCTION release_shards(TEXT, INT[]) TO service_role;
 
 -- ============================================
 -- ROW LEVEL SECURITY (RLS)
@@ -78,6 +214,9 @@ CREATE INDEX IF NOT EXISTS idx_profit_table_created_at ON profit_table(created_a
 ALTER TABLE user_accounts ENABLE ROW LEVEL SECURITY;
 ALTER TABLE trading_states ENABLE ROW LEVEL SECURITY;
 ALTER TABLE profit_table ENABLE ROW LEVEL SECURITY;
+ALTER TABLE challenge_rules ENABLE ROW LEVEL SECURITY;
+ALTER TABLE engine_workers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE engine_shard_leases ENABLE ROW LEVEL SECURITY;
 
 -- Service role can manage all accounts (for Python engine)
 CREATE POLICY "Service role can manage accounts" ON user_accounts
@@ -89,6 +228,15 @@ CREATE POLICY "Service role can update trading states" ON trading_states
 CREATE POLICY "Service role can manage profit table" ON profit_table
     FOR ALL USING (auth.role() = 'service_role');
 
+CREATE POLICY "Service role can manage challenge rules" ON challenge_rules
+    FOR ALL USING (auth.role() = 'service_role');
+
+CREATE POLICY "Service role can manage engine workers" ON engine_workers
+    FOR ALL USING (auth.role() = 'service_role');
+
+CREATE POLICY "Service role can manage shard leases" ON engine_shard_leases
+    FOR ALL USING (auth.role() = 'service_role');
+
 -- Users can read their own data
 CREATE POLICY "Users can read own account" ON user_accounts
     FOR SELECT USING (auth.email() = user_email);
@@ -126,6 +274,5 @@ INSERT INTO user_accounts (
 -- ============================================
 -- ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS broker_type TEXT DEFAULT 'deriv';
 -- ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS broker_credentials JSONB;
--- ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS evaluation_started_at TIMESTAMPTZ;
 -- ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS locked_at TIMESTAMPTZ;
 -- ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS display_name TEXT;
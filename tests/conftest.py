@@ -0,0 +1,22 @@
+"""Shared fixtures: the referee module wired to in-memory stand-ins instead of Supabase."""
+
+import pytest
+
+from src import referee
+from src.equity_store import EquityStore
+from src.rules import RuleBook
+from tests.test_writes import FakeClient
+
+
+@pytest.fixture
+def offline_referee(monkeypatch):
+    """referee with a recording Supabase client, no tier rules and no local equity store."""
+    client = FakeClient()
+    book = RuleBook()
+    book.load([])
+    monkeypatch.setattr(referee, "supabase", client)
+    monkeypatch.setattr(referee, "rule_book", book)
+    monkeypatch.setattr(referee, "equity_store", EquityStore(directory=""))
+    referee._confirming.clear()
+    referee._revalued.clear()
+    return client
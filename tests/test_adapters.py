@@ -0,0 +1,56 @@
+"""Adapter registry: lookup by broker type, registration and lazy imports."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import src.adapters as adapters
+from src.adapters import BrokerAdapter, get_adapter, register_adapter
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(adapters, "ADAPTERS", dict(adapters.ADAPTERS))
+    monkeypatch.setattr(adapters, "_loaded", {})
+    return adapters.ADAPTERS
+
+
+def test_builtin_adapters_resolve(registry):
+    from src.adapters.mt4mt5 import MT4MT5Adapter
+
+    assert get_adapter("MT5") is MT4MT5Adapter
+    assert get_adapter("mt4") is MT4MT5Adapter
+    assert get_adapter("deriv").__name__ == "DerivAdapter"
+    assert adapters.CTraderAdapter is get_adapter("ctrader")
+
+
+def test_unknown_broker_type(registry):
+    with pytest.raises(ValueError, match="Unsupported broker type: ibkr"):
+        get_adapter("IBKR")
+    with pytest.raises(AttributeError):
+        adapters.NoSuchAdapter
+
+
+class PaperAdapter(BrokerAdapter):
+    pass
+
+
+def test_registration_by_class_and_by_path(registry):
+    register_adapter("Paper", PaperAdapter)
+    assert get_adapter("paper") is PaperAdapter
+    register_adapter("paper", "tests.test_adapters:PaperAdapter")
+    assert registry["paper"] == "tests.test_adapters:PaperAdapter"
+    assert get_adapter("paper") is PaperAdapter
+
+
+def test_importing_the_package_loads_no_adapter():
+    probe = (
+        "import sys, src.adapters; "
+        "print(sorted(m for m in ('src.adapters.deriv', 'src.adapters.ctrader', 'src.adapters.mt4mt5', "
+        "'deriv_api', 'aiohttp') if m in sys.modules))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,161 @@
+"""
+Equivalence of the batch evaluator (src/batch_eval.py) with the scalar
+evaluate_challenge / compiled tier rules it replaces on the tick path.
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from src.batch_eval import challenge_columns, evaluate_challenges, evaluate_users
+from src.referee import evaluate_challenge
+from src.rules import RuleBook, build_context
+
+
+def make_user(account_size=10000.0, max_drawdown_limit=1000.0, profit_target=1000.0, status="active", **extra):
+    return {
+        "user_email": extra.pop("user_email", "trader@example.com"),
+        "account_size": account_size,
+        "max_drawdown_limit": max_drawdown_limit,
+        "profit_target": profit_target,
+        "challenge_status": status,
+        **extra,
+    }
+
+
+def assert_equivalent(users: list, equities: list) -> None:
+    """Same status for every account, and the scalar reason for every changed one."""
+    columns = challenge_columns(users, equities)
+    new_status, changed, reasons = evaluate_challenges(**columns)
+    for i, (user, equity) in enumerate(zip(users, equities)):
+        expected_status, expected_reason = evaluate_challenge(user, equity)
+        assert new_status[i] == expected_status, (user, equity)
+        assert bool(changed[i]) == (expected_status != user.get("challenge_status", "active"))
+        if changed[i]:
+            assert reasons[i] == expected_reason
+        else:
+            assert i not in reasons
+
+
+@pytest.mark.parametrize("equity, expected", [
+    (9000.0, "active"),       # exactly at the breach level is not a breach
+    (8999.99, "breached"),
+    (11000.0, "passed"),      # exactly at the target passes
+    (10999.99, "active"),
+    (10000.0, "active"),
+])
+def test_threshold_edges(equity, expected):
+    user = make_user()
+    assert evaluate_challenge(user, equity)[0] == expected
+    assert_equivalent([user], [equity])
+
+
+@pytest.mark.parametrize("status", ["breached", "passed"])
+@pytest.mark.parametrize("equity", [0.0, 8000.0, 10000.0, 12000.0])
+def test_final_statuses_are_kept(status, equity):
+    user = make_user(status=status)
+    assert evaluate_challenge(user, equity) == (status, "Already evaluated")
+    assert_equivalent([user], [equity])
+    assert evaluate_users([user], [equity]) == [(status, None)]
+
+
+def test_missing_challenge_parameters():
+    users = [make_user(account_size=0), make_user(account_size=0, status="breached"), {"user_email": "bare@example.com"}]
+    assert_equivalent(users, [5000.0, 5000.0, 5000.0])
+
+
+def test_missing_status_defaults_to_active():
+    user = make_user()
+    del user["challenge_status"]
+    assert_equivalent([user, user], [8000.0, 9500.0])
+
+
+def test_nan_equity_stays_active():
+    user = make_user()
+    status, reason = evaluate_challenge(user, math.nan)
+    assert status == "active"
+    assert_equivalent([user, make_user(status="breached")], [math.nan, math.nan])
+
+
+def test_nan_account_size():
+    user = make_user(account_size=math.nan)
+    assert_equivalent([user], [9000.0])
+
+
+@pytest.mark.parametrize("field", ["account_size", "max_drawdown_limit", "profit_target"])
+def test_none_parameters_raise_like_scalar(field):
+    user = make_user(**{field: None})
+    with pytest.raises(TypeError):
+        evaluate_challenge(user, 9500.0)
+    with pytest.raises(TypeError):
+        challenge_columns([user], [9500.0])
+
+
+def test_none_equity_raises_like_scalar():
+    user = make_user()
+    with pytest.raises(TypeError):
+        evaluate_challenge(user, None)
+    with pytest.raises(TypeError):
+        challenge_columns([user], [None])
+
+
+def test_string_parameters_are_converted():
+    # PostgREST returns NUMERIC columns as strings
+    user = make_user(account_size="10000.00", max_drawdown_limit="1000", profit_target="1000")
+    assert_equivalent([user, user, user], [8999.0, 9500.0, 11000.0])
+
+
+def test_random_book():
+    rng = random.Random(7)
+    users, equities = [], []
+    for i in range(5000):
+        account_size = rng.choice([0.0, 5000.0, 10000.0, 25000.0, 100000.0])
+        users.append(make_user(
+            account_size=account_size,
+            max_drawdown_limit=round(account_size * rng.choice([0.05, 0.1]), 2),
+            profit_target=round(account_size * rng.choice([0.08, 0.1]), 2),
+            status=rng.choice(["active", "active", "active", "breached", "passed", "pending"]),
+            user_email=f"trader{i}@example.com",
+        ))
+        equities.append(round(account_size * rng.uniform(0.85, 1.15), 2))
+    assert_equivalent(users, equities)
+
+
+def test_evaluate_challenges_accepts_arrays():
+    new_status, changed, reasons = evaluate_challenges(
+        np.array([10000.0, 10000.0]), np.array([1000.0, 1000.0]), np.array([1000.0, 1000.0]),
+        np.array([8000.0, 10000.0]), np.array(["active", "active"], dtype=object),
+    )
+    assert list(new_status) == ["breached", "active"]
+    assert list(changed) == [True, False]
+    assert reasons == {0: "Equity $8000.00 < Breach Level $9000.00"}
+
+
+def test_evaluate_users_uses_tier_rules():
+    rule_book = RuleBook()
+    rule_book.load([{"tier": "pro", "rules": [
+        {"type": "max_drawdown", "pct": 5},
+        {"type": "daily_loss", "amount": 200},
+        {"type": "profit_target", "pct": 8},
+    ]}])
+
+    users = [
+        make_user(account_tier="pro"),
+        make_user(account_tier="pro"),
+        make_user(account_tier="pro", status="breached"),
+        make_user(account_tier="standard"),
+        make_user(),
+    ]
+    equities = [9400.0, 9900.0, 9900.0, 9400.0, 8000.0]
+    daily_pnls = [0.0, -250.0, -250.0, -250.0, 0.0]
+    results = evaluate_users(users, equities, daily_pnls, rule_book)
+
+    rules = rule_book.tiers["pro"]
+    for i in range(3):
+        assert results[i] == rules.evaluate(build_context(users[i], equities[i], daily_pnls[i]), users[i]["challenge_status"])
+    assert [status for status, _ in results] == ["breached", "breached", "breached", "active", "breached"]
+    # Tiers without a rule set fall back to the static check
+    assert results[3] == ("active", None)
+    assert results[4] == evaluate_challenge(users[4], equities[4])
@@ -0,0 +1,46 @@
+"""Benchmark stand-ins: the fake PostgREST and Deriv servers answer like the real ones."""
+
+from benchmarks.fakes import FakeDeriv, FakePostgREST, Stats, bench_email, bench_token
+from benchmarks.run import percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0], 99) == 3.0
+
+
+def test_postgrest_filters_pages_and_patches():
+    rest = FakePostgREST(Stats(), accounts=5)
+    active = rest.select("user_accounts", [("select", "*"), ("is_active", "eq.true"), ("offset", "2"), ("limit", "2")])
+    assert [row["user_email"] for row in active] == [bench_email(3), bench_email(4)]
+
+    emails = f'in.("{bench_email(1)}","{bench_email(2)}")'
+    rest.update("user_accounts", [("user_email", emails)], {"challenge_status": "breached"})
+    breached = rest.select("user_accounts", [("challenge_status", "eq.breached")])
+    assert [row["user_email"] for row in breached] == [bench_email(1), bench_email(2)]
+
+    rest.upsert("trading_states", "user_email", [{"user_email": bench_email(1), "equity": 1.0}])
+    rest.upsert("trading_states", "user_email", {"user_email": bench_email(1), "equity": 2.0})
+    assert rest.upserts["trading_states"] == {bench_email(1): {"user_email": bench_email(1), "equity": 2.0}}
+    assert rest.rpc("daily_pnl_by_user", {}) == (200, [])
+
+
+def test_deriv_requires_authorize_and_echoes_req_id():
+    deriv = FakeDeriv(Stats(), latency=0, jitter=0, error_rate=0)
+    session = {}
+    assert deriv.respond({"balance": 1, "req_id": 1}, session)["error"]["code"] == "AuthorizationRequired"
+
+    authorized = deriv.respond({"authorize": bench_token(4), "req_id": 2}, session)
+    assert authorized["req_id"] == 2
+    assert authorized["authorize"]["loginid"] == "VRTC0000004"
+    balance = deriv.respond({"balance": 1}, session)["balance"]
+    assert balance["balance"] == 9000.0 + 4 * 37
+    assert len(deriv.respond({"portfolio": 1}, session)["portfolio"]["contracts"]) == 1
+
+
+def test_deriv_injects_failures_at_the_error_rate():
+    deriv = FakeDeriv(Stats(), latency=0, jitter=0, error_rate=1.0)
+    assert deriv.respond({"ping": 1}, {})["error"]["code"] == "RateLimit"
@@ -0,0 +1,54 @@
+"""Failure classification by error code and HTTP status rather than loose substrings."""
+
+import pytest
+from deriv_api.errors import ResponseError
+
+from src.breakers import AUTH, NETWORK, OTHER, RATE_LIMIT, TIMEOUT, classify_failure
+from src.ctrader_connection import CTraderError
+from src.metrics import classify_error
+
+
+def deriv_error(code):
+    return ResponseError({"error": {"code": code, "message": "The token is invalid."}, "echo_req": {}, "msg_type": "authorize"})
+
+
+def wrapped(error):
+    # How the adapters surface connect failures
+    try:
+        try:
+            raise error
+        except Exception as e:
+            raise ConnectionError(f"Deriv auth failed: {e}") from e
+    except ConnectionError as outer:
+        return outer
+
+
+def test_codes_are_read_through_wrapping():
+    assert classify_failure(wrapped(deriv_error("InvalidToken"))) == AUTH
+    assert classify_failure(wrapped(deriv_error("AuthorizationRequired"))) == AUTH
+    assert classify_failure(wrapped(deriv_error("RateLimit"))) == RATE_LIMIT
+    assert classify_failure(wrapped(TimeoutError())) == TIMEOUT
+    assert classify_failure(CTraderError({"errorCode": "CH_ACCESS_TOKEN_INVALID"})) == AUTH
+
+
+@pytest.mark.parametrize("message, kind", [
+    ("Bridge returned status 401", AUTH),
+    ("Webhook returned 403", AUTH),
+    ("Bridge returned status 429", RATE_LIMIT),
+    ("Webhook returned 502", NETWORK),
+    ("cTrader access token invalidated (revoked)", AUTH),
+    ("Connection refused", NETWORK),
+    ("request timed out", TIMEOUT),
+    # Bare numbers and the word "token" are not auth failures
+    ("Bridge returned no data for login 403", OTHER),
+    ("Order token 401 mismatch", OTHER),
+    ("No EA update received yet", OTHER),
+])
+def test_adapter_error_strings(message, kind):
+    assert classify_failure(message) == kind
+
+
+def test_metrics_use_the_same_classification():
+    assert classify_error(wrapped(deriv_error("InvalidToken"))) == AUTH
+    assert classify_error(ConnectionResetError("reset")) == NETWORK
+    assert classify_error(ValueError("bad")) == "ValueError"
@@ -0,0 +1,55 @@
+"""Single Deriv check: balance and portfolio share one round trip on the pooled session."""
+
+import asyncio
+from types import SimpleNamespace
+
+from src import config, referee
+from src.breakers import CircuitBreakers
+
+
+class OverlapApi:
+    """Deriv API stand-in recording how many requests are in flight at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def _request(self, response):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.02)
+        self.running -= 1
+        return response
+
+    async def balance(self):
+        return await self._request({"balance": {"balance": 9500.0, "currency": "USD"}})
+
+    async def portfolio(self):
+        return await self._request({"portfolio": {"contracts": [
+            {"contract_id": 1, "buy_price": 10.0, "bid_price": 4.0},
+            {"contract_id": 2, "buy_price": 10.0, "bid_price": 12.5},
+        ]}})
+
+
+def test_balance_and_portfolio_are_requested_together(offline_referee, monkeypatch):
+    api = OverlapApi()
+    session = SimpleNamespace(api=api, account_id="CR1", is_virtual=True)
+
+    async def acquire(token):
+        return session
+
+    monkeypatch.setattr(config, "VALUATION_ENABLED", False)
+    monkeypatch.setattr(referee, "get_session_pool", lambda: SimpleNamespace(acquire=acquire))
+    monkeypatch.setattr(referee, "breakers", CircuitBreakers())
+    user = {"user_email": "a@x", "deriv_api_token": "token", "account_size": 10000, "max_drawdown_limit": 1000,
+            "profit_target": 1000, "challenge_status": "active"}
+
+    status = asyncio.run(referee.check_single_trader(user, daily_pnl_map={"a@x": -12.0}))
+    assert status == "active"
+    assert api.peak == 2
+    assert user["last_equity"] == 9500.0 - 6.0 + 2.5
+    assert user["open_positions"] == 2
+
+    states = [row for call in offline_referee.calls if call[:2] == ("upsert", "trading_states") for row in call[2]]
+    assert [(row["equity"], row["daily_pnl"]) for row in states] == [(9496.5, -12.0)]
+    assert ("update", "user_accounts", {"deriv_account_id": "CR1"}, "in", "user_email", ["a@x"]) in offline_referee.calls
@@ -0,0 +1,73 @@
+"""Breaches and passes computed from tick-modelled contract values are confirmed against Deriv before they are written."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src import referee
+from src.writes import WriteBatch
+
+
+class FakePool:
+    async def acquire(self, token):
+        return SimpleNamespace(api=object())
+
+
+def make_user():
+    return {"user_email": "a@x", "account_size": 10000, "max_drawdown_limit": 1000, "profit_target": 1000,
+            "challenge_status": "active"}
+
+
+@pytest.fixture
+def modelled(monkeypatch, offline_referee):
+    monkeypatch.setattr(referee.valuation_engine, "has_contracts", lambda key: True)
+    monkeypatch.setattr(referee, "get_session_pool", lambda: FakePool())
+    return offline_referee
+
+
+def run_check(client, user, modelled_equity):
+    async def run():
+        batch = WriteBatch(client)
+        status = referee.record_evaluation(user, 10000.0, modelled_equity, 0.0, "USD", batch, "CR1", "token")
+        await batch.flush_async()
+        await asyncio.gather(*referee._background_tasks)
+        return status
+    return asyncio.run(run())
+
+
+def terminal_writes(client):
+    return [
+        call for call in client.calls
+        if (call[0] == "update" and call[2].get("challenge_status") in ("breached", "passed"))
+        or (call[0] == "upsert" and any(row.get("status") in ("breached", "passed") for row in call[2]))
+    ]
+
+
+def test_modelled_breach_not_confirmed_is_not_written(monkeypatch, modelled):
+    async def reanchored(key, api):
+        return 10000.0, "USD", 9950.0  # Deriv's own bids: well above the 9000 breach level
+    monkeypatch.setattr(referee, "fetch_confirmed_equity", reanchored)
+
+    user = make_user()
+    assert run_check(modelled, user, 8500.0) == "active"
+    assert user["challenge_status"] == "active"
+    assert terminal_writes(modelled) == []
+
+
+def test_modelled_breach_confirmed_is_written(monkeypatch, modelled):
+    async def reanchored(key, api):
+        return 10000.0, "USD", 8600.0
+    monkeypatch.setattr(referee, "fetch_confirmed_equity", reanchored)
+
+    user = make_user()
+    run_check(modelled, user, 8500.0)
+    assert user["challenge_status"] == "breached"
+    assert ("update", "user_accounts", {"challenge_status": "breached"}, "in", "user_email", ["a@x"]) in modelled.calls
+
+
+def test_breach_without_modelled_contracts_is_written_directly(monkeypatch, offline_referee):
+    monkeypatch.setattr(referee.valuation_engine, "has_contracts", lambda key: False)
+    user = make_user()
+    assert run_check(offline_referee, user, 8500.0) == "breached"
+    assert len(terminal_writes(offline_referee)) == 2
@@ -0,0 +1,161 @@
+"""cTrader Open API: one multiplexed connection, cached account state and event-driven reloads."""
+
+import asyncio
+import json
+from collections import Counter
+
+import pytest
+import websockets
+
+from src import config
+from src.ctrader_connection import (
+    ACCOUNT_AUTH_REQ,
+    ACCOUNTS_TOKEN_INVALIDATED_EVENT,
+    APPLICATION_AUTH_REQ,
+    EXECUTION_EVENT,
+    GET_POSITION_UNREALIZED_PNL_REQ,
+    RECONCILE_REQ,
+    SPOT_EVENT,
+    SUBSCRIBE_SPOTS_REQ,
+    TRADER_REQ,
+    CTraderConnection,
+    CTraderError,
+)
+
+
+class FakeOpenApi:
+    """Answers the Open API JSON requests the connection sends."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.clients = []
+
+    async def handler(self, websocket, path=None):
+        self.clients.append(websocket)
+        async for raw in websocket:
+            message = json.loads(raw)
+            payload_type, payload = message["payloadType"], message["payload"]
+            self.counts[payload_type] += 1
+            response = self.respond(payload_type, payload)
+            if response is not None:
+                await websocket.send(json.dumps({"clientMsgId": message.get("clientMsgId"), **response}))
+
+    def respond(self, payload_type, payload):
+        ctid = payload.get("ctidTraderAccountId")
+        if payload_type == APPLICATION_AUTH_REQ:
+            return {"payloadType": payload_type + 1, "payload": {}}
+        if payload_type == ACCOUNT_AUTH_REQ:
+            if payload["accessToken"] == "bad":
+                return {"payloadType": 2142, "payload": {"errorCode": "CH_ACCESS_TOKEN_INVALID", "description": "bad"}}
+            return {"payloadType": payload_type + 1, "payload": {"ctidTraderAccountId": ctid}}
+        if payload_type == TRADER_REQ:
+            return {"payloadType": 2122, "payload": {"trader": {"balance": 1000050, "moneyDigits": 2}}}
+        if payload_type == RECONCILE_REQ:
+            position = {"positionId": ctid, "tradeData": {"symbolId": 5, "volume": 150000, "lotSize": 100000}}
+            return {"payloadType": 2125, "payload": {"position": [position]}}
+        if payload_type == SUBSCRIBE_SPOTS_REQ:
+            return {"payloadType": 2128, "payload": {}}
+        if payload_type == GET_POSITION_UNREALIZED_PNL_REQ:
+            return {"payloadType": 2188, "payload": {
+                "moneyDigits": 2, "positionUnrealizedPnL": [{"positionId": ctid, "netUnrealizedPnL": -2500}]
+            }}
+        return None
+
+    async def push(self, payload_type, payload):
+        await self.clients[0].send(json.dumps({"payloadType": payload_type, "payload": payload}))
+        await asyncio.sleep(0.05)
+
+
+@pytest.fixture(autouse=True)
+def fast_requests(monkeypatch):
+    monkeypatch.setattr(config, "CTRADER_MAX_REQUESTS_PER_SECOND", 10000)
+    monkeypatch.setattr(config, "CTRADER_REQUEST_TIMEOUT", 2)
+
+
+def run_against_fake(scenario):
+    async def main():
+        api = FakeOpenApi()
+        server = await websockets.serve(api.handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        connection = CTraderConnection(f"ws://127.0.0.1:{port}", "client", "secret")
+        try:
+            return await scenario(api, connection)
+        finally:
+            await connection.close()
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+def test_accounts_share_one_authorized_connection():
+    async def scenario(api, connection):
+        accounts = [connection.account(ctid, "token") for ctid in (1, 2, 3)]
+        snapshots = await asyncio.gather(*(account.snapshot() for account in accounts))
+        return api, accounts, snapshots
+
+    api, accounts, snapshots = run_against_fake(scenario)
+    assert len(api.clients) == 1
+    assert api.counts[APPLICATION_AUTH_REQ] == 1
+    assert api.counts[ACCOUNT_AUTH_REQ] == 3
+    assert snapshots == [(10000.5, -25.0)] * 3
+    assert accounts[0].open_lots == 1.5
+
+
+def test_unchanged_accounts_are_served_from_cache():
+    async def scenario(api, connection):
+        account = connection.account(1, "token")
+        await asyncio.gather(account.snapshot(), account.snapshot())
+        first = dict(api.counts)
+        await account.snapshot()
+        cached = dict(api.counts)
+
+        await api.push(SPOT_EVENT, {"ctidTraderAccountId": 1, "symbolId": 5})
+        await account.snapshot()
+        after_spot = dict(api.counts)
+
+        await api.push(EXECUTION_EVENT, {"ctidTraderAccountId": 1})
+        await account.snapshot()
+        return first, cached, after_spot, dict(api.counts)
+
+    first, cached, after_spot, after_execution = run_against_fake(scenario)
+    assert first[TRADER_REQ] == first[RECONCILE_REQ] == first[GET_POSITION_UNREALIZED_PNL_REQ] == 1
+    assert cached == first
+    # A price move only re-reads unrealized P&L
+    assert after_spot[GET_POSITION_UNREALIZED_PNL_REQ] == 2
+    assert after_spot[TRADER_REQ] == 1
+    # An execution reloads balance and positions
+    assert after_execution[TRADER_REQ] == after_execution[RECONCILE_REQ] == 2
+
+
+def test_errors_and_invalidated_tokens():
+    async def scenario(api, connection):
+        with pytest.raises(CTraderError) as rejected:
+            await connection.account(9, "bad").snapshot()
+        account = connection.account(1, "token")
+        await account.snapshot()
+        await api.push(ACCOUNTS_TOKEN_INVALIDATED_EVENT, {"ctidTraderAccountIds": [1], "reason": "revoked"})
+        with pytest.raises(ConnectionError, match="revoked"):
+            await account.snapshot()
+        # A new token clears the error and re-authorizes
+        connection.account(1, "fresh")
+        return rejected.value, await account.snapshot(), api.counts[ACCOUNT_AUTH_REQ]
+
+    error, snapshot, auths = run_against_fake(scenario)
+    assert error.code == "CH_ACCESS_TOKEN_INVALID"
+    assert snapshot == (10000.5, -25.0)
+    assert auths == 3
+
+
+def test_dropped_connection_reconnects_and_reauthorizes():
+    async def scenario(api, connection):
+        account = connection.account(1, "token")
+        await account.snapshot()
+        await api.clients[0].close()
+        await asyncio.sleep(0.05)
+        return await account.snapshot(), connection.generation, api.counts
+
+    snapshot, generation, counts = run_against_fake(scenario)
+    assert snapshot == (10000.5, -25.0)
+    assert generation == 2
+    assert counts[APPLICATION_AUTH_REQ] == counts[ACCOUNT_AUTH_REQ] == 2
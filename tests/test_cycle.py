@@ -0,0 +1,71 @@
+"""Poll cycle: bounded concurrency, per-trader timeouts and the cycle summary."""
+
+import asyncio
+
+import pytest
+
+from src import referee
+from src.breakers import CircuitBreakers
+
+
+class FakePool:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, token):
+        self.invalidated.append(token)
+
+
+@pytest.fixture
+def cycle(offline_referee, monkeypatch):
+    users = [{"user_email": f"u{i}@x", "deriv_api_token": f"token-{i}", "challenge_status": "active"} for i in range(6)]
+    tracker = {"running": 0, "peak": 0}
+    pool = FakePool()
+
+    async def fetch_users():
+        return users
+
+    async def fetch_pnl(emails):
+        return {}
+
+    async def check(user, batch, daily_pnl_map):
+        tracker["running"] += 1
+        tracker["peak"] = max(tracker["peak"], tracker["running"])
+        try:
+            await asyncio.sleep(1 if user["user_email"] == "u5@x" else 0.01)
+        finally:
+            tracker["running"] -= 1
+        return "breached" if user["user_email"] == "u0@x" else "active"
+
+    monkeypatch.setattr(referee, "fetch_deriv_users", fetch_users)
+    monkeypatch.setattr(referee, "fetch_daily_pnl_map", fetch_pnl)
+    monkeypatch.setattr(referee, "check_single_trader", check)
+    monkeypatch.setattr(referee, "breakers", CircuitBreakers())
+    monkeypatch.setattr(referee, "get_session_pool", lambda: pool)
+    return offline_referee, tracker, pool
+
+
+def test_traders_run_concurrently_within_the_limit(cycle, capsys):
+    client, tracker, pool = cycle
+    asyncio.run(referee.check_all_traders(max_concurrency=2, timeout=0.2))
+    assert tracker["peak"] == 2
+
+    # The hung trader timed out: error row, session reconnects next cycle
+    assert pool.invalidated == ["token-5"]
+    errors = [row for call in client.calls if call[:2] == ("upsert", "trading_states") for row in call[2]]
+    assert [(row["user_email"], row["status"]) for row in errors] == [("u5@x", "error")]
+    assert "Summary: 5/6 synced | Breached: 1 | Passed: 0 | Errors: 1 | Skipped: 0" in capsys.readouterr().out
+
+
+def test_breaker_skips_are_not_errors(cycle, monkeypatch, capsys):
+    from prometheus_client import REGISTRY
+
+    def skipped():
+        return REGISTRY.get_sample_value("referee_check_outcomes_total", {"broker": "deriv", "outcome": "skipped"}) or 0.0
+
+    before = skipped()
+    allow = referee.breakers.allow
+    monkeypatch.setattr(referee.breakers, "allow", lambda account, *args: "account breaker open" if account == "u1@x" else allow(account, *args))
+    asyncio.run(referee.check_all_traders(max_concurrency=2, timeout=0.2))
+    assert "Summary: 4/6 synced | Breached: 1 | Passed: 0 | Errors: 1 | Skipped: 1" in capsys.readouterr().out
+    assert skipped() == before + 1
@@ -0,0 +1,69 @@
+"""Daily P&L: one paged query per cycle, via the RPC or the profit_table fallback."""
+
+import asyncio
+
+from src import referee
+
+
+class PagedQuery:
+    def __init__(self, source, rows):
+        self.source = source
+        self.rows = rows
+        self.emails = None
+
+    def select(self, columns):
+        return self
+
+    def gte(self, column, value):
+        return self
+
+    def in_(self, column, values):
+        self.emails = set(values)
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.start, self.end = start, end
+        return self
+
+    def execute(self):
+        self.source.pages.append(self.start)
+        if self.source.rpc_missing and self.rows is self.source.rpc_rows:
+            raise RuntimeError("PGRST202: function daily_pnl_by_user not found")
+        rows = [row for row in self.rows if self.emails is None or row["user_email"] in self.emails]
+        return type("Response", (), {"data": rows[self.start:self.end + 1]})
+
+
+class ProfitSource:
+    def __init__(self, rpc_rows=(), profit_rows=(), rpc_missing=False):
+        self.rpc_rows = list(rpc_rows)
+        self.profit_rows = list(profit_rows)
+        self.rpc_missing = rpc_missing
+        self.pages = []
+
+    def rpc(self, name, params):
+        assert name == "daily_pnl_by_user"
+        return PagedQuery(self, self.rpc_rows)
+
+    def table(self, name):
+        assert name == "profit_table"
+        return PagedQuery(self, self.profit_rows)
+
+
+def test_rpc_results_are_paged(monkeypatch):
+    source = ProfitSource(rpc_rows=[{"user_email": f"u{i}@x", "daily_pnl": i} for i in range(2500)])
+    monkeypatch.setattr(referee, "supabase", source)
+    pnl = asyncio.run(referee.fetch_daily_pnl_map())
+    assert len(pnl) == 2500
+    assert pnl["u2499@x"] == 2499.0
+    assert source.pages == [0, 1000, 2000]
+
+
+def test_fallback_sums_profit_rows_per_user(monkeypatch):
+    rows = [{"user_email": "a@x", "profit": 10}, {"user_email": "a@x", "profit": -4.5},
+            {"user_email": "b@x", "profit": 3}, {"user_email": "c@x", "profit": 100}]
+    source = ProfitSource(profit_rows=rows, rpc_missing=True)
+    monkeypatch.setattr(referee, "supabase", source)
+    assert asyncio.run(referee.fetch_daily_pnl_map(["a@x", "b@x"])) == {"a@x": 5.5, "b@x": 3.0}
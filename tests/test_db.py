@@ -0,0 +1,71 @@
+"""Supabase access: blocking calls run on a bounded pool, the client is created on first use."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from src import config, db
+
+
+def test_blocking_calls_leave_the_event_loop_free(monkeypatch):
+    monkeypatch.setattr(db, "_executor", None)
+    monkeypatch.setattr(config, "SUPABASE_MAX_WORKERS", 2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def blocking_call(value):
+        with lock:
+            running.append(value)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(value)
+        return value * 2
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(db.run_db(blocking_call, value) for value in range(4)))
+        task.cancel()
+        return results, ticks
+
+    try:
+        results, ticks = asyncio.run(scenario())
+    finally:
+        db.close_db()
+    assert results == [0, 2, 4, 6]
+    assert max(peak) == 2
+    # Two rounds of 50ms on the pool; the loop kept running meanwhile
+    assert ticks >= 5
+
+
+def test_execute_awaits_a_query_builder(monkeypatch):
+    monkeypatch.setattr(db, "_executor", None)
+
+    class Query:
+        def execute(self):
+            return threading.current_thread().name
+
+    try:
+        assert asyncio.run(db.execute(Query())).startswith("supabase")
+    finally:
+        db.close_db()
+
+
+def test_importing_the_engine_does_not_create_a_client():
+    probe = "import sys, src.db, src.referee; print(src.db._client is None, 'supabase' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {key: value for key, value in os.environ.items() if not key.startswith("SUPABASE")}
+    result = subprocess.run([sys.executable, "-c", probe], cwd=root, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "True False"
@@ -0,0 +1,39 @@
+"""Multi-broker dispatch: per-account checks through the adapter registry."""
+
+import asyncio
+
+from src import dispatcher
+from src.breakers import CircuitBreakers
+from src.writes import WriteBatch
+from tests.test_writes import FakeClient
+
+
+def test_tokenless_deriv_account_is_not_fetched(monkeypatch):
+    def get_adapter(broker_type):
+        raise AssertionError("adapter must not be resolved without a token")
+
+    monkeypatch.setattr(dispatcher, "get_adapter", get_adapter)
+    monkeypatch.setattr(dispatcher, "breakers", CircuitBreakers())
+    batch = WriteBatch(FakeClient())
+    user = {"user_email": "a@x", "broker_type": "deriv", "challenge_status": "active"}
+
+    assert asyncio.run(dispatcher.check_account(user, batch, {})) is None
+    assert len(batch) == 0
+    assert dispatcher.breakers.accounts == {}
+
+
+def test_family_summary_counts_skips_separately(monkeypatch, capsys):
+    async def check_account(user, batch, daily_pnl_map):
+        return None if user["user_email"] == "b@x" else "active"
+
+    monkeypatch.setattr(dispatcher, "check_account", check_account)
+    monkeypatch.setattr(dispatcher, "supabase", FakeClient())
+    breakers = CircuitBreakers()
+    allow = breakers.allow
+    monkeypatch.setattr(breakers, "allow", lambda account, *args: "mt breaker open" if account == "c@x" else allow(account, *args))
+    monkeypatch.setattr(dispatcher, "breakers", breakers)
+    members = [{"user_email": email, "broker_type": "mt5"} for email in ("a@x", "b@x", "c@x")]
+
+    results = asyncio.run(dispatcher.check_family("mt", members, {}, timeout=1))
+    assert results == {"a@x": "active", "b@x": None, "c@x": dispatcher.SKIPPED}
+    assert "[MT] Summary: 1/3 synced | Breached: 0 | Passed: 0 | Errors: 1 | Skipped: 1" in capsys.readouterr().out
@@ -0,0 +1,119 @@
+"""A reset challenge starts a fresh equity series instead of inheriting the old high-water mark."""
+
+import asyncio
+
+from src import referee
+from src.equity_store import EquityStore
+from src.roster import AccountRoster
+
+
+def row(status, started=None, **extra):
+    return {"user_email": "a@x", "is_active": True, "challenge_status": status,
+            "evaluation_started_at": started, "updated_at": "2026-01-01T00:00:00Z", **extra}
+
+
+def test_roster_reports_final_to_active_flips():
+    roster = AccountRoster(client=None)
+    roster._apply([row("active")], full=True)
+    assert roster.take_restarted() == []
+
+    roster._apply([row("breached")], full=False)
+    roster._apply([row("active")], full=False)
+    restarted = roster.take_restarted()
+    assert [previous["challenge_status"] for previous in restarted] == ["breached"]
+    assert roster.take_restarted() == []
+
+
+def test_series_is_keyed_by_challenge_start(tmp_path, monkeypatch):
+    store = EquityStore(directory=str(tmp_path), capacity=16, max_open=4)
+    monkeypatch.setattr(referee, "equity_store", store)
+
+    user = row("active", started="2026-01-01T00:00:00Z")
+    referee.track_equity(user, 12000.0)
+    referee.track_equity(user, 11000.0)
+    assert user["high_water_mark"] == 12000.0
+
+    user["evaluation_started_at"] = "2026-02-01T00:00:00Z"
+    referee.track_equity(user, 10000.0)
+    assert user["high_water_mark"] == 10000.0
+
+
+def test_reset_drops_the_series(tmp_path, monkeypatch):
+    store = EquityStore(directory=str(tmp_path), capacity=16, max_open=4)
+    monkeypatch.setattr(referee, "equity_store", store)
+
+    user = row("breached")
+    referee.track_equity(user, 12000.0)
+    previous = dict(user)
+    user["challenge_status"] = "active"
+    referee.reset_equity(user, previous)
+    assert "high_water_mark" not in user
+    assert store.high_water_mark(referee.equity_key(user)) is None
+
+    referee.track_equity(user, 10000.0)
+    assert user["high_water_mark"] == 10000.0
+
+
+class StateTable:
+    def __init__(self, rows, queries):
+        self.rows = rows
+        self.queries = queries
+
+    def select(self, columns):
+        return self
+
+    def in_(self, column, values):
+        self.queries.append(sorted(values))
+        self.wanted = set(values)
+        return self
+
+    def execute(self):
+        return type("Response", (), {"data": [row for row in self.rows if row["user_email"] in self.wanted]})
+
+
+class StateClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def table(self, name):
+        assert name == "trading_states"
+        return StateTable(self.rows, self.queries)
+
+
+def take_over(tmp_path, monkeypatch, rows):
+    client = StateClient(rows)
+    monkeypatch.setattr(referee, "supabase", client)
+    monkeypatch.setattr(referee, "equity_store", EquityStore(directory=str(tmp_path / "b"), capacity=16, max_open=4))
+    monkeypatch.setattr(referee, "_equity_owned", set())
+    return client
+
+
+def test_new_owner_seeds_the_high_water_mark(tmp_path, monkeypatch):
+    monkeypatch.setattr(referee, "equity_store", EquityStore(directory=str(tmp_path / "a"), capacity=16, max_open=4))
+    user = row("active", started="2026-01-01T00:00:00Z")
+    referee.track_equity(user, 12000.0)
+    referee.track_equity(user, 11000.0)
+    persisted = {"user_email": "a@x", **referee.equity_state(user)}
+    assert persisted["high_water_mark"] == 12000.0
+
+    client = take_over(tmp_path, monkeypatch, [persisted])
+    moved = row("active", started="2026-01-01T00:00:00Z")
+    asyncio.run(referee.seed_equity_history([moved]))
+    referee.track_equity(moved, 11500.0)
+    assert moved["high_water_mark"] == 12000.0
+    assert moved["day_high_equity"] == 12000.0
+
+    # Already owned: no further reads
+    asyncio.run(referee.seed_equity_history([moved]))
+    assert client.queries == [["a@x"]]
+
+
+def test_previous_challenge_is_not_seeded(tmp_path, monkeypatch):
+    stale = {"user_email": "a@x", "equity_series": "a@x|2026-01-01T00:00:00Z", "high_water_mark": 12000.0,
+             "day_open_equity": 12000.0, "day_high_equity": 12000.0, "equity_day": "2026-01-02"}
+    take_over(tmp_path, monkeypatch, [stale])
+    user = row("active", started="2026-02-01T00:00:00Z")
+    asyncio.run(referee.seed_equity_history([user]))
+    referee.track_equity(user, 10000.0)
+    assert user["high_water_mark"] == 10000.0
@@ -0,0 +1,105 @@
+"""Shared HTTP client: per-host limits and BatchFetcher coalescing."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src import config, http_client
+from src.http_client import BatchFetcher
+
+
+class Bridge:
+    """Mock bridge answering GET ?logins=... with one account object per login."""
+
+    def __init__(self, shape="list", status=200, delay=0.0):
+        self.shape = shape
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        if self.status != 200:
+            return httpx.Response(self.status)
+        logins = [login for login in request.url.params.get("logins", "").split(",") if login and login != "404"]
+        accounts = [{"login": int(login), "balance": float(login)} for login in logins]
+        if self.shape == "dict":
+            return httpx.Response(200, json={str(item["login"]): item for item in accounts})
+        return httpx.Response(200, json=accounts)
+
+
+@pytest.fixture
+def bridge(monkeypatch):
+    bridge = Bridge()
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(bridge)))
+    monkeypatch.setattr(http_client, "_host_limits", {})
+    return bridge
+
+
+def fetch_all(fetcher, logins, url="http://bridge/accounts", headers=None):
+    async def scenario():
+        return await asyncio.gather(
+            *(fetcher.fetch(url, login, headers) for login in logins), return_exceptions=True
+        )
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_lookups_share_one_request(bridge):
+    results = fetch_all(BatchFetcher(window=0.01, max_size=50), ["1", "2", "3", "2"])
+    assert len(bridge.requests) == 1
+    assert bridge.requests[0].url.params["logins"] == "1,2,3"
+    assert [result["balance"] for result in results] == [1.0, 2.0, 3.0, 2.0]
+
+
+def test_keyed_responses_and_missing_logins(bridge):
+    bridge.shape = "dict"
+    results = fetch_all(BatchFetcher(window=0.01, max_size=50), ["7", "404"])
+    assert results[0]["balance"] == 7.0
+    assert results[1] is None
+
+
+def test_full_batches_are_sent_without_waiting(bridge):
+    results = fetch_all(BatchFetcher(window=5, max_size=2), ["1", "2", "3", "4"])
+    assert [request.url.params["logins"] for request in bridge.requests] == ["1,2", "3,4"]
+    assert [result["login"] for result in results] == [1, 2, 3, 4]
+
+
+def test_headers_split_batches(bridge):
+    fetcher = BatchFetcher(window=0.01, max_size=50)
+
+    async def scenario():
+        return await asyncio.gather(
+            fetcher.fetch("http://bridge/accounts", "1", {"X-API-Key": "a"}),
+            fetcher.fetch("http://bridge/accounts", "2", {"X-API-Key": "b"}),
+        )
+
+    asyncio.run(scenario())
+    assert sorted(request.headers["X-API-Key"] for request in bridge.requests) == ["a", "b"]
+
+
+def test_a_failed_batch_fails_every_lookup(bridge):
+    bridge.status = 502
+    results = fetch_all(BatchFetcher(window=0.01, max_size=50), ["1", "2"])
+    assert len(bridge.requests) == 1
+    assert all(isinstance(result, httpx.HTTPStatusError) for result in results)
+
+
+def test_requests_are_limited_per_host(bridge, monkeypatch):
+    monkeypatch.setattr(config, "HTTP_MAX_PER_HOST", 2)
+    bridge.delay = 0.02
+
+    async def scenario():
+        await asyncio.gather(*(http_client.request("GET", f"http://bridge/accounts?logins={i}") for i in range(6)))
+        await http_client.request("GET", "http://other/accounts?logins=1")
+
+    asyncio.run(scenario())
+    assert len(bridge.requests) == 7
+    assert bridge.peak == 2
@@ -0,0 +1,40 @@
+"""Prometheus metrics: stage timings, error counts and the exporter switch."""
+
+from prometheus_client import REGISTRY, generate_latest
+
+from src import config
+from src.metrics import count_error, start_metrics_server, time_stage
+from src.writes import WriteBatch
+from tests.test_writes import FakeClient
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stages_are_timed():
+    before = sample("referee_stage_seconds_count", stage="unit_stage")
+    with time_stage("unit_stage"):
+        pass
+    assert sample("referee_stage_seconds_count", stage="unit_stage") == before + 1
+
+
+def test_supabase_writes_are_timed_per_table():
+    before = sample("referee_stage_seconds_count", stage="trading_states_upsert")
+    batch = WriteBatch(FakeClient())
+    batch.upsert("trading_states", {"user_email": "a", "equity": 1.0})
+    batch.flush()
+    assert sample("referee_stage_seconds_count", stage="trading_states_upsert") == before + 1
+
+
+def test_errors_are_counted_by_type():
+    before = sample("referee_errors_total", type="unit_error")
+    count_error("unit_error")
+    count_error("unit_error")
+    assert sample("referee_errors_total", type="unit_error") == before + 2
+    assert b'referee_errors_total{type="unit_error"}' in generate_latest(REGISTRY)
+
+
+def test_exporter_is_off_without_a_port(monkeypatch):
+    monkeypatch.setattr(config, "METRICS_PORT", 0)
+    assert start_metrics_server() is False
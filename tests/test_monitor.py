@@ -0,0 +1,148 @@
+"""Dashboard cache: one fetch per TTL, stale-while-revalidate and conditional GETs."""
+
+import pytest
+
+import monitor
+from monitor import DashboardCache
+
+
+def trader(email="a@x", equity=10000.0, status="active"):
+    return {"user_email": email, "balance": 10000.0, "equity": equity, "daily_pnl": 0.0,
+            "status": status, "last_trade_at": None}
+
+
+class Loader:
+    def __init__(self, traders):
+        self.traders = traders
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"traders": [dict(row) for row in self.traders], "users": []}
+
+
+@pytest.fixture
+def served(monkeypatch):
+    loader = Loader([trader()])
+    cache = DashboardCache(loader, ttl=60, max_stale=300, history=10)
+    monkeypatch.setattr(monitor, "dashboard_cache", cache)
+    return cache, loader, monitor.app.test_client()
+
+
+def test_fresh_snapshot_is_served_from_memory(served):
+    cache, loader, _ = served
+    first = cache.get()
+    assert cache.get() is first
+    assert loader.calls == 1
+
+
+def test_unchanged_data_answers_304(served):
+    cache, loader, client = served
+    response = client.get("/")
+    assert response.status_code == 200
+    etag = response.headers["ETag"].strip('"')
+
+    assert client.get("/", headers={"If-None-Match": f'"{etag}"'}).status_code == 304
+    assert client.get("/", headers={"If-Modified-Since": response.headers["Last-Modified"]}).status_code == 304
+
+    # A refetch with identical content keeps the validators
+    cache.snapshot.fetched_at -= 1000
+    cache.get()
+    assert loader.calls == 2
+    assert client.get("/", headers={"If-None-Match": f'"{etag}"'}).status_code == 304
+
+    loader.traders = [trader(equity=9000.0)]
+    cache.snapshot.fetched_at -= 1000
+    cache.get()
+    assert client.get("/", headers={"If-None-Match": f'"{etag}"'}).status_code == 200
+
+
+class DeferredThread:
+    """Records background work instead of starting it."""
+
+    started = []
+
+    def __init__(self, target, daemon=None):
+        self.target = target
+
+    def start(self):
+        self.started.append(self.target)
+
+
+def test_stale_snapshot_is_served_while_refreshing(served, monkeypatch):
+    cache, loader, _ = served
+    started = DeferredThread.started = []
+    monkeypatch.setattr(monitor.threading, "Thread", DeferredThread)
+    stale = cache.get()
+    stale.fetched_at -= 120
+    assert cache.get() is stale
+    assert cache.get() is stale
+    assert len(started) == 1  # a single background refresh
+    started[0]()
+    assert cache.snapshot is not stale
+
+
+def refresh(cache, loader, traders):
+    loader.traders = traders
+    cache.snapshot.fetched_at -= 1000
+    with cache._lock:
+        cache._refresh()
+
+
+def test_row_diffs():
+    change = monitor.diff_rows([trader("a@x"), trader("b@x")], [trader("a@x", equity=1.0), trader("c@x")])
+    assert [row["user_email"] for row in change["upsert"]] == ["a@x", "c@x"]
+    assert change["remove"] == ["b@x"]
+    assert monitor.diff_rows([trader()], [trader()]) == {}
+
+
+def test_deltas_are_sequenced_by_version(served):
+    cache, loader, _ = served
+    cache.get()
+    assert cache.snapshot.version == 1
+    refresh(cache, loader, [trader(equity=9000.0)])
+    refresh(cache, loader, [trader(equity=9000.0)])  # unchanged: no new version
+    refresh(cache, loader, [trader(equity=9000.0), trader("b@x")])
+    assert cache.snapshot.version == 3
+
+    pending = cache.changes_since(1)
+    assert [version for version, _ in pending] == [2, 3]
+    assert pending[0][1]["traders"]["upsert"][0]["equity"] == 9000.0
+    assert pending[1][1]["traders"] == {"upsert": [trader("b@x")]}
+    assert cache.changes_since(3) == []
+    assert cache.changes_since(4) is None  # from the future (e.g. another process)
+
+
+def test_deltas_older_than_the_history_need_a_snapshot():
+    loader = Loader([trader()])
+    cache = DashboardCache(loader, ttl=60, max_stale=300, history=2)
+    cache.get()
+    for equity in (1.0, 2.0, 3.0):
+        refresh(cache, loader, [trader(equity=equity)])
+    assert cache.snapshot.version == 4
+    assert cache.changes_since(1) is None
+    assert [version for version, _ in cache.changes_since(2)] == [3, 4]
+
+
+def first_event(client, last_event_id):
+    response = client.get("/events", headers={"Last-Event-ID": last_event_id}, buffered=False)
+    try:
+        chunk = next(response.response)
+        return chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+    finally:
+        response.close()
+
+
+def test_reconnecting_viewer_resumes_from_its_last_event(served):
+    cache, loader, client = served
+    cache.get()
+    refresh(cache, loader, [trader(equity=9000.0)])
+
+    resumed = first_event(client, f"{monitor.EPOCH}-1")
+    assert resumed.startswith("event: delta\n")
+    assert f"id: {monitor.EPOCH}-2\n" in resumed
+
+    # An id from a previous process cannot be resumed
+    restarted = first_event(client, "0-1")
+    assert restarted.startswith("event: snapshot\n")
+    assert f"id: {monitor.EPOCH}-2\n" in restarted
@@ -0,0 +1,122 @@
+"""EA ingestion: (server, login) keying, key bindings, body limits and stale posts."""
+
+import asyncio
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from src import config
+from src.adapters.mt4mt5 import MT4MT5Adapter
+from src.mt_ingest import INGEST_PATH, MAX_BODY_BYTES, LatestStateStore, make_handler
+
+
+@pytest.fixture
+def ingest():
+    store = LatestStateStore()
+    store.grant({"shared": ("1001", "1002")})
+    store.bind("Broker-Live", "2001", "own-key")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(store))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield store, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def post(port, payload=None, api_key="shared", path=INGEST_PATH, headers=None, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    if body is None:
+        body = json.dumps(payload).encode("utf-8")
+    sent = {"X-API-Key": api_key, "Content-Length": str(len(body))}
+    sent.update(headers or {})
+    connection.putrequest("POST", path)
+    for name, value in sent.items():
+        connection.putheader(name, value)
+    connection.endheaders()
+    connection.send(body)
+    status = connection.getresponse().status
+    connection.close()
+    return status
+
+
+def snapshot(login="1001", server="Broker-Live", timestamp=100, balance=1000.0):
+    return {"server": server, "login": login, "timestamp": timestamp, "balance": balance, "equity": balance}
+
+
+def test_snapshots_are_keyed_by_server_and_login(ingest):
+    store, port = ingest
+    assert post(port, snapshot(server="Broker-Live", balance=1000)) == 204
+    assert post(port, snapshot(server="Broker-Demo", balance=50)) == 204
+    assert store.get("Broker-Live", 1001)["data"]["balance"] == 1000
+    assert store.get("Broker-Demo", 1001)["data"]["balance"] == 50
+
+
+def test_server_and_timestamp_are_required(ingest):
+    _, port = ingest
+    payload = snapshot()
+    del payload["server"]
+    assert post(port, payload) == 400
+    payload = snapshot()
+    del payload["timestamp"]
+    assert post(port, payload) == 400
+
+
+def test_shared_key_only_posts_for_its_logins(ingest):
+    store, port = ingest
+    assert post(port, snapshot(login="1003")) == 403
+    assert store.get("Broker-Live", "1003") is None
+
+
+def test_account_key_excludes_shared_key(ingest):
+    store, port = ingest
+    store.grant({"shared": ("1001", "2001")})
+    assert post(port, snapshot(login="2001")) == 403
+    assert post(port, snapshot(login="2001"), api_key="own-key") == 204
+    # The account's own key is bound to that login only
+    assert post(port, snapshot(login="1001"), api_key="own-key") == 403
+
+
+def test_unknown_key_is_rejected_before_the_body(ingest):
+    _, port = ingest
+    assert post(port, snapshot(), api_key="nope") == 401
+
+
+def test_content_length_is_validated(ingest):
+    _, port = ingest
+    assert post(port, body=b"", headers={"Content-Length": "-1"}) == 400
+    assert post(port, body=b"", headers={"Content-Length": "abc"}) == 400
+    assert post(port, body=b"", headers={"Content-Length": str(MAX_BODY_BYTES + 1)}) == 413
+
+
+def test_unknown_path_is_rejected(ingest):
+    _, port = ingest
+    assert post(port, snapshot(), path="/other") == 404
+
+
+def test_older_ea_timestamp_is_ignored(ingest):
+    store, port = ingest
+    assert post(port, snapshot(timestamp=200, balance=1200)) == 204
+    assert post(port, snapshot(timestamp=150, balance=900)) == 204
+    entry = store.get("Broker-Live", "1001")
+    assert entry["data"]["balance"] == 1200
+    assert entry["updates"] == 1
+    assert post(port, snapshot(timestamp=200, balance=1250)) == 204
+    assert store.get("Broker-Live", "1001")["data"]["balance"] == 1250
+
+
+def test_ingest_is_refused_under_sharding(monkeypatch):
+    monkeypatch.setattr(config, "MT_INGEST_PORT", 8090)
+    monkeypatch.setattr(config, "ENGINE_SHARDING", True)
+    with pytest.raises(ValueError, match="ENGINE_SHARDING"):
+        config.validate_ingest()
+    monkeypatch.setattr(config, "ENGINE_SHARDING", False)
+    config.validate_ingest()
+
+
+def test_push_bridge_needs_the_local_server():
+    adapter = MT4MT5Adapter({"login": "1001", "server": "Broker-Live"})
+    with pytest.raises(ConnectionError, match="ingestion server"):
+        asyncio.run(adapter.connect())
@@ -0,0 +1,121 @@
+"""Account roster: paged full loads, updated_at deltas and column fallback."""
+
+import pytest
+
+from src import config, roster as roster_module
+from src.roster import AccountRoster
+
+
+class Query:
+    def __init__(self, client):
+        self.client = client
+        self.filters = []
+
+    def select(self, columns):
+        if columns != "*" and self.client.missing_column:
+            self.client.error = RuntimeError('{"code": "42703", "message": "column does not exist"}')
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column, value):
+        self.since = value
+        self.filters.append(lambda row: row.get(column) >= value)
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.start, self.end = start, end
+        return self
+
+    def execute(self):
+        self.client.requests.append((getattr(self, "since", None), self.start, self.columns))
+        if self.client.error is not None:
+            error, self.client.error = self.client.error, None
+            raise error
+        rows = [dict(row) for row in self.client.rows if all(check(row) for check in self.filters)]
+        return type("Response", (), {"data": rows[self.start:self.end + 1]})
+
+
+class UserAccounts:
+    def __init__(self, rows, missing_column=False):
+        self.rows = rows
+        self.requests = []
+        self.missing_column = missing_column
+        self.error = None
+
+    def table(self, name):
+        assert name == "user_accounts"
+        return Query(self)
+
+
+def account(email, updated_at="2026-01-01T00:00:00Z", **extra):
+    return {"user_email": email, "is_active": True, "challenge_status": "active", "broker_type": "deriv",
+            "updated_at": updated_at, **extra}
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    monkeypatch.setattr(roster_module, "PAGE_SIZE", 2)
+    monkeypatch.setattr(config, "ROSTER_FULL_SYNC_INTERVAL", 3600)
+
+
+def test_full_sync_pages_through_active_rows():
+    client = UserAccounts([account(f"u{i}@x") for i in range(5)] + [account("off@x", is_active=False)])
+    roster = AccountRoster(client)
+    roster.sync()
+    assert sorted(roster.accounts) == [f"u{i}@x" for i in range(5)]
+    assert [start for _, start, _ in client.requests] == [0, 2, 4]
+
+
+def test_deltas_merge_into_the_existing_rows():
+    client = UserAccounts([account("a@x"), account("b@x", broker_credentials='{"token": "t"}')])
+    roster = AccountRoster(client)
+    roster.sync()
+    user = roster.accounts["a@x"]
+    user["high_water_mark"] = 12000.0  # runtime annotation
+    assert roster.accounts["b@x"]["broker_credentials"] == {"token": "t"}
+
+    client.rows = [
+        account("a@x", "2026-01-02T00:00:00Z", account_size=50000),
+        account("b@x", "2026-01-02T00:00:00Z", is_active=False),
+        account("c@x", "2026-01-02T00:00:00Z"),
+    ]
+    roster.sync()
+    assert client.requests[-1][0] == "2026-01-01T00:00:00Z"
+    assert roster.watermark == "2026-01-02T00:00:00Z"
+    assert sorted(roster.accounts) == ["a@x", "c@x"]
+    assert roster.accounts["a@x"] is user
+    assert user["account_size"] == 50000 and user["high_water_mark"] == 12000.0
+
+
+def test_full_sync_drops_hard_deleted_rows():
+    client = UserAccounts([account("a@x"), account("b@x")])
+    roster = AccountRoster(client)
+    roster.sync()
+    client.rows = [account("a@x")]
+    roster.sync()  # delta: a hard delete is invisible
+    assert sorted(roster.accounts) == ["a@x", "b@x"]
+    roster.last_full_sync -= config.ROSTER_FULL_SYNC_INTERVAL
+    roster.sync()
+    assert sorted(roster.accounts) == ["a@x"]
+
+
+def test_missing_columns_fall_back_to_star():
+    client = UserAccounts([account("a@x")], missing_column=True)
+    roster = AccountRoster(client)
+    roster.sync()
+    assert roster.columns == "*"
+    assert list(roster.accounts) == ["a@x"]
+
+
+def test_active_filters_by_broker_type():
+    roster = AccountRoster(client=None)
+    roster._apply([account("a@x"), account("b@x", broker_type="mt5"), account("c@x", broker_type=None)], full=True)
+    assert sorted(user["user_email"] for user in roster.active("deriv")) == ["a@x", "c@x"]
+    assert [user["user_email"] for user in roster.active("mt5")] == ["b@x"]
@@ -0,0 +1,94 @@
+"""Compiled tier rules fed by trading-day counts and adapter-reported lots."""
+
+from types import SimpleNamespace
+
+from src import rules
+from src.rules import RuleBook, TradingDayCounter, build_context
+
+
+class FakeRPC:
+    """Stand-in for client.rpc(...).order(...).range(...).execute()."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.name = name
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.calls.append((start, end))
+        self.window = (start, end)
+        return self
+
+    def execute(self):
+        start, end = self.window
+        return SimpleNamespace(data=self.rows[start:end + 1])
+
+
+def make_book(definition):
+    book = RuleBook()
+    book.load([{"tier": "pro", "rules": definition}])
+    return book
+
+
+def test_trading_days_are_paged(monkeypatch):
+    monkeypatch.setattr(rules, "PAGE_SIZE", 2)
+    client = FakeRPC([{"user_email": f"t{i}@example.com", "trading_days": i} for i in range(5)])
+    counter = TradingDayCounter(client)
+    counter.refresh(force=True)
+    assert client.name == "trading_days_by_user"
+    assert client.calls == [(0, 1), (2, 3), (4, 5)]
+    assert counter.days["t4@example.com"] == 4
+
+    users = [{"user_email": "t3@example.com"}, {"user_email": "new@example.com"}]
+    counter.apply(users)
+    assert [user["trading_days"] for user in users] == [3, 0]
+
+
+def test_min_trading_days_gates_a_pass():
+    book = make_book([{"type": "profit_target", "pct": 8}, {"type": "min_trading_days", "days": 3}])
+    assert book.uses("min_trading_days")
+    user = {"account_size": 10000, "account_tier": "pro", "trading_days": 2}
+    compiled = book.for_user(user)
+    assert compiled.evaluate(build_context(user, 11000.0))[0] == "active"
+    user["trading_days"] = 3
+    assert compiled.evaluate(build_context(user, 11000.0))[0] == "passed"
+
+
+def test_max_lots_needs_reported_lots():
+    book = make_book([{"type": "max_lots", "lots": 5}])
+    assert not book.uses("min_trading_days")
+    user = {"account_size": 10000, "account_tier": "pro"}
+    compiled = book.for_user(user)
+    # Brokers that do not report lots (Deriv) never trip the rule
+    assert compiled.evaluate(build_context(user, 10000.0))[0] == "active"
+    user["open_lots"] = 5.5
+    assert compiled.evaluate(build_context(user, 10000.0))[0] == "breached"
+
+
+def test_margin_follows_the_tier_rules():
+    book = make_book([
+        {"type": "trailing_drawdown", "amount": 800},
+        {"type": "profit_target", "pct": 8},
+        {"type": "min_trading_days", "days": 3},
+        {"type": "max_lots", "lots": 5},
+    ])
+    user = {"account_size": 10000, "account_tier": "pro", "high_water_mark": 10700.0, "trading_days": 3}
+    compiled = book.for_user(user)
+    # Trailing breach level is 10700 - 800 = 9900; target is 10800
+    assert compiled.margin(build_context(user, 10000.0)) == 100.0
+    assert compiled.margin(build_context(user, 10750.0)) == 50.0
+    # The target is out of reach until the trading-day gate is met
+    user["trading_days"] = 1
+    assert compiled.margin(build_context(user, 10750.0)) == 850.0
+
+
+def test_margin_is_none_without_thresholds():
+    book = make_book([{"type": "max_lots", "lots": 5}])
+    user = {"account_size": 10000, "account_tier": "pro"}
+    assert book.for_user(user).margin(build_context(user, 10000.0)) is None
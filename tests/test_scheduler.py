@@ -0,0 +1,64 @@
+"""Scheduler: proximity comes from the tier rules the evaluation uses; every broker is scheduled."""
+
+import asyncio
+
+from src import config, referee
+from src.rules import RuleBook
+from src.scheduler import ScheduledTrader, next_interval
+
+
+def test_trailing_drawdown_pulls_the_next_check_in(monkeypatch):
+    book = RuleBook()
+    book.load([{"tier": "pro", "rules": [{"type": "trailing_drawdown", "amount": 800}, {"type": "profit_target", "pct": 8}]}])
+    monkeypatch.setattr(referee, "rule_book", book)
+
+    user = {"user_email": "a@x", "account_size": 10000, "max_drawdown_limit": 800, "profit_target": 800,
+            "last_equity": 10000.0, "high_water_mark": 10750.0}
+    # Static thresholds (9200 / 10800) put the account far from both
+    static = next_interval(ScheduledTrader(user))
+
+    user["account_tier"] = "pro"
+    # Trailing breach level is 10750 - 800 = 9950, 50 away
+    tiered = next_interval(ScheduledTrader(user))
+    assert tiered < static
+    assert tiered < config.SCHEDULE_MIN_INTERVAL + (config.SCHEDULE_MAX_INTERVAL - config.SCHEDULE_MIN_INTERVAL) * 0.2
+
+
+def test_every_broker_is_scheduled_and_checked_through_the_dispatcher(monkeypatch):
+    from src import dispatcher, scheduler
+
+    users = [
+        {"user_email": "d@x", "broker_type": "deriv", "challenge_status": "active"},
+        {"user_email": "m@x", "broker_type": "mt5", "challenge_status": "active"},
+        {"user_email": "c@x", "broker_type": "ctrader", "challenge_status": "active"},
+        {"user_email": "p@x", "broker_type": "mt4", "challenge_status": "passed"},
+    ]
+    checked = []
+
+    async def fetch_active_accounts():
+        return users
+
+    async def fetch_daily_pnl_map(emails):
+        return {}
+
+    async def check_account(user, batch, daily_pnl_map):
+        checked.append(user["user_email"])
+        user["last_equity"] = 10000.0
+        return "active"
+
+    monkeypatch.setattr(scheduler, "fetch_active_accounts", fetch_active_accounts)
+    monkeypatch.setattr(scheduler, "fetch_daily_pnl_map", fetch_daily_pnl_map)
+    monkeypatch.setattr(dispatcher, "check_account", check_account)
+    monkeypatch.setattr(dispatcher.breakers, "allow", lambda *args: None)
+
+    async def scenario():
+        trader_scheduler = scheduler.TraderScheduler()
+        await trader_scheduler.sync_roster()
+        for trader in list(trader_scheduler.traders.values()):
+            await trader_scheduler._check(trader)
+        return trader_scheduler
+
+    trader_scheduler = asyncio.run(scenario())
+    assert sorted(trader_scheduler.traders) == ["c@x", "d@x", "m@x"]
+    assert sorted(checked) == ["c@x", "d@x", "m@x"]
+    assert sorted(trader_scheduler._semaphores) == ["ctrader", "deriv", "mt"]
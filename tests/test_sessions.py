@@ -0,0 +1,114 @@
+"""Deriv session pool: reuse, backoff, keepalive and idle eviction."""
+
+import asyncio
+import time
+
+import deriv_api
+import pytest
+
+from src import config
+from src.sessions import DerivSessionPool
+
+
+class FakeDerivAPI:
+    created = []
+
+    def __init__(self, endpoint=None, app_id=None):
+        self.connected = asyncio.sleep(0)
+        self.pings = 0
+        self.ping_delay = 0.0
+        self.disconnected = False
+        self.created.append(self)
+
+    async def authorize(self, token):
+        if token == "bad":
+            raise ConnectionError("InvalidToken")
+        return {"authorize": {"loginid": f"CR-{token}", "is_virtual": 1}}
+
+    async def ping(self):
+        self.pings += 1
+        await asyncio.sleep(self.ping_delay)
+        return {"ping": "pong"}
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+@pytest.fixture(autouse=True)
+def fake_deriv(monkeypatch):
+    FakeDerivAPI.created = []
+    monkeypatch.setattr(deriv_api, "DerivAPI", FakeDerivAPI)
+    monkeypatch.setattr(config, "DERIV_SESSION_IDLE_TTL", 600)
+    monkeypatch.setattr(config, "DERIV_SESSION_PING_TIMEOUT", 0.05)
+
+
+def test_sessions_are_reused_per_token():
+    async def scenario():
+        pool = DerivSessionPool(1089)
+        first = await pool.acquire("t1")
+        again = await pool.acquire("t1")
+        other = await pool.acquire("t2")
+        await pool.close_all()
+        return first, again, other
+
+    first, again, other = asyncio.run(scenario())
+    assert first is again
+    assert first.account_id == "CR-t1" and first.is_virtual
+    assert other is not first
+    assert len(FakeDerivAPI.created) == 2
+    assert all(api.disconnected for api in FakeDerivAPI.created)
+
+
+def test_failed_authorize_backs_off():
+    async def scenario():
+        pool = DerivSessionPool(1089)
+        with pytest.raises(ConnectionError, match="InvalidToken"):
+            await pool.acquire("bad")
+        with pytest.raises(ConnectionError, match="backing off"):
+            await pool.acquire("bad")
+        return pool.sessions["bad"]
+
+    session = asyncio.run(scenario())
+    assert len(FakeDerivAPI.created) == 1
+    assert session.failures == 1
+    assert session.retry_at > time.monotonic()
+
+
+def test_idle_sessions_are_evicted_and_active_ones_pinged():
+    async def scenario():
+        pool = DerivSessionPool(1089)
+        idle = await pool.acquire("idle")
+        active = await pool.acquire("active")
+        idle.last_used -= config.DERIV_SESSION_IDLE_TTL + 1
+        semaphore = asyncio.Semaphore(10)
+        now = time.monotonic()
+        for token, session in list(pool.sessions.items()):
+            await pool._maintain_session(token, session, now, semaphore)
+        return pool, idle, active
+
+    pool, idle, active = asyncio.run(scenario())
+    assert list(pool.sessions) == ["active"]
+    assert idle.api is None
+    assert active.api.pings == 1
+
+
+def test_a_hung_ping_marks_only_its_session_for_reconnect():
+    async def scenario():
+        pool = DerivSessionPool(1089)
+        hung = await pool.acquire("hung")
+        fine = await pool.acquire("fine")
+        hung.api.ping_delay = 1.0
+        semaphore = asyncio.Semaphore(10)
+        now = time.monotonic()
+        started = time.monotonic()
+        await asyncio.gather(*(
+            pool._maintain_session(token, session, now, semaphore) for token, session in list(pool.sessions.items())
+        ))
+        return hung, fine, time.monotonic() - started
+
+    hung, fine, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.5
+    assert fine.healthy
+    # The hung session timed out and was reconnected on a new connection
+    assert len(FakeDerivAPI.created) == 3
+    assert hung.healthy and hung.api is FakeDerivAPI.created[-1]
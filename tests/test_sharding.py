@@ -0,0 +1,118 @@
+"""Shard ownership: rendezvous assignment, lease claims and lease expiry."""
+
+import pytest
+
+from src import config, sharding
+from src.sharding import ShardCoordinator, shard_of
+
+
+class FakeRpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        return type("Response", (), {"data": self.client.handle(self.name, self.params)})
+
+
+class LeaseClient:
+    """engine_heartbeat / claim_shards / release_shards over an in-memory lease table."""
+
+    def __init__(self, workers=()):
+        self.workers = list(workers)
+        self.leases: dict = {}  # shard -> worker_id
+        self.fail = False
+
+    def rpc(self, name, params):
+        if self.fail:
+            raise ConnectionError("unreachable")
+        return FakeRpc(self, name, params)
+
+    def handle(self, name, params):
+        if name == "engine_heartbeat":
+            if params["p_worker_id"] not in self.workers:
+                self.workers.append(params["p_worker_id"])
+            return [{"engine_heartbeat": worker} for worker in sorted(self.workers)]
+        if name == "release_shards":
+            for shard in params["p_shards"]:
+                if self.leases.get(shard) == params["p_worker_id"]:
+                    del self.leases[shard]
+            return None
+        granted = []
+        for shard in params["p_shards"]:
+            if self.leases.get(shard, params["p_worker_id"]) == params["p_worker_id"]:
+                self.leases[shard] = params["p_worker_id"]
+                granted.append(shard)
+        return granted
+
+
+@pytest.fixture(autouse=True)
+def small_shard_count(monkeypatch):
+    monkeypatch.setattr(config, "ENGINE_SHARD_COUNT", 8)
+    monkeypatch.setattr(config, "ENGINE_LEASE_TTL", 30)
+    monkeypatch.setattr(config, "ENGINE_HEARTBEAT_INTERVAL", 10)
+
+
+def test_shard_of_is_stable():
+    assert shard_of("a@x", 8) == shard_of("a@x", 8)
+    assert {shard_of(f"u{i}@x", 8) for i in range(200)} == set(range(8))
+
+
+def test_workers_split_the_shards_without_overlap():
+    client = LeaseClient(workers=["w1", "w2"])
+    first, second = ShardCoordinator(client, "w1"), ShardCoordinator(client, "w2")
+    first.tick()
+    second.tick()
+    assert first.owned.isdisjoint(second.owned)
+    assert first.owned | second.owned == set(range(8))
+
+    email = next(f"u{i}@x" for i in range(100) if shard_of(f"u{i}@x", 8) in first.owned)
+    assert first.owns(email)
+    assert not second.owns(email)
+
+
+def test_joining_worker_takes_over_its_share():
+    client = LeaseClient()
+    first = ShardCoordinator(client, "w1")
+    first.tick()
+    assert first.owned == set(range(8))
+
+    second = ShardCoordinator(client, "w2")
+    second.tick()  # w1 still holds every lease
+    assert second.owned == set()
+    first.tick()  # sees w2 and releases w2's preferred shards
+    second.tick()
+    assert second.owned == second.preferred_shards() != set()
+    assert first.owned == set(range(8)) - second.owned
+
+
+def test_a_held_lease_is_not_granted_to_another_worker():
+    client = LeaseClient()
+    client.leases = {shard: "other" for shard in range(8)}
+    coordinator = ShardCoordinator(client, "w1")
+    coordinator.tick()
+    assert coordinator.owned == set()
+    assert not coordinator.owns("a@x")
+
+
+def test_ownership_lapses_with_the_lease(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(sharding.time, "monotonic", lambda: clock[0])
+    client = LeaseClient()
+    coordinator = ShardCoordinator(client, "w1")
+    coordinator.tick()
+    assert coordinator.owns("a@x")
+
+    # A failed renewal keeps the old deadline: TTL minus one heartbeat of margin
+    client.fail = True
+    clock[0] += 15
+    coordinator.tick()
+    assert coordinator.owns("a@x")
+    clock[0] += 5
+    assert not coordinator.owns("a@x")
+
+
+def test_owns_account_without_sharding(monkeypatch):
+    monkeypatch.setattr(sharding, "_coordinator", None)
+    assert sharding.owns_account("a@x")
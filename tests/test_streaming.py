@@ -0,0 +1,91 @@
+"""Streaming persistence: every stream's rows go out on one shared WriteBatch per loop."""
+
+import asyncio
+
+from src import config
+from src import streaming as streaming_module
+from src.streaming import AccountStream, StreamingReferee
+from src.writes import ChangeTracker, WriteBatch
+from tests.test_writes import FakeClient
+
+
+def make_referee(*emails):
+    client = FakeClient()
+    streaming = StreamingReferee()
+    streaming.batch = WriteBatch(client, tracker=ChangeTracker())
+    for email in emails:
+        stream = AccountStream({"user_email": email, "challenge_status": "active"}, "token", streaming.batch)
+        stream.balance = 10000.0
+        stream.dirty = True
+        streaming.streams[email] = stream
+    return streaming, client
+
+
+def test_dirty_streams_share_one_upsert(monkeypatch):
+    monkeypatch.setattr(config, "STREAM_PERSIST_INTERVAL", 0)
+    streaming, client = make_referee("a@x", "b@x")
+    asyncio.run(streaming.flush())
+    upserts = [call for call in client.calls if call[0] == "upsert"]
+    assert len(upserts) == 1
+    assert sorted(row["user_email"] for row in upserts[0][2]) == ["a@x", "b@x"]
+    assert not any(stream.dirty for stream in streaming.streams.values())
+
+
+def test_unchanged_rows_are_skipped(monkeypatch):
+    monkeypatch.setattr(config, "STREAM_PERSIST_INTERVAL", 0)
+    streaming, client = make_referee("a@x")
+    asyncio.run(streaming.flush())
+    streaming.streams["a@x"].dirty = True
+    asyncio.run(streaming.flush())
+    assert sum(call[0] == "upsert" for call in client.calls) == 1
+
+
+def test_throttled_streams_wait(monkeypatch):
+    monkeypatch.setattr(config, "STREAM_PERSIST_INTERVAL", 3600)
+    streaming, client = make_referee("a@x")
+    streaming.streams["a@x"].last_persisted = float("inf")
+    asyncio.run(streaming.flush())
+    assert client.calls == []
+    assert streaming.streams["a@x"].dirty
+
+
+def test_status_change_is_an_update(monkeypatch):
+    streaming, client = make_referee("a@x")
+    stream = streaming.streams["a@x"]
+    stream._set_status("breached", "test")
+    asyncio.run(streaming.flush())
+    assert ("update", "user_accounts", {"challenge_status": "breached"}, "in", "user_email", ["a@x"]) in client.calls
+    assert not any(call[0] == "upsert" and call[1] == "user_accounts" for call in client.calls)
+    assert stream.user["challenge_status"] == "breached"
+
+
+def test_roster_starts_streams_concurrently(monkeypatch):
+    users = [{"user_email": f"u{i}@x", "deriv_api_token": f"token-{i}", "challenge_status": "active"} for i in range(4)]
+    users.append({"user_email": "done@x", "deriv_api_token": "token-done", "challenge_status": "breached"})
+    running = []
+    peak = []
+
+    async def fetch_users():
+        return users
+
+    async def fetch_pnl(emails):
+        return {email: -1.0 for email in emails}
+
+    async def start(stream):
+        running.append(stream.user_email)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(stream.user_email)
+        if stream.user_email == "u3@x":
+            raise ConnectionError("refused")
+
+    monkeypatch.setattr(streaming_module, "fetch_deriv_users", fetch_users)
+    monkeypatch.setattr(streaming_module, "fetch_daily_pnl_map", fetch_pnl)
+    monkeypatch.setattr(AccountStream, "start", start)
+    monkeypatch.setattr(config, "REFEREE_MAX_CONCURRENCY", 2)
+
+    streaming, _ = make_referee()
+    asyncio.run(streaming.sync_roster())
+    assert sorted(streaming.streams) == ["u0@x", "u1@x", "u2@x"]
+    assert max(peak) == 2
+    assert {stream.daily_pnl for stream in streaming.streams.values()} == {-1.0}
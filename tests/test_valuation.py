@@ -0,0 +1,164 @@
+"""Local contract models: multipliers, digital options and accumulators repriced from ticks."""
+
+import asyncio
+
+import pytest
+
+from src.valuation import (
+    AccumulatorValuation,
+    ContractValuation,
+    DigitalOptionValuation,
+    MultiplierValuation,
+    ValuationEngine,
+    build_valuation,
+)
+
+EPOCH = 1_700_000_000.0
+
+
+def multiplier(contract_type="MULTUP", bid=9.8, **extra):
+    return {
+        "contract_id": 1, "contract_type": contract_type, "underlying": "R_100", "buy_price": 10.0,
+        "bid_price": bid, "multiplier": 10, "entry_spot": 100.0, "current_spot": 100.0,
+        "current_spot_time": EPOCH, **extra,
+    }
+
+
+def digital(contract_type="CALL", bid=5.0, spot=100.0, barrier=100.0):
+    return {
+        "contract_id": 2, "contract_type": contract_type, "underlying": "R_100", "buy_price": 5.2,
+        "bid_price": bid, "payout": 10.0, "barrier": barrier, "date_expiry": EPOCH + 300,
+        "current_spot": spot, "current_spot_time": EPOCH,
+    }
+
+
+def accumulator(bid=10.0, **extra):
+    return {
+        "contract_id": 3, "contract_type": "ACCU", "underlying": "R_100", "buy_price": 10.0,
+        "bid_price": bid, "growth_rate": 0.01, "high_barrier": 100.5, "low_barrier": 99.5,
+        "current_spot": 100.0, "current_spot_time": EPOCH, **extra,
+    }
+
+
+def test_multiplier_tracks_the_move_and_keeps_the_commission():
+    valuation = build_valuation(multiplier())
+    assert isinstance(valuation, MultiplierValuation)
+    assert valuation.offset == pytest.approx(-0.2)
+    assert valuation.revalue(101.0, EPOCH + 1)
+    # stake + stake * multiplier * 1% - commission
+    assert valuation.bid == pytest.approx(10.0 + 1.0 - 0.2)
+
+    down = build_valuation(multiplier("MULTDOWN"))
+    down.revalue(101.0, EPOCH + 1)
+    assert down.bid == pytest.approx(10.0 - 1.0 - 0.2)
+
+
+def test_multiplier_limit_orders_and_stop_out():
+    limited = build_valuation(multiplier(limit_order={"take_profit": {"order_amount": 2.0}}))
+    limited.revalue(103.0, EPOCH + 1)
+    assert limited.closed
+    assert limited.pnl == pytest.approx(2.0)
+    assert not limited.revalue(90.0, EPOCH + 2)
+
+    stop_loss = build_valuation(multiplier(limit_order={"stop_loss": {"order_amount": 3.0}}))
+    stop_loss.revalue(97.0, EPOCH + 1)
+    assert stop_loss.closed
+    assert stop_loss.pnl == pytest.approx(-3.0)
+
+    stopped_out = build_valuation(multiplier())
+    stopped_out.revalue(80.0, EPOCH + 1)
+    assert stopped_out.closed
+    assert stopped_out.bid == 0.0
+
+
+def test_digital_option_reprices_around_its_anchor():
+    valuation = build_valuation(digital(bid=5.5, spot=100.05))
+    assert isinstance(valuation, DigitalOptionValuation)
+    valuation.revalue(100.05, EPOCH + 1)
+    assert valuation.bid == pytest.approx(5.5, abs=0.05)
+
+    valuation.revalue(100.5, EPOCH + 2)
+    assert valuation.bid > 5.5
+    valuation.revalue(99.5, EPOCH + 3)
+    assert valuation.bid < 5.5
+
+    put = build_valuation(digital("PUT", bid=4.5, spot=100.05))
+    put.revalue(99.5, EPOCH + 3)
+    assert put.bid > 4.5
+
+
+def test_digital_option_settles_at_expiry():
+    won = build_valuation(digital(bid=5.5, spot=100.05))
+    won.revalue(100.2, EPOCH + 300)
+    assert won.closed
+    assert won.bid == pytest.approx(10.0)
+
+    lost = build_valuation(digital(bid=5.5, spot=100.05))
+    lost.revalue(99.8, EPOCH + 300)
+    assert lost.bid == 0.0
+
+
+def test_accumulator_grows_inside_the_range_and_knocks_out():
+    valuation = build_valuation(accumulator())
+    assert isinstance(valuation, AccumulatorValuation)
+    valuation.revalue(100.2, EPOCH + 1)
+    valuation.revalue(100.4, EPOCH + 2)
+    assert valuation.bid == pytest.approx(10.0 * 1.01 ** 2)
+
+    # The range moves with the previous tick: 100.4 * 1.005 is outside
+    valuation.revalue(101.0, EPOCH + 3)
+    assert valuation.closed
+    assert valuation.bid == 0.0
+
+
+def test_accumulator_take_profit_closes():
+    valuation = build_valuation(accumulator(limit_order={"take_profit": {"order_amount": 0.15}}))
+    valuation.revalue(100.1, EPOCH + 1)
+    assert not valuation.closed
+    valuation.revalue(100.2, EPOCH + 2)
+    assert valuation.closed
+
+
+def test_unmodelled_contracts_keep_their_anchored_bid():
+    valuation = build_valuation({"contract_id": 4, "contract_type": "ONETOUCH", "buy_price": 5, "bid_price": 6,
+                                 "current_spot": 100.0})
+    assert type(valuation) is ContractValuation
+    assert not valuation.revalue(120.0, EPOCH + 1)
+    assert valuation.pnl == 1.0
+    # Missing model fields fall back to the anchored bid as well
+    broken = multiplier()
+    del broken["multiplier"]
+    assert type(build_valuation(broken)) is ContractValuation
+
+
+class AnchorApi:
+    def __init__(self, contracts):
+        self.contracts = {contract["contract_id"]: contract for contract in contracts}
+
+    async def proposal_open_contract(self, request):
+        return {"proposal_open_contract": self.contracts[request["contract_id"]]}
+
+
+def test_engine_revalues_watched_accounts_on_ticks(monkeypatch):
+    engine = ValuationEngine()
+
+    async def no_ticks(symbols):
+        pass
+
+    monkeypatch.setattr(engine, "_ensure_ticks", no_ticks)
+    api = AnchorApi([multiplier(), accumulator()])
+    rows = [{"contract_id": 1}, {"contract_id": 3}]
+    unrealized = asyncio.run(engine.sync_account("CR1", api, rows))
+    assert unrealized == pytest.approx(-0.2)
+    assert engine.has_contracts("CR1")
+
+    seen = []
+    engine.watch("CR1", seen.append)
+    engine._on_tick("R_100", {"tick": {"quote": 100.0, "epoch": EPOCH}})
+    assert seen == []  # at the anchor tick: already in the bid
+    engine._on_tick("R_100", {"tick": {"quote": 100.2, "epoch": EPOCH + 1}})
+    assert seen == [pytest.approx(0.2 - 0.2 + 0.1)]
+
+    engine.release("CR1")
+    assert not engine.has_contracts("CR1")
+    assert engine.by_symbol == {}
@@ -0,0 +1,135 @@
+"""WriteBatch: bulk upserts skipped when unchanged, updates never upserted and one PATCH per distinct set of values."""
+
+import asyncio
+from types import SimpleNamespace
+
+from src import writes
+from src.writes import ChangeTracker, WriteBatch
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.call = None
+
+    def upsert(self, rows, on_conflict=None):
+        self.call = ("upsert", self.name, rows, on_conflict)
+        return self
+
+    def update(self, values):
+        self.call = ("update", self.name, values)
+        return self
+
+    def in_(self, column, values):
+        self.call += ("in", column, sorted(values))
+        return self
+
+    def eq(self, column, value):
+        self.call += ("eq", column, value)
+        return self
+
+    def execute(self):
+        if self.call[0] == "update" and self.call[3] == "in" and self.client.fail_bulk:
+            raise RuntimeError("bulk rejected")
+        self.client.calls.append(self.call)
+
+
+class FakeClient:
+    def __init__(self, fail_bulk=False):
+        self.calls = []
+        self.fail_bulk = fail_bulk
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def test_updates_are_grouped_by_value():
+    client = FakeClient()
+    batch = WriteBatch(client)
+    batch.update("user_accounts", {"user_email": "a", "challenge_status": "breached"})
+    batch.update("user_accounts", {"user_email": "b", "challenge_status": "breached"})
+    batch.update("user_accounts", {"user_email": "c", "challenge_status": "passed"})
+    assert len(batch) == 3
+
+    stats = batch.flush()
+    assert stats == {"written": 3, "failed": 0, "skipped": 0}
+    assert client.calls == [
+        ("update", "user_accounts", {"challenge_status": "breached"}, "in", "user_email", ["a", "b"]),
+        ("update", "user_accounts", {"challenge_status": "passed"}, "in", "user_email", ["c"]),
+    ]
+    assert not any(call[0] == "upsert" for call in client.calls)
+
+
+def test_updates_for_one_key_are_merged():
+    client = FakeClient()
+    batch = WriteBatch(client)
+    batch.update("user_accounts", {"user_email": "a", "deriv_account_id": "CR1"})
+    batch.update("user_accounts", {"user_email": "a", "challenge_status": "passed"})
+    batch.flush()
+    assert client.calls == [
+        ("update", "user_accounts", {"challenge_status": "passed", "deriv_account_id": "CR1"}, "in", "user_email", ["a"]),
+    ]
+
+
+def test_failed_bulk_update_falls_back_per_row():
+    client = FakeClient(fail_bulk=True)
+    batch = WriteBatch(client)
+    batch.update("user_accounts", {"user_email": "a", "challenge_status": "breached"})
+    batch.update("user_accounts", {"user_email": "b", "challenge_status": "breached"})
+    assert batch.flush()["written"] == 2
+    assert sorted(client.calls) == [
+        ("update", "user_accounts", {"challenge_status": "breached"}, "eq", "user_email", "a"),
+        ("update", "user_accounts", {"challenge_status": "breached"}, "eq", "user_email", "b"),
+    ]
+
+
+def test_flush_async_writes_upserts_and_updates():
+    client = FakeClient()
+    batch = WriteBatch(client)
+    batch.upsert("trading_states", {"user_email": "a", "equity": 1.0})
+    batch.update("user_accounts", {"user_email": "a", "deriv_account_id": "CR1"})
+    batch.update("user_accounts", {"user_email": "b", "deriv_account_id": "CR2"})
+    stats = asyncio.run(batch.flush_async())
+    assert stats["written"] == 3
+    assert len(batch) == 0
+    assert ("upsert", "trading_states", [{"user_email": "a", "equity": 1.0}], "user_email") in client.calls
+    assert sum(call[0] == "update" for call in client.calls) == 2
+
+
+def test_unchanged_material_fields_are_not_rewritten(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(writes, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    client = FakeClient()
+    tracker = ChangeTracker(heartbeat=60)
+    fields = ("equity", "status")
+
+    def cycle(equity, status="active"):
+        batch = WriteBatch(client, tracker=tracker)
+        batch.upsert("trading_states", {"user_email": "a", "equity": equity, "status": status, "updated_at": clock[0]},
+                     material=fields)
+        return batch.flush()
+
+    assert cycle(100.0)["written"] == 1
+    # Sub-cent noise and a new updated_at alone are not a change
+    assert cycle(100.001) == {"written": 0, "failed": 0, "skipped": 1}
+    assert cycle(100.0, "breached")["written"] == 1
+    # The heartbeat rewrites an unchanged row so updated_at stays fresh
+    clock[0] += 61
+    assert cycle(100.0, "breached")["written"] == 1
+    assert sum(call[0] == "upsert" for call in client.calls) == 3
+
+
+def test_failed_writes_are_retried_next_cycle():
+    client = FakeClient()
+    tracker = ChangeTracker(heartbeat=60)
+    row = {"user_email": "a", "equity": 1.0}
+
+    failing = WriteBatch(client, tracker=tracker)
+    failing.client = SimpleNamespace(table=lambda name: None)  # every write raises
+    failing.upsert("trading_states", dict(row), material=("equity",))
+    assert failing.flush()["failed"] == 1
+
+    batch = WriteBatch(client, tracker=tracker)
+    batch.upsert("trading_states", dict(row), material=("equity",))
+    assert batch.flush()["written"] == 1